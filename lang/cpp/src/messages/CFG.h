@@ -195,6 +195,6 @@ struct CFG::TP5_GET : public Message
 };
 
 uint8_t CFG::TP5_GET::classID   = 0x06;
-uint8_t CFG::TP5_GET::messageID = 0x00;
+uint8_t CFG::TP5_GET::messageID = 0x31;
 
 #endif // ifndef __CFG_H__
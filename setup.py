@@ -9,9 +9,12 @@ setup(
     author='Markus Mayer',
     author_email='info@mayeranalytics.com',
     description='Lightweight wrapper for uBlox GPS binary format (UBX)',
-    install_requires = ['pyserial'],
+    install_requires = ['pyserial', 'numpy'],
     entry_points = {'console_scripts': [
         'UBXtool=ubx:UBXtool.ubxtool_main',
-        'parse_NMEA_log=ubx:parse_NMEA_log.parse_NMEA_log_main'
+        'parse_NMEA_log=ubx:parse_NMEA_log.parse_NMEA_log_main',
+        'UBXreplay=ubx:UBXReplay.replay_main',
+        'UBXgenerate=ubx:UBXGenerator.generate_main',
+        'UBXdemux=ubx:UBXDemux.demux_main'
     ]}
 )
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""Benchmark framing, parsing, serialization and dispatch.
+
+Measures
+- bytes/s and frames/s through UBXFramer, and messages/s through
+  UBXManager.feed (framing, parsing and dispatch),
+- parse and serialize time and memory per object for every message that
+  is defined in ubx/UBX/*.py,
+- latency from write to UBXQueue.get() through a pipe.
+
+Results are written as JSON with --save and compared with a stored
+baseline with --baseline, e.g.
+
+    python tests/benchmark.py --save baseline.json
+    ... change things ...
+    python tests/benchmark.py --baseline baseline.json
+
+The comparison exits with 1 if any metric got worse by more than
+--threshold.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ubx import UBX, UBXFramer, UBXManager, UBXQueue      # noqa: E402
+from ubx.introspect import getClassesInModule              # noqa: E402
+from ubx.UBXMessage import UBXMessage, parseUBXPayload     # noqa: E402
+
+GGA = b'$GPGGA,092750.000,5321.6802,N,00630.3372,W,1,8,1.03,61.7,M,55.2,M,,*76\r\n'
+
+# Metrics whose name ends in one of these are better when larger
+_higherIsBetter = ('_per_s',)
+
+
+def samplePayload(Subcls, repeats=4):
+    """Return an all-zero payload of message class Subcls."""
+    types, _ = Subcls._fieldInfo['once']
+    size = sum(t._size for t in types)
+    repeat = Subcls._fieldInfo['repeat']
+    if repeat:
+        size += repeats * sum(t._size for t in repeat['once'][0])
+    return bytes(size)
+
+
+def messageClasses():
+    """Yield (name, class, id, Subcls) for every parseable message."""
+    for Cls in getClassesInModule(UBX):
+        for msgId, Subcls in sorted(Cls._lookup.items()):
+            yield ("{}-{}".format(Cls.__name__, Subcls.__name__),
+                   Cls._class, msgId, Subcls)
+
+
+def timePerCall(fn, minTime):
+    """Return the seconds per call of fn, run for at least minTime s."""
+    n = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        dt = time.perf_counter() - t0
+        if dt >= minTime:
+            return dt / n
+        n *= 2 if dt < minTime / 10 else 1 + int(minTime / max(dt, 1e-9))
+
+
+def sampleStream(epochs):
+    """Return a mixed stream of UBX frames and NMEA sentences."""
+    pvt = UBXMessage.make(0x01, 0x07, samplePayload(UBX.NAV.PVT))
+    dop = UBXMessage.make(0x01, 0x04, samplePayload(UBX.NAV.DOP))
+    svinfo = UBXMessage.make(0x01, 0x30, samplePayload(UBX.NAV.SVINFO, 20))
+    epoch = pvt + dop + svinfo + GGA + GGA
+    return epoch * epochs, 5 * epochs
+
+
+def benchFramer(minTime):
+    stream, frames = sampleStream(1000)
+    chunks = [stream[i:i+4096] for i in range(0, len(stream), 4096)]
+
+    def frame():
+        framer = UBXFramer()
+        for chunk in chunks:
+            framer.feed(chunk)
+    t = timePerCall(frame, minTime)
+    return {"bytes_per_s": len(stream) / t, "frames_per_s": frames / t}
+
+
+class _Sink(UBXManager):
+
+    def onUBX(self, obj):
+        pass
+
+    def onNMEA(self, buffer):
+        pass
+
+
+def benchManager(minTime):
+    stream, frames = sampleStream(1000)
+    chunks = [stream[i:i+4096] for i in range(0, len(stream), 4096)]
+
+    def feed():
+        manager = _Sink(None)
+        for chunk in chunks:
+            manager.feed(chunk)
+    t = timePerCall(feed, minTime)
+    return {"bytes_per_s": len(stream) / t, "messages_per_s": frames / t}
+
+
+def benchMessages(minTime, count=1000):
+    results = {}
+    for name, msgClass, msgId, Subcls in messageClasses():
+        payload = samplePayload(Subcls)
+        try:
+            obj = parseUBXPayload(msgClass, msgId, payload)
+            obj.serialize()
+        except Exception as e:
+            results[name] = {"error": str(e)}
+            continue
+        parse = timePerCall(
+            lambda: parseUBXPayload(msgClass, msgId, payload), minTime)
+        serialize = timePerCall(obj.serialize, minTime)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        objs = [parseUBXPayload(msgClass, msgId, payload)
+                for _ in range(count)]
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del objs
+        results[name] = {
+            "payload_bytes": len(payload),
+            "parse_us": 1e6 * parse,
+            "serialize_us": 1e6 * serialize,
+            "bytes_per_object": (size - before) / count,
+            "peak_bytes_per_object": (peak - before) / count,
+        }
+    return results
+
+
+def benchQueueLatency(count):
+    """Latency from os.write() of a frame to UBXQueue.get() returning it."""
+    r, w = os.pipe()
+    queue = UBXQueue(os.fdopen(r, 'rb'), start=True)
+    frame = UBXMessage.make(0x01, 0x07, samplePayload(UBX.NAV.PVT))
+    latencies = []
+    try:
+        for _ in range(count):
+            t0 = time.perf_counter()
+            os.write(w, frame)
+            queue.get(timeout=1)
+            latencies.append(time.perf_counter() - t0)
+    finally:
+        queue.shutdown()
+        os.write(w, frame)      # wake the reader so that it stops
+        queue.get(timeout=1)
+        queue.join()
+        os.close(w)
+    latencies.sort()
+    return {
+        "median_us": 1e6 * statistics.median(latencies),
+        "p99_us": 1e6 * latencies[int(0.99 * (len(latencies) - 1))],
+    }
+
+
+def run(quick=False):
+    minTime = 0.02 if quick else 0.2
+    return {
+        "meta": {
+            "time": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": quick,
+        },
+        "framer": benchFramer(minTime),
+        "manager": benchManager(minTime),
+        "messages": benchMessages(minTime / 10, 100 if quick else 1000),
+        "queue_latency": benchQueueLatency(100 if quick else 1000),
+    }
+
+
+def flatten(results, prefix=""):
+    """Return {'framer.bytes_per_s': value, ...} of the numeric metrics."""
+    flat = {}
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        name = prefix + key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not key.endswith("_bytes"):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baseline, threshold):
+    """Print the changes against baseline, return the list of regressions."""
+    new, old = flatten(results), flatten(baseline)
+    regressions = []
+    for name in sorted(new.keys() & old.keys()):
+        if not old[name]:
+            continue
+        change = new[name] / old[name] - 1
+        if not name.endswith(_higherIsBetter):
+            change = -change    # positive is better
+        flag = ""
+        if change < -threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change > threshold:
+            flag = "  improved"
+        print("{:55s} {:14.3f} {:14.3f} {:+7.1%}{}".format(
+            name, old[name], new[name], change, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative change counted as regression (0.1)')
+    parser.add_argument('--quick', action='store_true',
+                        help='shorter runs, less precise')
+    args = parser.parse_args()
+
+    results = run(args.quick)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("{} regressions".format(len(regressions)))
+            sys.exit(1)
+    elif not args.save:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Unit tests for compressed capture reading and writing."""
+
+import gzip
+import io
+import os
+import tempfile
+import unittest
+from ubx import UBX, UBXManager
+from ubx.UBXCapture import (CaptureWriter, openCapture, readChunks, feedCapture,
+                            detectCompression, compressionFromName)
+from ubx.UBXColumns import columnsFromFile
+from ubx.UBXDemux import Demux
+from ubx.UBXGenerator import TrafficGenerator, Stream
+from ubx.UBXReplay import readCapture
+
+
+class Collector(UBXManager):
+
+    def __init__(self):
+        UBXManager.__init__(self, None)
+        self.received = []
+
+    def onUBX(self, obj):
+        self.received.append(obj)
+
+    def onNMEA(self, buffer):
+        pass
+
+
+class CaptureTest(unittest.TestCase):
+
+    def setUp(self):
+        gen = TrafficGenerator([Stream(UBX.NAV.PVT), Stream(UBX.NAV.DOP)],
+                               nmea=['GGA'], seed=5)
+        self.frames = [f for (_, f) in gen.frames(epochs=100)]
+        self.data = b''.join(self.frames)
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.dir.name, name)
+
+    def testFormats(self):
+        for name, compression in (('c.ubx', None), ('c.ubx.gz', 'gzip'),
+                                  ('c.ubx.xz', 'xz'), ('c.ubx.bz2', 'bz2')):
+            path = self.path(name)
+            self.assertEqual(compressionFromName(path), compression)
+            with CaptureWriter(path, flushInterval=0) as capture:
+                for i in range(0, len(self.data), 1000):
+                    capture.write(self.data[i:i + 1000])
+            self.assertEqual(capture.written, len(self.data))
+            with open(path, 'rb') as f:
+                self.assertEqual(detectCompression(f.read(6)), compression)
+            if compression:
+                self.assertLess(os.path.getsize(path), len(self.data))
+            with openCapture(path) as f:
+                self.assertEqual(f.read(), self.data)
+            self.assertEqual(b''.join(readChunks(path, 4096)), self.data)
+            self.assertEqual([f for (_, f) in readCapture(path)], self.frames)
+            manager = Collector()
+            self.assertEqual(feedCapture(manager, path), len(self.data))
+            self.assertEqual(len(manager.received), 200)
+
+    def testFileObjects(self):
+        buf = io.BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+            f.write(self.data)
+        stream = io.BufferedReader(io.BytesIO(buf.getvalue()))
+        with openCapture(stream) as f:
+            self.assertEqual(f.read(), self.data)
+        plain = io.BufferedReader(io.BytesIO(self.data))
+        self.assertIs(openCapture(plain), plain)
+        with self.assertRaises(ValueError):
+            openCapture(self.path('x'), 'wb', compression='zip')
+
+    def testDebugLog(self):
+        path = self.path('UBX.log.gz')
+        manager = Collector()
+        manager.ser, manager.debug, manager.eofTimeout = io.BytesIO(self.data), path, 0
+        manager.start()
+        manager.join(timeout=5)
+        self.assertEqual(len(manager.received), 200)
+        with openCapture(path) as f:
+            self.assertEqual(f.read(), self.data)
+
+    def testPlainDebugLogIsFlushed(self):
+        path = self.path('UBX.log')
+        chunks = [self.data[:1000], self.data[1000:]]
+        onDisk = []
+
+        class Port:
+            def read(self, n):
+                if len(chunks) == 1:
+                    with open(path, 'rb') as f:
+                        onDisk.append(f.read())
+                return chunks.pop(0) if chunks else b''
+
+        manager = Collector()
+        manager.ser, manager.debug, manager.eofTimeout = Port(), path, 0
+        manager.start()
+        manager.join(timeout=5)
+        self.assertEqual(onDisk, [self.data[:1000]])
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def testDemuxAndColumns(self):
+        path = self.path('c.ubx.xz')
+        with CaptureWriter(path) as capture:
+            capture.write(self.data)
+        outputs = {}
+        with Demux(lambda name: CaptureWriter(outputs.setdefault(
+                name, self.path(name + '.gz')))) as demux:
+            feedCapture(demux, path)
+        pvt = columnsFromFile(outputs['NAV-PVT.ubx'], UBX.NAV.PVT)
+        self.assertEqual(len(pvt), 100)
+        self.assertEqual(pvt['iTOW'][1] - pvt['iTOW'][0], 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Unit tests for the capture demultiplexer."""
+
+import io
+import os
+import tempfile
+import unittest
+from ubx import UBX, UBXFramer, FrameKind
+from ubx.UBXDemux import Demux, directoryOpener
+from ubx.UBXGenerator import TrafficGenerator, Stream, Noise
+
+
+class Output(io.BytesIO):
+
+    def close(self):
+        self.closed_ = True
+
+
+class DemuxTest(unittest.TestCase):
+
+    def capture(self, noise=None):
+        gen = TrafficGenerator(
+            [Stream(UBX.NAV.PVT), Stream(UBX.ESF.MEAS, perEpoch=5)],
+            nmea=['GGA', 'RMC'], seed=2, noise=noise)
+        return b''.join(f for (_, f) in gen.frames(epochs=200))
+
+    def demux(self, data, splitNMEA=False, chunk=1000):
+        outputs = {}
+
+        def opener(filename):
+            out = outputs[filename] = Output()
+            return out
+        with Demux(opener, splitNMEA) as demux:
+            for i in range(0, len(data), chunk):
+                demux.feed(data[i:i+chunk])
+        return demux, {name: out.getvalue() for name, out in outputs.items()}
+
+    def testRouting(self):
+        data = self.capture()
+        demux, files = self.demux(data, splitNMEA=True)
+        self.assertEqual(sorted(files), ['ESF-MEAS.ubx', 'NAV-PVT.ubx',
+                                         'NMEA-GGA.nmea', 'NMEA-RMC.nmea'])
+        self.assertEqual(demux.counts['ESF-MEAS'][0], 1000)
+        frames = UBXFramer().feed(files['NAV-PVT.ubx'])
+        self.assertEqual(len(frames), 200)
+        self.assertTrue(all(k == FrameKind.UBX and f[2:4] == b'\x01\x07' for (k, f) in frames))
+        self.assertTrue(files['NMEA-GGA.nmea'].startswith(b'$GNGGA'))
+        self.assertEqual(sum(map(len, files.values())), len(data))
+
+    def testUndecoded(self):
+        data = self.capture(Noise(bitFlips=1e-4, garbage=0.02)) + b'\xb5\x62\x01'
+        demux, files = self.demux(data, chunk=4096)
+        self.assertIn('NMEA.nmea', files)
+        self.assertTrue(files['undecoded.bin'].endswith(b'\xb5\x62\x01'))
+        good = sum(n for name, (n, _) in demux.counts.items() if name != 'undecoded')
+        kinds = [k for (k, _) in UBXFramer().feed(data)]
+        self.assertEqual(good, kinds.count(FrameKind.UBX) + kinds.count(FrameKind.NMEA))
+
+    def testDirectory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with Demux(directoryOpener(tmp)) as demux:
+                demux.feed(self.capture())
+            self.assertEqual(sorted(os.listdir(tmp)),
+                             ['ESF-MEAS.ubx', 'NAV-PVT.ubx', 'NMEA.nmea'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Unit tests for the epoch assembler."""
+
+import unittest
+from ubx import UBX, parseUBXPayload
+from ubx.UBXEpoch import EpochAssembler, WEEK
+from ubx.UBXGenerator import TrafficGenerator, Stream, buildPayload
+
+
+def nav(msgCls, iTOW, rxTime=None):
+    obj = msgCls(buildPayload(msgCls, {'iTOW': iTOW}, repeats=2))
+    obj.rxTime = rxTime
+    return obj
+
+
+class EpochTest(unittest.TestCase):
+
+    def setUp(self):
+        self.epochs = []
+
+    def testGenerated(self):
+        gen = TrafficGenerator([Stream(UBX.NAV.PVT), Stream(UBX.NAV.DOP),
+                                Stream(UBX.NAV.SVINFO)], nmea=['GGA'], seed=3)
+        assembler = EpochAssembler(self.epochs.append)
+        for kind, frame in gen.frames(epochs=10):
+            if frame[:2] == b'\xb5\x62':
+                assembler.add(parseUBXPayload(frame[2], frame[3], frame[6:-2]))
+        self.assertEqual(len(self.epochs), 9)       # the last one is open
+        assembler.flush()
+        self.assertEqual(len(self.epochs), 10)
+        self.assertEqual(assembler.epochs, 10)
+        for epoch in self.epochs:
+            self.assertEqual(len(epoch), 3)
+            self.assertEqual(epoch[UBX.NAV.PVT].iTOW, epoch.iTOW)
+            self.assertEqual(epoch.get(UBX.NAV.DOP).iTOW, epoch.iTOW)
+            self.assertIn(UBX.NAV.SVINFO, epoch)
+        self.assertEqual(self.epochs[1].iTOW - self.epochs[0].iTOW, 1000)
+
+    def testExpected(self):
+        assembler = EpochAssembler(self.epochs.append,
+                                   expected=[UBX.NAV.PVT, UBX.NAV.DOP])
+        assembler.add(nav(UBX.NAV.PVT, 1000))
+        assembler.add(UBX.ACK.ACK(b'\x06\x08'))     # ignored
+        self.assertEqual(self.epochs, [])
+        assembler.add(nav(UBX.NAV.DOP, 1000))
+        self.assertEqual([e.iTOW for e in self.epochs], [1000])
+        self.assertTrue(self.epochs[0].complete)
+        assembler.add(nav(UBX.NAV.SVINFO, 1000))    # after its epoch closed
+        self.assertEqual(assembler.late, 1)
+        assembler.add(nav(UBX.NAV.PVT, 2000))
+        assembler.add(nav(UBX.NAV.PVT, 3000))       # DOP of 2000 is missing
+        self.assertEqual([e.iTOW for e in self.epochs], [1000, 2000])
+        self.assertFalse(self.epochs[1].complete)
+
+    def testOutOfOrderAndTimeout(self):
+        assembler = EpochAssembler(self.epochs.append, timeout=1, window=2)
+        assembler.add(nav(UBX.NAV.PVT, 2000, rxTime=0))
+        assembler.add(nav(UBX.NAV.PVT, 1000, rxTime=1))
+        assembler.add(nav(UBX.NAV.DOP, 2000, rxTime=2))
+        self.assertEqual(self.epochs, [])
+        assembler.add(nav(UBX.NAV.PVT, 3000, rxTime=3))     # 1000 is the oldest
+        self.assertEqual([e.iTOW for e in self.epochs], [1000])
+        assembler.check(now=10**9 + 1)                      # 2000 timed out
+        self.assertEqual([e.iTOW for e in self.epochs], [1000, 2000])
+        self.assertEqual(len(self.epochs[1]), 2)
+        assembler.flush()
+        self.assertEqual([e.iTOW for e in self.epochs], [1000, 2000, 3000])
+
+    def testWeekRollover(self):
+        assembler = EpochAssembler(self.epochs.append, window=2)
+        for iTOW in (WEEK - 1000, 0, WEEK - 1000, 1000):
+            assembler.add(nav(UBX.NAV.PVT, iTOW))
+        assembler.add(nav(UBX.NAV.PVT, WEEK - 1000))    # late
+        assembler.flush()
+        self.assertEqual([e.iTOW for e in self.epochs], [WEEK - 1000, 0, 1000])
+        self.assertEqual(len(self.epochs[0]), 1)
+        self.assertEqual(assembler.late, 1)
+
+    def testBackwardJump(self):
+        assembler = EpochAssembler(self.epochs.append)
+        for iTOW in (500000, 501000, 502000, 100000, 101000, 102000):
+            assembler.add(nav(UBX.NAV.PVT, iTOW))
+        assembler.flush()
+        self.assertEqual([e.iTOW for e in self.epochs],
+                         [500000, 501000, 502000, 100000, 101000, 102000])
+        self.assertEqual((assembler.late, assembler.resets), (0, 1))
+        assembler.add(nav(UBX.NAV.PVT, 98000))              # late, not a reset
+        self.assertEqual((assembler.late, assembler.resets), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Unit tests for the vectorized ESF.MEAS codec."""
+
+import math
+import unittest
+from ubx import UBX, parseUBXMessage
+from ubx.UBXESFSensor import SensorDataType, SensorMeasurement
+from ubx.UBXESFCodec import MEASEncoder, encodeMEAS, decodeMEAS, decodeMEASFrames, _encoder
+
+
+TYPES = [SensorDataType.GYRO_X, SensorDataType.ACCEL_Z,
+         SensorDataType.WHEELTICK_FL, SensorDataType.SPEED,
+         SensorDataType.GYRO_TEMPERATURE]
+
+
+def epoch(i):
+    v = math.sin(0.1 * i)
+    return [v, -v, int(1000 * v), 3 * v, 20 + v]
+
+
+class ESFCodecTest(unittest.TestCase):
+
+    def testEncodeMatchesCreate(self):
+        for i in range(50):
+            meas = [SensorMeasurement(1, t, v) for t, v in zip(TYPES, epoch(i))]
+            expected = UBX.ESF.MEAS.create(10 * i, meas, id=1).serialize()
+            frame = UBX.ESF.MEAS.encode(10 * i, list(zip(TYPES, epoch(i))), id=1)
+            self.assertEqual(frame, expected)
+
+    def testTimeMarkSent(self):
+        for timeMarkSent in range(4):
+            enc = MEASEncoder([SensorDataType.GYRO_Z], timeMarkSent=timeMarkSent)
+            self.assertEqual(parseUBXMessage(enc.encode(0, [0.0])).flags & 0x03,
+                             timeMarkSent)
+
+    def testEncodeBatch(self):
+        enc = MEASEncoder(TYPES, id=3)
+        values = [epoch(i) for i in range(20)]
+        frames = enc.encodeBatch(range(20), values)
+        self.assertEqual(len(frames), 20 * enc.frameSize)
+        for i in range(20):
+            frame = frames[i*enc.frameSize:(i+1)*enc.frameSize]
+            self.assertEqual(frame, enc.encode(i, values[i]))
+            meas = parseUBXMessage(frame)
+            self.assertEqual(meas.timeTag, i)
+            self.assertEqual(meas.numMeas, len(TYPES))
+            self.assertEqual([m.type for m in meas.measurements], TYPES)
+
+    def testOutOfRange(self):
+        enc = MEASEncoder([SensorDataType.GYRO_Z])
+        with self.assertRaises(ValueError):
+            enc.encode(0, [5000.0])
+        with self.assertRaises(ValueError):
+            MEASEncoder([SensorDataType.NONE])
+
+    def testRangeBounds(self):
+        accel = SensorDataType.ACCEL_X
+        enc = MEASEncoder([accel])
+        for value in (-0x800000, 0x7fffff):
+            frame = enc.encode(0, [value / 2 ** 10])
+            meas = SensorMeasurement(0, accel, value / 2 ** 10)
+            self.assertEqual(frame[-6:-2], meas.to_bytes())
+        for value in (-0x800001, 0x800000):
+            with self.assertRaises(ValueError):
+                enc.encode(0, [value / 2 ** 10])
+
+    def testEncoderCache(self):
+        for i in range(100):
+            encodeMEAS(0, [(SensorDataType.SPEED, 1.0)], id=i % 4, dataId=i % 4)
+            encodeMEAS(0, [(SensorDataType.GYRO_Z, 1.0)] * (i % 31 + 1))
+        self.assertLessEqual(_encoder.cache_info().currsize, 64)
+
+    def testDecodeMatchesMeasurements(self):
+        enc = MEASEncoder(TYPES, id=1)
+        frames = [enc.encode(10 * i, epoch(i)) for i in range(30)]
+        frames.insert(5, UBX.MON.VER.Get().serialize())    # ignored
+        series = decodeMEASFrames(frames)
+        self.assertEqual(sorted(series), sorted(TYPES))
+        for i, frame in enumerate(f for f in frames if f[2] == 0x10):
+            for m in parseUBXMessage(frame).measurements:
+                timeTag, value = series[m.type]
+                self.assertEqual(timeTag[i], 10 * i)
+                self.assertEqual(value[i], m.value)
+
+    def testDecodeShortPayloads(self):
+        enc = MEASEncoder(TYPES[:2], id=1)
+        frames = [enc.encode(i, epoch(i)[:2]) for i in range(3)]
+        payloads = [f[6:-2] for f in frames]
+        payloads[1] = payloads[1][:-4]      # the second word is missing
+        payloads.append(payloads[0][:6])    # not even a header
+        series = decodeMEAS(payloads)
+        self.assertEqual(series[TYPES[0]][0].tolist(), [0, 1, 2])
+        self.assertEqual(series[TYPES[1]][0].tolist(), [0, 2])
+        self.assertEqual(series[TYPES[1]][1][1], decodeMEAS(payloads[2:3])[TYPES[1]][1][0])
+
+    def testDataTypeMask(self):
+        # bit 29 belongs to dataField's top bits, not to the data type
+        payload = b'\x00' * 4 + (1 << 11).to_bytes(2, 'little') + b'\x00\x00' \
+            + ((1 << 29) | (SensorDataType.SPEED << 24) | 100).to_bytes(4, 'little')
+        word = int.from_bytes(payload[8:], 'little')
+        self.assertEqual(SensorMeasurement.from_integer(word).type, SensorDataType.SPEED)
+        self.assertEqual(list(decodeMEAS([payload])), [SensorDataType.SPEED])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Unit tests for the traffic generator."""
+
+import random
+import unittest
+from ubx import UBX, UBXFramer, FrameKind
+from ubx.introspect import getClassesInModule
+from ubx.UBXGenerator import TrafficGenerator, Stream, Noise, buildPayload
+
+
+class GeneratorTest(unittest.TestCase):
+
+    def testEveryMessageRoundTrips(self):
+        rng = random.Random(1)
+        for Cls in getClassesInModule(UBX):
+            for msgId, Subcls in Cls._lookup.items():
+                payload = buildPayload(Subcls, rng=rng)
+                self.assertEqual(Subcls(payload).serialize()[6:-2], payload,
+                                 "{}-{}".format(Cls.__name__, Subcls.__name__))
+
+    def testRepeatedCountsAndScriptedValues(self):
+        svinfo = UBX.NAV.SVINFO(buildPayload(
+            UBX.NAV.SVINFO, {'iTOW': lambda n: 1000 * n, 'svid': [3, 7]},
+            repeats=5, n=4))
+        self.assertEqual(svinfo.numCh, 5)
+        self.assertEqual(svinfo.iTOW, 4000)
+        self.assertEqual([svinfo.svid_1, svinfo.svid_2, svinfo.svid_5], [3, 7, 3])
+        meas = UBX.ESF.MEAS(buildPayload(UBX.ESF.MEAS, repeats=3))
+        self.assertEqual(meas.numMeas, 3)
+
+    def testEpochs(self):
+        gen = TrafficGenerator(
+            [Stream(UBX.NAV.PVT), Stream(UBX.ESF.MEAS, perEpoch=10)],
+            nmea=TrafficGenerator.NMEA_TYPES, rate=10, seed=3, startTOW=1000)
+        frames = list(gen.frames(epochs=3))
+        self.assertEqual(len(frames), 3 * 16)
+        self.assertEqual(frames[-1][0], 0.2)
+        kinds = [k for (k, _) in UBXFramer().feed(b''.join(f for (_, f) in frames))]
+        self.assertEqual(kinds.count(FrameKind.UBX), 33)
+        self.assertEqual(kinds.count(FrameKind.NMEA), 15)
+        pvt = UBX.NAV.PVT(frames[16][1][6:-2])
+        self.assertEqual(pvt.iTOW, 1100)
+        again = TrafficGenerator(
+            [Stream(UBX.NAV.PVT), Stream(UBX.ESF.MEAS, perEpoch=10)],
+            nmea=TrafficGenerator.NMEA_TYPES, rate=10, seed=3, startTOW=1000)
+        self.assertEqual(list(again.frames(epochs=3)), frames)
+
+    def testNoise(self):
+        gen = TrafficGenerator(
+            [Stream(UBX.NAV.PVT), Stream(UBX.NAV.SVINFO)], nmea=['GGA'],
+            seed=5, noise=Noise(bitFlips=1e-3, truncations=0.05, garbage=0.05))
+        data = b''.join(f for (_, f) in gen.frames(epochs=500))
+        self.assertGreater(min(gen.injected.values()), 0)
+        frames = UBXFramer().feed(data)
+        kinds = [k for (k, _) in frames]
+        self.assertGreater(kinds.count(FrameKind.UBX_BAD) + kinds.count(FrameKind.NMEA_BAD), 0)
+        self.assertGreater(kinds.count(FrameKind.JUNK), 0)
+        # most frames survive
+        self.assertGreater(kinds.count(FrameKind.UBX) + kinds.count(FrameKind.NMEA), 1200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Unit tests for the columnar decoding and the geodesy."""
+
+import time
+import unittest
+import numpy as np
+from ubx import UBX
+from ubx.UBXColumns import columns, collect, payloadDtype
+from ubx.UBXGenerator import TrafficGenerator, Stream
+from ubx.UBXGeodesy import (A, B, pvtLLH, pvtVelNED, svinECEF, llhToECEF,
+                            ecefToLLH, ecefToENU, enuToECEF, nedToECEF)
+
+
+class ColumnsTest(unittest.TestCase):
+
+    def testPVT(self):
+        gen = TrafficGenerator([Stream(UBX.NAV.PVT), Stream(UBX.NAV.SVINFO)],
+                               nmea=['GGA'], seed=4)
+        frames = [f for (_, f) in gen.frames(epochs=50)]
+        pvts = [f for f in frames if f[2:4] == b'\x01\x07']
+        cols = columns(b''.join(pvts), UBX.NAV.PVT)
+        self.assertEqual(len(cols), 50)
+        objs = [UBX.NAV.PVT(f[6:-2]) for f in pvts]
+        self.assertEqual(cols['lat'].tolist(), [o.lat for o in objs])
+        self.assertEqual(cols['iTOW'].tolist(), [o.iTOW for o in objs])
+        self.assertEqual(pvtVelNED(cols)[3].tolist(), objs[3].velNED_m)
+        self.assertEqual(collect(b''.join(frames), UBX.NAV.PVT)['hMSL'].tolist(),
+                         cols['hMSL'].tolist())
+        with self.assertRaises(ValueError):
+            columns(b''.join(pvts[:2]) + pvts[0][:10], UBX.NAV.PVT)
+
+    def testRepeated(self):
+        dtype = payloadDtype(UBX.NAV.SVINFO, repeats=4)
+        self.assertEqual(dtype.itemsize, 8 + 4 * 12)
+        self.assertEqual(dtype['repeated'].shape, (4,))
+
+
+class GeodesyTest(unittest.TestCase):
+
+    def testECEF(self):
+        np.testing.assert_allclose(llhToECEF(0, 0, 0), [A, 0, 0])
+        np.testing.assert_allclose(llhToECEF(90, 0, 0), [0, 0, B], atol=1e-6)
+        rng = np.random.default_rng(1)
+        lat, lon = rng.uniform(-90, 90, 1000), rng.uniform(-180, 180, 1000)
+        height = rng.uniform(-100, 1e5, 1000)
+        lat2, lon2, height2 = ecefToLLH(llhToECEF(lat, lon, height))
+        np.testing.assert_allclose(lat2, lat, atol=1e-9)
+        np.testing.assert_allclose(lon2, lon, atol=1e-9)
+        np.testing.assert_allclose(height2, height, atol=1e-4)
+
+    def testENU(self):
+        svin = UBX.TIM.SVIN(bytes(28))
+        ref = llhToECEF(47.0, 8.0, 500.0)
+        svin.meanX, svin.meanY, svin.meanZ = (np.round(ref * 100)).astype(int).tolist()
+        base = svinECEF(svin)
+        north = llhToECEF(47.0 + 1 / 111195, 8.0, 500.0)
+        enu = ecefToENU(np.stack([base, north]), base)
+        np.testing.assert_allclose(enu[0], 0, atol=1e-6)
+        self.assertAlmostEqual(enu[1][1], 1.0, delta=0.01)
+        self.assertLess(abs(enu[1][0]) + abs(enu[1][2]), 0.01)
+        np.testing.assert_allclose(enuToECEF(enu, base)[1], north, atol=1e-6)
+        up = nedToECEF([[0, 0, -1]], [47.0], [8.0])[0]
+        np.testing.assert_allclose(up, ref / np.linalg.norm(ref), atol=0.01)
+
+    def testMillionEpochs(self):
+        pvt = np.zeros(1000000, payloadDtype(UBX.NAV.PVT))
+        pvt['lat'], pvt['lon'], pvt['height'] = 470000000, 80000000, 500000
+        t0 = time.perf_counter()
+        xyz = llhToECEF(*pvtLLH(pvt))
+        ecefToENU(xyz, xyz[0])
+        self.assertLess(time.perf_counter() - t0, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
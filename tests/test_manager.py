@@ -0,0 +1,696 @@
+#!/usr/bin/env python3
+"""Unit tests for UBXManager's transmit and receive paths."""
+
+import io
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from ubx import UBX, UBXManager, Priority, TransmitQueueClosed, CorrelatorClosed
+from ubx import isACK, isNAK
+from ubx import UBXFramer, FrameKind, UBXDaemon, DaemonConnection
+from ubx.UBXFramer import checksumNMEA
+from ubx.UBXConfig import ConfigTransaction
+from ubx.UBXServer import UBXServer, CorrectionFramer, crc24q
+from ubx.UBXMetrics import MetricsServer, prometheus
+from ubx.UBXTrace import Tracer
+from ubx import UBXQueue
+from ubx.UBXMessage import UBXMessage
+
+
+class FakePort:
+    """Serial port stand-in: read() returns fed bytes, write() records."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._rx = bytearray()
+        self.writes = []
+
+    def feed(self, data):
+        with self._cond:
+            self._rx += data
+            self._cond.notify_all()
+
+    def read(self, n=1):
+        with self._cond:
+            if not self._rx:
+                self._cond.wait(0.01)
+            data = bytes(self._rx[:n])
+            del self._rx[:n]
+            return data
+
+    read1 = read
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+        return len(data)
+
+
+def splitFrames(data):
+    """Split concatenated UBX frames."""
+    frames = []
+    while data:
+        n = 8 + data[4] + 256 * data[5]
+        frames.append(data[:n])
+        data = data[n:]
+    return frames
+
+
+class FakeReceiver(FakePort):
+    """Answers polls and acknowledges CFG messages like a receiver."""
+
+    RESPONSES = {
+        (0x0A, 0x04): b'ROM CORE 3.01 (107888)'.ljust(30, b'\x00') + b'00080000\x00\x00',
+        (0x06, 0x08): b'\xe8\x03\x01\x00\x01\x00',    # CFG-RATE
+        (0x06, 0x11): b'\x08\x00',                        # CFG-RXM
+        (0x06, 0x86): b'\x00\x00\x00\x00\x00\x00\x00\x00',    # CFG-PMS
+    }
+
+    def __init__(self, nak=()):
+        FakePort.__init__(self)
+        self.nak = nak
+        self.responses = dict(self.RESPONSES)
+
+    def write(self, data):
+        FakePort.write(self, data)
+        for frame in splitFrames(data):
+            msgClass, msgId, payload = UBXMessage.extract(frame)
+            if not payload and (msgClass, msgId) in self.responses:
+                self.feed(UBXMessage.make(
+                    msgClass, msgId, self.responses[(msgClass, msgId)]))
+            if msgClass == 0x06:
+                ackId = 0x00 if payload and msgId in self.nak else 0x01
+                self.feed(UBXMessage.make(0x05, ackId, bytes([msgClass, msgId])))
+                if ackId and payload:
+                    self.responses[(msgClass, msgId)] = payload
+
+
+class QuietManager(UBXManager):
+    """Collects the messages instead of printing them."""
+
+    def __init__(self, ser, **kwargs):
+        UBXManager.__init__(self, ser, **kwargs)
+        self.received = []
+
+    def onUBX(self, obj):
+        self.received.append(obj)
+
+
+class HeldPort(FakePort):
+    """FakePort whose first write blocks until release()."""
+
+    def __init__(self):
+        FakePort.__init__(self)
+        self._gate = threading.Event()
+        self.holding = threading.Event()    # set once the first write blocks
+
+    def write(self, data):
+        if not self.writes:
+            self.writes.append(bytes(data))
+            self.holding.set()
+            self._gate.wait(1)
+            return len(data)
+        return FakePort.write(self, data)
+
+    def release(self):
+        self._gate.set()
+
+
+class FailingPort(FakePort):
+
+    def write(self, data):
+        raise OSError("device gone")
+
+
+class WriteErrorManager(QuietManager):
+
+    def __init__(self, ser):
+        QuietManager.__init__(self, ser)
+        self.writeErrors = []
+
+    def onWriteError(self, data, error):
+        self.writeErrors.append((data, error))
+
+
+class TransmitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.port = HeldPort()
+        self.manager = QuietManager(self.port)
+
+    def tearDown(self):
+        self.manager.shutdown()
+        if self.manager.is_alive():
+            self.manager.join(timeout=1)
+
+    def testPriorityAndCoalescing(self):
+        poll = UBX.MON.VER.Get().serialize()
+        cfg = UBX.CFG.PMS.Set(powerSetupValue=2).serialize()
+        rtcm = b'\xd3\x00\x00\x47\xea\x4b'
+        self.manager.send(b'first')     # holds the transmitter
+        self.manager.send(poll, Priority.POLL)
+        self.manager.send(cfg)
+        fut = self.manager.send(rtcm, Priority.CORRECTION, future=True)
+        self.assertGreaterEqual(self.manager.transmitBacklog(), len(poll + cfg + rtcm))
+        self.port.release()
+        self.assertIsNone(fut.result(timeout=1))
+        self.assertTrue(self.manager.flush(timeout=1))
+        self.assertEqual(self.port.writes, [b'first', rtcm + cfg + poll])
+        self.assertEqual(self.manager.transmitBacklog(), 0)
+
+    def testCancelledFutureIsNotWritten(self):
+        self.manager.send(b'first')
+        fut = self.manager.send(b'abc', future=True)
+        fut.cancel()
+        self.manager.send(b'def')
+        self.port.release()
+        self.assertTrue(self.manager.flush(timeout=1))
+        self.assertEqual(b''.join(self.port.writes), b'firstdef')
+
+    def testSendWithoutRun(self):
+        port = FakePort()
+        manager = QuietManager(port)
+        fut = manager.send(b'abc', future=True)
+        self.assertIsNone(fut.result(timeout=1))
+        self.assertEqual(port.writes, [b'abc'])
+        self.assertFalse(manager.is_alive())
+
+    def testSendAfterEOF(self):
+        manager = QuietManager(io.BytesIO(b''), eofTimeout=0)
+        manager.start()
+        manager.join(timeout=1)
+        with self.assertRaises(TransmitQueueClosed):
+            manager.send(b'abc')
+
+    def testSendThenShutdown(self):
+        cfg = UBX.CFG.PMS.Set(powerSetupValue=2).serialize()
+        self.manager.start()
+        self.manager.send(b'first')
+        self.assertTrue(self.port.holding.wait(1))
+        fut = self.manager.send(cfg, future=True)
+        self.manager.shutdown()
+        threading.Timer(0.1, self.port.release).start()
+        self.manager.join(timeout=2)
+        self.assertIsNone(fut.result(timeout=0))
+        self.assertEqual(self.port.writes, [b'first', cfg])
+
+    def testDrainTimeout(self):
+        self.manager.drainTimeout = 0.05
+        self.manager.start()
+        self.manager.send(b'first')
+        self.assertTrue(self.port.holding.wait(1))
+        fut = self.manager.send(b'abc', future=True)
+        self.manager.shutdown()
+        self.manager.join(timeout=2)
+        self.assertTrue(fut.cancelled())
+        self.port.release()
+
+    def testWriteErrorIsReported(self):
+        manager = WriteErrorManager(FailingPort())
+        manager.send(b'abc')
+        fut = manager.send(b'def', future=True)
+        with self.assertRaises(OSError):
+            fut.result(timeout=1)
+        self.assertTrue(manager.flush(timeout=1))
+        self.assertEqual(b''.join(d for (d, _) in manager.writeErrors), b'abcdef')
+
+
+class CorrelationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.port = FakeReceiver(nak=[0x11])
+        self.manager = QuietManager(self.port)
+        self.manager.start()
+
+    def tearDown(self):
+        self.manager.shutdown()
+        self.manager.join(timeout=1)
+
+    def testConcurrentPolls(self):
+        t0 = time.monotonic()
+        ver = self.manager.poll(UBX.MON.VER)
+        rate = self.manager.poll(UBX.CFG.RATE)
+        self.assertEqual(rate.result(timeout=1).measRate, 1000)
+        self.assertEqual(ver.result(timeout=1).hwVersion, "00080000")
+        self.assertLess(time.monotonic() - t0, 0.5)
+
+    def testSetAckNak(self):
+        rate = self.manager.poll(UBX.CFG.RATE).result(timeout=1)
+        rate.measRate = 200
+        ack = self.manager.set(rate)
+        nak = self.manager.set(UBX.CFG.RXM(b'\x00\x01'))
+        self.assertTrue(isACK(ack.result(timeout=1)))
+        self.assertTrue(isNAK(nak.result(timeout=1)))
+        self.assertEqual(self.manager._correlator.pending(), 0)
+
+    def testTimeoutAndRetry(self):
+        fut = self.manager.poll(UBX.NAV.PVT, timeout=0.05, retries=1)
+        with self.assertRaises(TimeoutError):
+            fut.result(timeout=1)
+        polls = [f for f in splitFrames(b''.join(self.port.writes))
+                 if f[2:4] == b'\x01\x07']
+        self.assertEqual(len(polls), 2)
+
+    def testClosed(self):
+        fut = self.manager.poll(UBX.NAV.PVT, timeout=10)
+        self.manager.shutdown()
+        self.manager.join(timeout=2)
+        self.assertIsInstance(fut.exception(timeout=1), CorrelatorClosed)
+        with self.assertRaises(CorrelatorClosed):
+            self.manager.poll(UBX.MON.VER)
+        with self.assertRaises(TransmitQueueClosed):    # the base class
+            self.manager.set(UBX.CFG.PMS.Set(powerSetupValue=1))
+
+    def testConfigTransaction(self):
+        rate = UBX.CFG.RATE(FakeReceiver.RESPONSES[(0x06, 0x08)])
+        pms = UBX.CFG.PMS.Set(powerSetupValue=1)
+        rxm = UBX.CFG.RXM(b'\x08\x01')
+        result = ConfigTransaction(self.manager, [rate, pms, rxm]).apply()
+        self.assertEqual(result.unchanged, [rate])
+        self.assertEqual(result.applied, [pms])
+        self.assertEqual(result.naked, [rxm])
+        self.assertFalse(result.ok)
+        sets = [f for f in splitFrames(b''.join(self.port.writes))
+                if f[2] == 0x06 and f[4] > 0]
+        self.assertEqual(len(sets), 2)
+        result = ConfigTransaction(self.manager, [rate, pms]).apply()
+        self.assertEqual(result.unchanged, [rate, pms])
+        self.assertTrue(result.ok)
+
+
+GGA = b'$GPGGA,092750.000,5321.6802,N,00630.3372,W,1,8,1.03,61.7,M,55.2,M,,*76'
+RMC = b'$GNRMC,001031.00,A,4404.13993,N,12118.86023,W,0.146,,100117,,,A*7B'
+
+
+class FramerTest(unittest.TestCase):
+
+    def testChunking(self):
+        ver = UBXMessage.make(0x0A, 0x04, FakeReceiver.RESPONSES[(0x0A, 0x04)])
+        ack = UBXMessage.make(0x05, 0x01, b'\x06\x08')
+        bad = bytearray(ack)
+        bad[-1] ^= 0xff
+        stream = (b'\x00\xb5junk' + GGA + b'\r\n' + ver + bytes(bad) + ack +
+                  GGA[:-1] + b'0\r\n' + RMC + b'\r\n')
+        expected = [(FrameKind.JUNK, b'\x00\xb5junk'), (FrameKind.NMEA, GGA),
+                    (FrameKind.UBX, ver), (FrameKind.UBX_BAD, bytes(bad)),
+                    (FrameKind.UBX, ack), (FrameKind.NMEA_BAD, GGA[:-1] + b'0'),
+                    (FrameKind.NMEA, RMC)]
+        for size in (1, 3, 64, len(stream)):
+            framer = UBXFramer()
+            frames = []
+            for i in range(0, len(stream), size):
+                for kind, frame in framer.feed(stream[i:i+size]):
+                    if kind == FrameKind.JUNK and frames and frames[-1][0] == kind:
+                        frames[-1] = (kind, frames[-1][1] + frame)
+                    else:
+                        frames.append((kind, frame))
+            self.assertEqual(frames, expected)
+            self.assertEqual(framer.pending(), 0)
+
+    def testImplausibleLength(self):
+        ack = UBXMessage.make(0x05, 0x01, b'\x06\x08')
+        frames = UBXFramer(maxUBXLength=100).feed(b'\xb5\x62\x01\x07\xff\xff' + ack)
+        self.assertEqual(frames[-1], (FrameKind.UBX, ack))
+
+    def testLongNMEA(self):
+        body = b'PUBX,03,24,' + b','.join(
+            b'%d,U,123,45,40,000' % svid for svid in range(1, 25))
+        pubx = b'$%s*%02X' % (body, checksumNMEA(body))
+        self.assertGreater(len(pubx), 400)
+        for size in (1, 64, len(pubx) + 2):
+            framer = UBXFramer()
+            stream = pubx + b'\r\n' + GGA + b'\r\n'
+            frames = [f for i in range(0, len(stream), size)
+                      for f in framer.feed(stream[i:i+size])]
+            self.assertEqual(frames, [(FrameKind.NMEA, pubx), (FrameKind.NMEA, GGA)])
+        manager = QuietManager(None, maxNMEALength=100)
+        self.assertEqual([k for (k, _) in manager._framer.feed(pubx + b'\r\n')][0],
+                         FrameKind.JUNK)
+
+    def testArrivalTimes(self):
+        ack = UBXMessage.make(0x05, 0x01, b'\x06\x08')
+        framer = UBXFramer()
+        self.assertEqual(framer.feedTimed(ack + ack[:3], 1), [(FrameKind.UBX, ack, 1)])
+        self.assertEqual(framer.feedTimed(ack[3:5], 2), [])
+        self.assertEqual(framer.feedTimed(ack[5:] + GGA + b'\r\n$', 3),
+                         [(FrameKind.UBX, ack, 1), (FrameKind.NMEA, GGA, 3)])
+        self.assertEqual(framer.feedTimed(RMC[1:], 4), [(FrameKind.NMEA, RMC, 3)])
+
+    def testManagerTimes(self):
+        ack = UBXMessage.make(0x05, 0x01, b'\x06\x08')
+        manager = QuietManager(None)
+        manager.wallClock = True
+        manager.feed(ack[:4], 100)
+        manager.feed(ack[4:] + ack, 200)
+        self.assertEqual([m.rxTime for m in manager.received], [100, 200])
+        offset = time.time_ns() - time.monotonic_ns()
+        self.assertLess(abs(manager.received[0].rxWallTime - 100 - offset), 10**8)
+
+
+class DaemonTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "ubx.sock")
+        self.port = FakeReceiver()
+        self.daemon = UBXDaemon(self.port, self.path)
+        self.daemon.start()
+        self.conns = []
+
+    def tearDown(self):
+        for conn in self.conns:
+            conn.close()
+        self.daemon.shutdown()
+        self.daemon.join(timeout=1)
+        self.tmp.cleanup()
+        self.assertFalse(os.path.exists(self.path))
+
+    def connect(self, subscription):
+        conn = DaemonConnection(self.path, subscription)
+        self.conns.append(conn)
+        manager = QuietManager(conn)
+        manager.start()
+        return manager
+
+    def waitForSubscriptions(self, specs):
+        t0 = time.monotonic()
+        while sorted(c[0] for c in self.daemon.clients()) != sorted(specs):
+            self.assertLess(time.monotonic() - t0, 1)
+            time.sleep(0.001)
+
+    def testSocketMode(self):
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def testPollsFromSeveralClients(self):
+        managers = [self.connect('05,06,0A') for _ in range(3)]
+        polls = [m.poll(UBX.MON.VER) for m in managers]
+        for poll in polls:
+            self.assertEqual(poll.result(timeout=1).hwVersion, "00080000")
+        ack = managers[0].set(UBX.CFG.PMS.Set(powerSetupValue=1))
+        self.assertTrue(isACK(ack.result(timeout=1)))
+
+    def testSubscriptions(self):
+        nmea = []
+        gga = self.connect('$GGA')
+        gga.onNMEA = nmea.append
+        ubx = self.connect('0A:04')
+        ubx.onNMEA = nmea.append
+        self.waitForSubscriptions(['$GGA', '0A:04'])
+        self.port.feed(RMC + b'\r\n' + GGA + b'\r\n' +
+                       UBXMessage.make(0x05, 0x01, b'\x06\x08') +
+                       UBXMessage.make(0x0A, 0x04, FakeReceiver.RESPONSES[(0x0A, 0x04)]))
+        t0 = time.monotonic()
+        while not (nmea and ubx.received) and time.monotonic() - t0 < 1:
+            time.sleep(0.001)
+        self.assertEqual(nmea, [GGA[1:-3].decode()])
+        self.assertEqual([(m._class, m._id) for m in ubx.received], [(0x0A, 0x04)])
+
+    def testNothingBeforeSubscription(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        sock.settimeout(0.1)
+        try:
+            self.waitForSubscriptions([''])
+            self.port.feed(GGA + b'\r\n')
+            with self.assertRaises(socket.timeout):
+                sock.recv(100)
+            sock.sendall(b'S\x00\x04\x00NMEA')
+            self.waitForSubscriptions(['NMEA'])
+            self.port.feed(RMC + b'\r\n')
+            self.assertEqual(sock.recv(100), RMC + b'\r\n')
+        finally:
+            sock.close()
+
+    def testLargeWriteIsOneEntry(self):
+        frame = UBXMessage.make(0x06, 0x86, bytes(range(256)) * 255 + bytes(255))
+        self.assertGreater(len(frame), 0xffff)
+        conn = DaemonConnection(self.path)
+        self.conns.append(conn)
+        conn.sendall(frame)
+        self.assertTrue(self.waitFor(lambda: frame in self.port.writes))
+
+    def waitFor(self, condition):
+        t0 = time.monotonic()
+        while not condition():
+            if time.monotonic() - t0 > 1:
+                return False
+            time.sleep(0.001)
+        return True
+
+
+def rtcmFrame(payload):
+    """RTCM3 frame of payload."""
+    frame = bytes([0xd3, len(payload) >> 8, len(payload) & 0xff]) + payload
+    return frame + crc24q(frame).to_bytes(3, 'big')
+
+
+class ServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.port = FakePort()
+        self.servers = []
+        self.socks = []
+
+    def tearDown(self):
+        for sock in self.socks:
+            sock.close()
+        for server in self.servers:
+            server.shutdown()
+            server.join(timeout=1)
+
+    def serve(self, **kwargs):
+        server = UBXServer(self.port, ('127.0.0.1', 0), **kwargs)
+        server.start()
+        self.servers.append(server)
+        return server
+
+    def connect(self, server, rcvbuf=None):
+        sock = socket.socket()
+        if rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        sock.connect(server.address)
+        self.socks.append(sock)
+        t0 = time.monotonic()
+        while len(server.clients()) < len(self.socks):
+            self.assertLess(time.monotonic() - t0, 1)
+            time.sleep(0.001)
+        return sock
+
+    def frames(self, n):
+        pvt = UBXMessage.make(0x01, 0x07, bytes(92))
+        ver = UBXMessage.make(0x0A, 0x04, bytes(1000))
+        return [pvt if i % 2 else ver for i in range(n)]
+
+    def readAll(self, sock, size):
+        """Read size bytes, or until nothing arrives for 0.3 s."""
+        data = bytearray()
+        sock.settimeout(0.3)
+        while len(data) < size:
+            try:
+                chunk = sock.recv(65536)
+            except socket.timeout:
+                break
+            if not chunk:
+                break
+            data += chunk
+        return bytes(data)
+
+    def testLocalhostByDefault(self):
+        server = UBXServer(self.port)
+        server.start()
+        self.servers.append(server)
+        self.assertEqual(server.address[0], '127.0.0.1')
+
+    def testCorrectionFramer(self):
+        self.assertEqual(crc24q(b'\xd3\x00\x00'), 0x47ea4b)
+        rtcm = rtcmFrame(bytes(range(100)))
+        ubx = UBX.CFG.PMS.Set(powerSetupValue=2).serialize()
+        bad = rtcm[:-1] + bytes([rtcm[-1] ^ 1])
+        framer = CorrectionFramer()
+        self.assertEqual(framer.feed(b'xy' + rtcm[:50]), [])
+        self.assertEqual(framer.feed(rtcm[50:] + bad + ubx[:3]), [rtcm])
+        self.assertEqual(framer.feed(ubx[3:]), [ubx])
+        self.assertEqual(framer.junk, 2 + len(bad))
+
+    def testWritableClientsDoNotInterleave(self):
+        server = self.serve(writable=True)
+        a, b = self.connect(server), self.connect(server)
+        frameA, frameB = rtcmFrame(b'A' * 300), rtcmFrame(b'B' * 300)
+        a.sendall(frameA[:100])
+        time.sleep(0.05)
+        b.sendall(frameB[:100])
+        time.sleep(0.05)
+        a.sendall(frameA[100:])
+        b.sendall(frameB[100:])
+        t0 = time.monotonic()
+        while len(b''.join(self.port.writes)) < 2 * len(frameA):
+            self.assertLess(time.monotonic() - t0, 1)
+            time.sleep(0.001)
+        self.assertIn(b''.join(self.port.writes), (frameA + frameB, frameB + frameA))
+
+    def testSlowClientIsEvicted(self):
+        server = self.serve(maxBuffer=256 << 10, overflow='evict', sendBuffer=4096)
+        fast = self.connect(server)
+        self.connect(server, rcvbuf=4096)   # never reads
+        frames = self.frames(1200)
+        stream = b''.join(frames)
+        reader = threading.Thread(
+            target=lambda: setattr(self, 'received', self.readAll(fast, len(stream))))
+        reader.start()
+        for i in range(0, len(frames), 10):
+            self.port.feed(b''.join(frames[i:i+10]))
+            time.sleep(0.001)
+        reader.join(timeout=5)
+        self.assertEqual(self.received, stream)
+        self.assertEqual(server.evicted, 1)
+        self.assertEqual(len(server.clients()), 1)
+
+    def testLaggingClientKeepsSelectedFrames(self):
+        server = self.serve(maxBuffer=64 << 10, lagging='01:07', sendBuffer=4096)
+        sock = self.connect(server, rcvbuf=4096)
+        frames = self.frames(2000)
+        self.port.feed(b''.join(frames))
+        time.sleep(0.2)
+        (_, buffered, _), = server.clients()
+        self.assertLessEqual(buffered, 64 << 10)
+        received = splitFrames(self.readAll(sock, len(b''.join(frames))))
+        (_, _, dropped), = server.clients()
+        self.assertGreater(dropped, 0)
+        self.assertEqual(len(received) + dropped, len(frames))
+        self.assertIn(frames[1], received[-10:])
+        self.assertNotIn(frames[0], received[-10:])
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = QuietManager(None)
+        self.manager.onUBXError = lambda *args: None
+        self.manager.onNMEA = lambda buffer: None
+        ack = UBXMessage.make(0x05, 0x01, b'\x06\x08')
+        bad = bytearray(ack)
+        bad[-1] ^= 0xff
+        self.manager.feed(
+            b'junk' + ack + ack + bytes(bad) + GGA + b'\r\n' +
+            UBXMessage.make(0x01, 0xff, b'') +          # unknown id
+            UBXMessage.make(0x05, 0x01, b'\x06'))       # too short
+
+    def testStats(self):
+        stats = self.manager.stats()
+        self.assertEqual(stats['bytesRead'], 4 + 3 * 10 + len(GGA) + 2 + 8 + 9)
+        self.assertEqual(stats['frames']['UBX'], 4)
+        self.assertEqual(stats['frames']['NMEA'], 1)
+        self.assertEqual(stats['checksumErrors'], {'UBX': 1, 'NMEA': 0})
+        self.assertEqual(stats['junkBytes'], 4)
+        self.assertEqual(stats['messages'], {'ACK-ACK': 3, '01-FF': 1})
+        self.assertEqual(stats['unknownMessages'], {'01-FF': 1})
+        self.assertEqual(stats['parseErrors'], {'ACK-ACK': 1})
+        self.assertEqual(stats['parseTime']['ACK-ACK']['count'], 2)
+        self.assertEqual(stats['txBacklog'], 0)
+
+    def testSnapshotWhileReceiving(self):
+        manager = QuietManager(None)
+        manager.onUBXError = lambda *args: None
+        frames = [UBXMessage.make(0x01, i, b'') for i in range(256)]
+        feeder = threading.Thread(target=lambda: [manager.feed(f) for f in frames * 20])
+        feeder.start()
+        while feeder.is_alive():
+            manager.stats()
+        feeder.join()
+        stats = manager.stats()
+        self.assertEqual(stats['frames']['UBX'], 256 * 20)
+        self.assertEqual(sum(stats['messages'].values()), 256 * 20)
+
+    def testPrometheus(self):
+        text = prometheus(self.manager.stats())
+        self.assertIn('ubx_messages_total{message="ACK-ACK"} 3\n', text)
+        self.assertIn('ubx_checksum_errors_total{protocol="UBX"} 1\n', text)
+        self.assertIn('ubx_parse_seconds_bucket{message="ACK-ACK",le="+Inf"} 2\n', text)
+        self.assertIn('ubx_parse_seconds_count{message="ACK-ACK"} 2\n', text)
+
+    def testHTTP(self):
+        from urllib.request import urlopen
+        server = MetricsServer(self.manager, ('127.0.0.1', 0))
+        server.start()
+        try:
+            url = "http://127.0.0.1:{}".format(server.server_address[1])
+            with urlopen(url + "/metrics", timeout=1) as r:
+                self.assertIn(b'ubx_junk_bytes_total 4', r.read())
+            with urlopen(url + "/stats", timeout=1) as r:
+                self.assertIn(b'"bytesRead"', r.read())
+        finally:
+            server.stop()
+
+
+class TraceTest(unittest.TestCase):
+
+    def testQueueStages(self):
+        port = FakePort()
+        queue = UBXQueue(port)
+        tracer = Tracer()
+        queue.setTracer(tracer)
+        queue.start()
+        try:
+            for _ in range(5):
+                port.feed(UBXMessage.make(0x05, 0x01, b'\x06\x08'))
+                msg = queue.get(timeout=1)
+            stamps = [msg._trace[s] for s in
+                      ('read', 'framed', 'parsed', 'dispatched', 'consumed')]
+            self.assertEqual(stamps, sorted(stamps))
+            report = tracer.report()['ACK-ACK']
+            self.assertEqual(report['consumed']['n'], 5)
+            self.assertNotIn('handled', report)
+            self.assertLessEqual(report['framed']['p50'], report['consumed']['p50'])
+            self.assertIn('ACK-ACK', str(tracer))
+        finally:
+            queue.shutdown()
+
+    def testDisabled(self):
+        manager = QuietManager(None)
+        manager.feed(UBXMessage.make(0x05, 0x01, b'\x06\x08'))
+        self.assertFalse(hasattr(manager.received[0], '_trace'))
+        manager.setTracer(Tracer())
+        manager.feed(UBXMessage.make(0x05, 0x01, b'\x06\x08'))
+        self.assertIn('handled', manager.received[1]._trace)
+
+
+class StoreTest(unittest.TestCase):
+
+    def testLatestAndHistory(self):
+        manager = QuietManager(None)
+        store = manager.store
+        self.assertIsNone(store.latest(UBX.ACK.ACK))
+        store.keep(UBX.ACK.ACK, 3)
+        for i in range(5):
+            manager.feed(UBXMessage.make(0x05, 0x01, bytes([0x06, i])), rxTime=i * 10**9)
+        manager.feed(UBXMessage.make(0x05, 0x00, b'\x06\x08'), rxTime=5 * 10**9)
+        self.assertIs(store.latest(UBX.ACK.ACK), manager.received[4])
+        self.assertEqual(store.latest(UBX.ACK.NAK).msgID, 0x08)
+        self.assertEqual(store.count(UBX.ACK.ACK), 5)
+        self.assertEqual([m.msgID for m in store.history(UBX.ACK.ACK)], [2, 3, 4])
+        self.assertEqual([m.msgID for m in store.history(UBX.ACK.ACK, seconds=1)], [3, 4])
+        self.assertEqual(store.history(UBX.ACK.NAK), [])
+        store.clear()
+        self.assertEqual(store.latest(UBX.ACK.ACK, 'none'), 'none')
+
+    def testWait(self):
+        port = FakePort()
+        manager = QuietManager(port)
+        manager.start()
+        try:
+            self.assertIsNone(manager.store.wait(UBX.ACK.ACK, timeout=0.05))
+            timer = threading.Timer(
+                0.05, port.feed, [UBXMessage.make(0x05, 0x01, b'\x06\x08')])
+            timer.start()
+            msg = manager.store.wait(UBX.ACK.ACK, timeout=1)
+            self.assertEqual(msg.msgID, 0x08)
+            self.assertEqual(manager.store._waiters, 0)
+        finally:
+            manager.shutdown()
+            manager.join(timeout=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Unit tests for the NMEA sentences."""
+
+import datetime
+import io
+import os
+import random
+import tempfile
+import unittest
+from ubx import NMEA, UBXManager, parseNMEA
+from ubx.UBXFramer import checksumNMEA
+from ubx.parse_NMEA_log import NMEAChkSum, convertBlock, convertLog
+
+GGA = "GPGGA,092725.00,4717.11399,N,00833.91590,E,1,08,1.01,499.6,M,48.0,M,,"
+RMC = "GNRMC,083559.00,A,4717.11437,S,00833.91522,W,0.004,77.52,091202,,,A,V"
+GSV = "GPGSV,3,1,10,23,38,230,44,29,71,156,47,07,29,116,,08,09,081,36,1"
+
+
+def sentence(body):
+    return "${}*{:02X}\r\n".format(body, checksumNMEA(body.encode())).encode()
+
+
+class NMEATest(unittest.TestCase):
+
+    def testGGA(self):
+        gga = parseNMEA(GGA)
+        self.assertIsInstance(gga, NMEA.GGA)
+        self.assertEqual((gga.talker, gga.type), ('GP', 'GGA'))
+        self.assertNotIn('fields', gga.__dict__)     # not split yet
+        self.assertAlmostEqual(gga.lat, 47 + 17.11399 / 60)
+        self.assertAlmostEqual(gga.lon, 8 + 33.91590 / 60)
+        self.assertEqual(gga.time, datetime.time(9, 27, 25))
+        self.assertEqual((gga.quality, gga.numSV, gga.alt), (1, 8, 499.6))
+        self.assertIsNone(gga.diffAge)
+        self.assertEqual(gga[0], 'GPGGA')
+
+    def testRMC(self):
+        rmc = parseNMEA(sentence(RMC).decode().strip())
+        self.assertEqual((rmc.talker, rmc.status, rmc.posMode), ('GN', 'A', 'A'))
+        self.assertLess(rmc.lat, 0)
+        self.assertLess(rmc.lon, 0)
+        self.assertEqual(rmc.date, datetime.date(2002, 12, 9))
+        self.assertIsNone(rmc.mv)
+
+    def testGSVAndOthers(self):
+        gsv = parseNMEA(GSV)
+        self.assertEqual(gsv.numSV, 10)
+        self.assertEqual(gsv.satellites[2], (7, 29, 116, None))
+        self.assertEqual(gsv.signalId, 1)
+        gsa = parseNMEA("GNGSA,A,3,23,29,07,,,,,,,,,,1.94,1.18,1.54,1")
+        self.assertEqual((gsa.svids, gsa.VDOP, gsa.systemId), ([23, 29, 7], 1.54, 1))
+        pubx = parseNMEA("PUBX,00,081350.00")
+        self.assertEqual((type(pubx), pubx.talker, pubx.type), (NMEA.NMEASentence, 'P', 'UBX'))
+        self.assertIsNone(parseNMEA("GPVTG,,T,,M,,N").sogk)
+
+
+class HandlerTest(unittest.TestCase):
+
+    class Manager(UBXManager):
+        def onNMEA(self, buffer):
+            pass
+
+    def testDispatch(self):
+        manager = self.Manager(None)
+        calls = []
+        manager.addNMEAHandler(lambda s: calls.append(('GGA', s.talker)), 'GGA')
+        manager.addNMEAHandler(lambda s: calls.append(('GN', s.type)), talker='GN')
+        manager.addNMEAHandler(lambda s: calls.append(('*', s.rxTime)))
+        manager.feed(sentence(GGA) + sentence(RMC), 7)
+        self.assertEqual(calls, [('GGA', 'GP'), ('*', 7), ('GN', 'RMC'), ('*', 7)])
+        handler = calls.append
+        manager.addNMEAHandler(handler, 'GSV')
+        manager.removeNMEAHandler(handler, 'GSV')
+        self.assertNotIn(('GSV', None), manager._nmeaHandlers)
+
+
+class ParseLogTest(unittest.TestCase):
+
+    lines = ["2024-01-01T00:00:{:02d}.000000 {}".format(i % 60, body)
+             for i, body in enumerate([GGA, RMC, GSV] * 300)]
+
+    def testBlock(self):
+        data = "\n".join(self.lines[:3] + ["garbage", "", "a b c"] + self.lines[3:5]).encode()
+        out, lines, bad = convertBlock(data + b'\r\n')
+        self.assertEqual((lines, bad), (8, 3))
+        expected = ["${}*{}".format(body, NMEAChkSum(body))
+                    for body in [GGA, RMC, GSV, GGA, RMC]]
+        self.assertEqual(out.decode().splitlines(), expected)
+
+    @staticmethod
+    def baseline(data):
+        """The original parse_NMEA_log on data: (output, bad lines)."""
+        out, bad = [], 0
+        for line in io.TextIOWrapper(io.BytesIO(data), 'ascii').readlines():
+            try:
+                [dt, NMEA] = line.strip().split(" ")
+            except ValueError:
+                bad += 1
+            else:
+                out.append("${}*{}\n".format(NMEA, NMEAChkSum(NMEA)))
+        return "".join(out).encode(), bad
+
+    def testMatchesBaseline(self):
+        data = (b'2024-01-01T00:00:00 GPGGA,1,2 \n'
+                b'2024-01-01T00:00:00 GPGGA,1,2\t\r\n'
+                b'  2024-01-01T00:00:00 GPRMC,3\n'
+                b'\t2024 GPRMC,\t4\x0b\x0c\r'
+                b'\r\n \n2024  GPGSV\n2024 GPGSV \x1f')
+        out, lines, bad = convertBlock(data)
+        self.assertEqual((out, bad), self.baseline(data))
+        self.assertEqual(out.count(b'\n'), 5)
+        rng = random.Random(1)
+        alphabet = b'ab,.  \t\r\n\x0b\x0c\x1c'
+        for _ in range(300):
+            data = bytes(rng.choice(alphabet) for _ in range(rng.randrange(1, 60)))
+            out, lines, bad = convertBlock(data)
+            self.assertEqual((out, bad), self.baseline(data), data)
+
+    def testWorkersKeepOrder(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            name = os.path.join(tmp, "nmea.log")
+            with open(name, "w") as f:
+                f.write("\n".join(self.lines) + "\n")
+            single, parallel = io.BytesIO(), io.BytesIO()
+            self.assertEqual(convertLog(name, single, blockSize=1000)[1:], (900, 0))
+            self.assertEqual(convertLog(name, parallel, jobs=2, blockSize=1000)[1:], (900, 0))
+        self.assertEqual(parallel.getvalue(), single.getvalue())
+        self.assertEqual(single.getvalue().count(b'\n'), 900)
+
+
+if __name__ == '__main__':
+    unittest.main()
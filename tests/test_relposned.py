@@ -5,6 +5,10 @@ from pathlib import Path
 import time
 import queue
 import tempfile
+import numpy as np
+from ubx import UBX
+from ubx.UBXColumns import collect
+from ubx.UBXBaseline import baselines, BaselineMonitor, Welford, CircularStats, CARR_FIXED
 
 class RelposnedTest(unittest.TestCase):
     def test_binfile(self):
@@ -49,6 +53,58 @@ class RelposnedTest(unittest.TestCase):
         testfile.close()
         ubxq.join()
 
+    def test_batch(self):
+        data = Path(__file__).parent.joinpath("testdata", "relposned_test.bin").read_bytes()
+        rel = collect(data, UBX.NAV.RELPOSNED)
+        objs = [UBX.NAV.RELPOSNED(bytes(r)) for r in rel]   # payload bytes
+        b = baselines(rel)
+        self.assertEqual(len(objs), 4)
+        np.testing.assert_allclose(b['ned'], [o.relPosNED_m for o in objs])
+        np.testing.assert_allclose(b['length'], [o.length_m for o in objs])
+        np.testing.assert_allclose(b['heading'], [o.heading_deg for o in objs])
+        np.testing.assert_allclose(b['pitch'], [o.pitch_deg for o in objs])
+        self.assertEqual(b['carrSoln'].tolist(), [(o.flags >> 3) & 3 for o in objs])
+        self.assertEqual(b['relPosValid'].tolist(), [bool(o.flags & 4) for o in objs])
+
+        single, batch = BaselineMonitor(), BaselineMonitor()
+        for o in objs:
+            single.add(o)
+        batch.addBatch(rel)
+        fixed = int((b['carrSoln'] == CARR_FIXED).sum())
+        self.assertEqual((single.length.n, batch.length.n), (fixed, fixed))
+        self.assertEqual(single.skipped, 4 - fixed)
+        self.assertAlmostEqual(single.length.mean, batch.length.mean)
+        self.assertAlmostEqual(single.heading.mean, batch.heading.mean)
+
+    def test_vertical(self):
+        data = Path(__file__).parent.joinpath("testdata", "relposned_test.bin").read_bytes()
+        rel = collect(data, UBX.NAV.RELPOSNED)[-1:].copy()
+        rel['relPosN'], rel['relPosE'], rel['relPosD'] = 0, 0, -100
+        rel['relPosHPN'], rel['relPosHPE'], rel['relPosHPD'] = 0, 0, -50
+        rel['relPosLength'], rel['relPosHPLength'] = 100, 49
+        rel['flags'] = 0x04 | CARR_FIXED << 3
+        single, batch = BaselineMonitor(), BaselineMonitor()
+        single.add(UBX.NAV.RELPOSNED(bytes(rel[0])))
+        batch.addBatch(rel)
+        self.assertEqual(baselines(rel)['pitch'].tolist(), [90.0])
+        self.assertEqual((single.pitch.mean, batch.pitch.mean), (90.0, 90.0))
+
+    def test_accumulators(self):
+        xs = np.random.default_rng(2).normal(1.5, 0.01, 1000)
+        one, batch = Welford(), Welford()
+        for x in xs[:10]:
+            one.add(x)
+        batch.addBatch(xs[:10])
+        batch.addBatch(xs[10:])
+        self.assertAlmostEqual(one.variance, np.var(xs[:10], ddof=1))
+        self.assertAlmostEqual(batch.mean, xs.mean())
+        self.assertAlmostEqual(batch.std, np.std(xs, ddof=1))
+        heading = CircularStats()
+        heading.addBatch([359.0, 1.0, 0.5])
+        heading.add(359.5)
+        self.assertAlmostEqual((heading.mean + 180) % 360 - 180, 0.0)
+        self.assertLess(heading.std, 1.0)
+
 
 
 if __name__ == '__main__':
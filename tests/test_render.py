@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Unit tests for the text rendering."""
+
+import io
+import random
+import unittest
+from ubx import UBX
+from ubx.UBXGenerator import buildPayload
+from ubx.UBXRender import render, TextLog
+
+
+def pvt(**values):
+    return UBX.NAV.PVT(buildPayload(
+        UBX.NAV.PVT, {k: (lambda n, v=v: v) for k, v in values.items()},
+        rng=random.Random(1)))
+
+
+class RenderTest(unittest.TestCase):
+
+    def testText(self):
+        ack = UBX.ACK.ACK(b'\x06\x08')
+        self.assertEqual(str(ack), "ACK-ACK:\n  clsID=0x06\n  msgID=0x08")
+        self.assertEqual(render(ack, compact=True), "ACK-ACK clsID=6 msgID=8")
+        svinfo = UBX.NAV.SVINFO(buildPayload(UBX.NAV.SVINFO, {'flags': [5]}, repeats=2))
+        line = render(svinfo, compact=True)
+        self.assertIn(" flags_2=0x5 ", line)
+        self.assertNotIn("\n", line)
+        self.assertEqual(render("GPGGA,,,"), "GPGGA,,,")
+
+    def testUTCString(self):
+        for nano in (0, 1, 499, 123456789, 999999499, 999999500, -5):
+            msg = pvt(year=2024, month=2, day=28, hour=23, min=59, sec=59, nano=nano)
+            self.assertEqual(msg.UTC_str, msg.UTC.isoformat()[:21])
+        self.assertIn("2024-02-28T23:59:59.1z", pvt(
+            year=2024, month=2, day=28, hour=23, min=59, sec=59, nano=123456789).summary())
+
+    def testTextLog(self):
+        out = io.StringIO()
+        log = TextLog(out, compact=True, interval=10, maxPending=3)
+        for _ in range(5):
+            log.write(UBX.ACK.ACK(b'\x06\x08'))
+        log.write("GNTXT")
+        log.close()
+        self.assertEqual(out.getvalue(), "ACK-ACK clsID=6 msgID=8\n" * 3)
+        self.assertEqual((log.written, log.dropped), (3, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Unit tests for the replay engine."""
+
+import io
+import socket
+import struct
+import threading
+import time
+import unittest
+from pathlib import Path
+from ubx import UBXManager, UBXFramer, FrameKind
+from ubx.UBXMessage import UBXMessage
+from ubx.UBXReplay import (Replay, ManagerSink, PtySink, TCPSink, iTOW,
+                           readCapture, readNMEALog)
+
+GGA = b'$GPGGA,092750.000,5321.6802,N,00630.3372,W,1,8,1.03,61.7,M,55.2,M,,*76\r\n'
+
+
+def pvt(ms):
+    return UBXMessage.make(0x01, 0x07, struct.pack('<I', ms) + bytes(88))
+
+
+class Sink:
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append((time.monotonic(), data))
+
+
+class Collector(UBXManager):
+
+    def __init__(self):
+        UBXManager.__init__(self, None)
+        self.received = []
+
+    def onUBX(self, obj):
+        self.received.append(obj)
+
+    def onNMEA(self, buffer):
+        self.received.append(buffer)
+
+
+class ReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        # 10 epochs 100 ms apart, each a PVT and a GGA without iTOW
+        self.capture = [(None, f) for ms in range(500000, 501000, 100)
+                        for f in (pvt(ms), GGA)]
+
+    def testITOWPacing(self):
+        sink = Sink()
+        stats = Replay(self.capture, sink, speed=10).run()
+        self.assertEqual(len(sink.writes), 10)     # one write per epoch
+        self.assertEqual(sink.writes[0][1], pvt(500000) + GGA)
+        elapsed = sink.writes[-1][0] - sink.writes[0][0]
+        self.assertAlmostEqual(elapsed, 0.09, delta=0.03)
+        self.assertAlmostEqual(stats.captureSeconds, 0.9)
+        self.assertEqual(stats.frames, 20)
+        self.assertEqual(stats.bytes, sum(len(f) for (_, f) in self.capture))
+
+    def testUnthrottled(self):
+        sink = Sink()
+        stats = Replay(self.capture * 100, sink, speed=0).run()
+        self.assertLess(stats.seconds, 0.5)
+        self.assertEqual(b''.join(d for (_, d) in sink.writes),
+                         b''.join(f for (_, f) in self.capture * 100))
+
+    def testHostClockAndMaxGap(self):
+        log = io.StringIO(
+            "2020-10-08T10:00:00.000000 GPGGA,1\n"
+            "garbage\n"
+            "2020-10-08T10:00:00.050000 GPGGA,2\n"
+            "2020-10-08T11:00:00.000000 GPGGA,3\n")
+        capture = list(readNMEALog(log))
+        self.assertEqual(UBXFramer().feed(capture[0][1]),
+                         [(FrameKind.NMEA, capture[0][1][:-2])])
+        sink = Sink()
+        stats = Replay(capture, sink, clock='host', maxGap=0.05).run()
+        self.assertEqual(len(sink.writes), 3)
+        self.assertAlmostEqual(stats.captureSeconds, 0.1, places=3)
+        self.assertGreaterEqual(stats.seconds, 0.09)
+
+    def testManagerSink(self):
+        path = Path(__file__).parent.joinpath("testdata", "relposned_test.bin")
+        capture = list(readCapture(str(path)))
+        self.assertEqual(len(capture), 8)
+        self.assertEqual([iTOW(f) for (_, f) in capture[:2]], [353247000] * 2)
+        manager = Collector()
+        Replay(capture + self.capture[:2], ManagerSink(manager), speed=0).run()
+        self.assertEqual(len(manager.received), 10)
+        self.assertEqual(manager.received[-1], GGA[1:-5].decode())
+
+    def testPtySink(self):
+        sink = PtySink()
+        try:
+            with open(sink.name, 'rb', buffering=0) as tty:
+                Replay(self.capture, sink, speed=0).run()
+                data = b''
+                size = sum(len(f) for (_, f) in self.capture)
+                while len(data) < size:
+                    data += tty.read(size)
+            self.assertEqual(data, b''.join(f for (_, f) in self.capture))
+        finally:
+            sink.close()
+
+    def testTCPSink(self):
+        listener = socket.create_server(('127.0.0.1', 0))
+        received = []
+
+        def serve():
+            conn, _ = listener.accept()
+            with conn:
+                while True:
+                    data = conn.recv(65536)
+                    if not data:
+                        break
+                    received.append(data)
+
+        server = threading.Thread(target=serve)
+        server.start()
+        sink = TCPSink(listener.getsockname())
+        Replay(self.capture, sink, speed=0).run()
+        sink.close()
+        server.join(timeout=1)
+        listener.close()
+        self.assertEqual(b''.join(received),
+                         b''.join(f for (_, f) in self.capture))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Unit tests for the MON-SPAN spectra and the spectrogram."""
+
+import struct
+import unittest
+import numpy as np
+from ubx import UBX
+from ubx.UBXSpectrum import binFrequencies, Spectrogram
+
+
+def spanPayload(*blocks):
+    """MON-SPAN payload of (spectrum, span, center) blocks."""
+    payload = struct.pack('<BBH', 0, len(blocks), 0)
+    for spectrum, span, center in blocks:
+        payload += bytes(spectrum) + struct.pack('<IIIB3x', span, span // 256, center, 20)
+    return payload
+
+
+class SpectrumTest(unittest.TestCase):
+
+    def testSpectra(self):
+        ramp = bytes(range(256))
+        span = UBX.MON.SPAN(spanPayload((ramp, 128000000, 1575420000),
+                                        (ramp[::-1], 128000000, 1227600000)))
+        spectra = span.spectra
+        self.assertEqual(len(spectra), 2)
+        self.assertEqual(spectra[0]['spectrum'].dtype, np.uint8)
+        self.assertEqual(spectra[0]['spectrum'].tolist(), list(range(256)))
+        self.assertEqual(spectra[1]['spectrum'][0], 255)
+        self.assertEqual(spectra[0]['res'], 500000)
+        self.assertEqual(spectra[0]['pga'], 20)
+        freqs = spectra[0]['spectrumBinCenterFreqs']
+        self.assertEqual(freqs[128], 1575420000)
+        self.assertEqual(freqs[1] - freqs[0], 500000)
+        # cached per (center, span) and read-only
+        self.assertIs(span.spectra[0]['spectrumBinCenterFreqs'], freqs)
+        self.assertIs(binFrequencies(1575420000, 128000000), freqs)
+        self.assertFalse(freqs.flags.writeable)
+
+    def testSpectrogram(self):
+        spectrogram = Spectrogram(sweeps=3)
+        for i in range(5):
+            spectrum = np.full(256, 10 + i, np.uint8)
+            spectrum[0] = 100 - i
+            spectrogram.add(UBX.MON.SPAN(spanPayload((spectrum, 128000000, 1575420000))),
+                            t=float(i))
+        block = spectrogram.blocks[1]
+        self.assertEqual(block.count, 5)
+        self.assertEqual(block.times().tolist(), [2.0, 3.0, 4.0])
+        self.assertEqual(block.sweeps()[:, 1].tolist(), [12, 13, 14])
+        # statistics of the stored sweeps 2..4 only
+        self.assertEqual(block.min[0], 96)
+        self.assertEqual(block.max[0], 98)
+        self.assertEqual(block.min[1], 12)
+        self.assertEqual(block.max[1], 14)
+        self.assertEqual(block.mean[1], 13.0)
+        # a new center starts the block over
+        spectrogram.add(UBX.MON.SPAN(spanPayload((bytes(256), 128000000, 1227600000))), t=5.0)
+        block = spectrogram.blocks[1]
+        self.assertEqual(block.count, 1)
+        self.assertEqual(block.times().tolist(), [5.0])
+        self.assertEqual(block.frequencies[128], 1227600000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Unit tests for the per-satellite NAV-SVINFO store."""
+
+import struct
+import unittest
+import numpy as np
+from ubx import UBX
+from ubx.UBXColumns import collect
+from ubx.UBXGenerator import TrafficGenerator, Stream
+from ubx.UBXEpoch import WEEK
+from ubx.UBXSVInfo import SVInfoStore
+
+
+def svinfoPayload(iTOW, svids):
+    """NAV-SVINFO payload with C/N0 = (svid + epoch) & 0xff and the channels rotated."""
+    payload = struct.pack('<IBBH', iTOW, len(svids), 4, 0)
+    epoch = iTOW // 1000
+    order = svids[epoch % len(svids):] + svids[:epoch % len(svids)]
+    for chn, svid in enumerate(order):
+        payload += struct.pack('<BBBBBbhi', chn, svid, 0x0d, 7,
+                               (svid + epoch) & 0xff, svid, 10 * svid, -svid)
+    return payload
+
+
+class SVInfoStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        gen = TrafficGenerator([Stream(UBX.NAV.SVINFO, repeats=6)], seed=7)
+        self.frames = [f for (_, f) in gen.frames(epochs=20)]
+        self.objs = [UBX.NAV.SVINFO(f[6:-2]) for f in self.frames]
+
+    def testObjectsAndPayloads(self):
+        fromObjs, fromPayloads = SVInfoStore(), SVInfoStore()
+        for obj, frame in zip(self.objs, self.frames):
+            fromObjs.add(obj)
+            fromPayloads.addPayload(frame[6:-2])
+        fromObjs.add(UBX.NAV.PVT(bytes(92)))     # ignored
+        self.assertEqual(fromObjs.epochs, 20)
+        self.assertEqual(sorted(fromObjs.satellites), sorted(fromPayloads.satellites))
+        obj = self.objs[-1]
+        svid, cno, elev, axim, prRes = obj.svid_3, obj.cno_3, obj.elev_3, obj.axim_3, obj.prRes_3
+        for store in (fromObjs, fromPayloads):
+            last = store.history(svid)[-1]
+            self.assertEqual(last['iTOW'], obj.iTOW)
+            self.assertEqual((last['cno'], last['elev'], last['azim'], last['prRes']),
+                             (cno, elev, axim, prRes))
+        self.assertEqual(fromObjs.meanCNO(), fromPayloads.meanCNO())
+
+    def testColumnsAndWindow(self):
+        iTOWs = [1000 * i for i in range(20)]
+        frames = [UBX.NAV.SVINFO(svinfoPayload(iTOW, [3, 17, 25])).serialize()
+                  for iTOW in iTOWs]
+        store = SVInfoStore(capacity=5)
+        store.addColumns(collect(b''.join(frames), UBX.NAV.SVINFO, repeats=3))
+        self.assertEqual(store.epochs, 20)
+        self.assertEqual(sorted(store.satellites), [3, 17, 25])
+        history = store.history(17)
+        self.assertEqual(history['iTOW'].tolist(), iTOWs[-5:])
+        self.assertEqual(history['cno'].tolist(), [17 + i for i in range(15, 20)])
+        self.assertEqual(history['azim'].tolist(), [170] * 5)
+        self.assertEqual(history['prRes'].tolist(), [-17] * 5)
+        self.assertEqual(store.window(25, iTOWs[16], iTOWs[18])['iTOW'].tolist(),
+                         iTOWs[16:18])
+        self.assertEqual(len(store.window(99)), 0)
+        self.assertEqual(store.meanCNO(minElev=10), {17: 34.0, 25: 42.0})
+
+    def testWeekRollover(self):
+        store = SVInfoStore(capacity=8)
+        iTOWs = [(WEEK - 3000 + 1000 * i) % WEEK for i in range(10)]
+        for iTOW in iTOWs:
+            store.addPayload(svinfoPayload(iTOW, [5]))
+        self.assertEqual(store.history(5)['iTOW'].tolist(), iTOWs[2:])
+        self.assertEqual(store.window(5, WEEK - 2000, 2000)['iTOW'].tolist(),
+                         [WEEK - 1000, 0, 1000])
+        self.assertEqual(store.window(5, 1000)['iTOW'].tolist(), iTOWs[4:])
+        self.assertEqual(store.window(5, end=2000)['iTOW'].tolist(), iTOWs[2:5])
+        self.assertEqual(store.window(5, 3000, 5000)['iTOW'].tolist(), [3000, 4000])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,8 @@
 
 import unittest
 from ubx import UBX
-from ubx import parseUBXPayload, parseUBXMessage
+from ubx import parseUBXPayload, parseUBXMessage, serialize_many
+from ubx.UBXMessage import UBXMessage
 
 
 class TestStringMethods(unittest.TestCase):
@@ -55,6 +56,44 @@ class TestStringMethods(unittest.TestCase):
         self.assertEqual(gnss.flags_4, 0x01010000)
         self.assertEqual(gnss.maxTrkCh_7, 0x0E)
 
+    def testCFG_PRT(self):
+        payload = b'\x01\x00\x00\x00\xc0\x08\x00\x00\x80\x25\x00\x00\x07\x00\x03\x00\x00\x00\x00\x00'
+        prt = parseUBXPayload(UBX.CFG._class, UBX.CFG.PRT._id, payload)
+        self.assertIsInstance(prt, UBX.CFG.PRT)
+        self.assertEqual(prt.portID, 1)
+        self.assertEqual(prt.reserved2, 9600)
+
+    def testCFG_TP5_GET(self):
+        poll = UBX.CFG.TP5_GET(b'\x01').serialize()
+        self.assertEqual(poll[2:4], bytes([UBX.CFG._class, UBX.CFG.TP5._id]))
+        self.assertIs(UBX.CFG._lookup[UBX.CFG.TP5._id], UBX.CFG.TP5)
+
+    def testSerializeRoundTrip(self):
+        payload = b'\x00\x20\x20\x02\x00\x08\x10\x00\x01\x00\x01\x01\x06\x08\x0e\x00\x01\x00\x01\x01'
+        gnss = parseUBXPayload(UBX.CFG._class, UBX.CFG.GNSS._id, payload)
+        msg = gnss.serialize()
+        self.assertEqual(msg, UBXMessage.make(UBX.CFG._class, UBX.CFG.GNSS._id, payload))
+        self.assertEqual(gnss.frameSize(), len(msg))
+        gnss2 = parseUBXMessage(msg)
+        self.assertEqual(gnss2.maxTrkCh_2, 0x0E)
+
+    def testSerializeMany(self):
+        rxm = UBX.CFG.RXM(b'\x48\x01')
+        msgs = [rxm, UBX.MON.VER.Get(), UBX.CFG.PMS.Set(powerSetupValue=2), rxm]
+        buf = serialize_many(msgs)
+        self.assertEqual(bytes(buf), b''.join(m.serialize() for m in msgs))
+        self.assertEqual(serialize_many([]), bytearray())
+
+    def testChecksumUpdateBytes(self):
+        msg = b'\x06\x3e\x04\x00\x01\x02\x03\xff'
+        ck1 = UBXMessage.Checksum()
+        for b in msg:
+            ck1.update(bytes([b]))
+        ck2 = UBXMessage.Checksum()
+        ck2.updateBytes(msg[:3])
+        ck2.updateBytes(msg[3:])
+        self.assertEqual(ck1.get(), ck2.get())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,269 @@
+"""Structured NMEA sentences.
+
+parseNMEA() turns the body of a sentence (between '$' and '*') into an
+object of the class for its sentence type, e.g. GGA or RMC, or into a plain
+NMEASentence for other types:
+
+    gga = parseNMEA("GPGGA,092725.00,4717.11399,N,00833.91590,E,1,08,...")
+    gga.talker, gga.type        # 'GP', 'GGA'
+    gga.lat, gga.numSV          # 47.28523317, 8
+
+The sentence is split into fields on the first access of a field, and each
+field is converted when it is first accessed. Empty fields are None.
+Proprietary sentences such as $PUBX have talker 'P' and type 'UBX'.
+"""
+
+import datetime
+
+__all__ = ['parseNMEA', 'NMEASentence', 'GGA', 'GLL', 'GSA', 'GST', 'GSV',
+           'RMC', 'TXT', 'VTG', 'ZDA']
+
+
+# Converters take the list of fields and the index of the field.
+
+def _str(fields, i):
+    return fields[i] or None
+
+
+def _int(fields, i):
+    v = fields[i]
+    return int(v) if v else None
+
+
+def _float(fields, i):
+    v = fields[i]
+    return float(v) if v else None
+
+
+def _degrees(fields, i):
+    """ddmm.mmmm or dddmm.mmmm followed by N/S or E/W as signed degrees."""
+    v = fields[i]
+    if not v:
+        return None
+    dot = v.find('.')
+    if dot < 0:
+        dot = len(v)
+    deg = int(v[:dot-2]) + float(v[dot-2:]) / 60
+    return -deg if fields[i+1] in ('S', 'W') else deg
+
+
+def _time(fields, i):
+    """hhmmss.ss as datetime.time."""
+    v = fields[i]
+    if not v:
+        return None
+    return datetime.time(int(v[0:2]), int(v[2:4]), int(v[4:6]),
+                         min(999999, round(float(v[6:] or 0) * 1e6)))
+
+
+def _date(fields, i):
+    """ddmmyy as datetime.date."""
+    v = fields[i]
+    if not v:
+        return None
+    return datetime.date(2000 + int(v[4:6]), int(v[2:4]), int(v[0:2]))
+
+
+class _cached:
+    """Method that is replaced by its result on first access."""
+
+    def __init__(self, method):
+        self.method = method
+        self.__doc__ = method.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.name] = self.method(obj)
+        return value
+
+
+class Field:
+    """Field i of a sentence, converted with convert on first access."""
+
+    def __init__(self, i, convert=_str):
+        self.i = i
+        self.convert = convert
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        fields = obj.fields
+        value = self.convert(fields, self.i) if self.i < len(fields) else None
+        obj.__dict__[self.name] = value     # cache, the descriptor is bypassed
+        return value
+
+
+class NMEASentence:
+    """An NMEA sentence, fields[0] is the address, e.g. GPGGA."""
+
+    def __init__(self, sentence, talker=None, type=None):
+        """
+        :param sentence: the body between '$' and '*' as str
+        """
+        self.sentence = sentence
+        if talker is None:
+            talker, type = _address(sentence)
+        self.talker = talker
+        self.type = type
+
+    @_cached
+    def fields(self):
+        return self.sentence.split(',')
+
+    def __getitem__(self, i):
+        """Return field i as str."""
+        return self.fields[i]
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __str__(self):
+        return "NMEA {}".format(self.sentence)
+
+    def __repr__(self):
+        return "{}({!r})".format(type(self).__name__, self.sentence)
+
+
+class GGA(NMEASentence):
+    """Global positioning system fix data."""
+    time = Field(1, _time)
+    lat = Field(2, _degrees)
+    lon = Field(4, _degrees)
+    quality = Field(6, _int)
+    numSV = Field(7, _int)
+    HDOP = Field(8, _float)
+    alt = Field(9, _float)
+    sep = Field(11, _float)
+    diffAge = Field(13, _float)
+    diffStation = Field(14, _str)
+
+
+class GLL(NMEASentence):
+    """Latitude and longitude, with time of position fix and status."""
+    lat = Field(1, _degrees)
+    lon = Field(3, _degrees)
+    time = Field(5, _time)
+    status = Field(6, _str)
+    posMode = Field(7, _str)
+
+
+class GSA(NMEASentence):
+    """GNSS DOP and active satellites."""
+    opMode = Field(1, _str)
+    navMode = Field(2, _int)
+    PDOP = Field(15, _float)
+    HDOP = Field(16, _float)
+    VDOP = Field(17, _float)
+    systemId = Field(18, _int)
+
+    @_cached
+    def svids(self):
+        """The satellite numbers used in the solution."""
+        return [int(v) for v in self.fields[3:15] if v]
+
+
+class GST(NMEASentence):
+    """GNSS pseudorange error statistics."""
+    time = Field(1, _time)
+    rangeRms = Field(2, _float)
+    stdMajor = Field(3, _float)
+    stdMinor = Field(4, _float)
+    orient = Field(5, _float)
+    stdLat = Field(6, _float)
+    stdLong = Field(7, _float)
+    stdAlt = Field(8, _float)
+
+
+class GSV(NMEASentence):
+    """GNSS satellites in view."""
+    numMsg = Field(1, _int)
+    msgNum = Field(2, _int)
+    numSV = Field(3, _int)
+
+    @_cached
+    def satellites(self):
+        """List of (svid, elv, az, cno) of the satellites in this sentence."""
+        fields = self.fields
+        n = (len(fields) - 4) // 4
+        return [tuple(_int(fields, j) for j in range(i, i + 4))
+                for i in range(4, 4 + 4 * n, 4)]
+
+    @_cached
+    def signalId(self):
+        """Signal ID of NMEA 4.10 and later, None before."""
+        fields = self.fields
+        return _int(fields, -1) if (len(fields) - 4) % 4 == 1 else None
+
+
+class RMC(NMEASentence):
+    """Recommended minimum data."""
+    time = Field(1, _time)
+    status = Field(2, _str)
+    lat = Field(3, _degrees)
+    lon = Field(5, _degrees)
+    spd = Field(7, _float)
+    cog = Field(8, _float)
+    date = Field(9, _date)
+    mv = Field(10, _float)
+    posMode = Field(12, _str)
+    navStatus = Field(13, _str)
+
+
+class TXT(NMEASentence):
+    """Text transmission."""
+    numMsg = Field(1, _int)
+    msgNum = Field(2, _int)
+    msgType = Field(3, _int)
+    text = Field(4, _str)
+
+
+class VTG(NMEASentence):
+    """Course over ground and ground speed."""
+    cogt = Field(1, _float)
+    cogm = Field(3, _float)
+    sogn = Field(5, _float)
+    sogk = Field(7, _float)
+    posMode = Field(9, _str)
+
+
+class ZDA(NMEASentence):
+    """Time and date."""
+    time = Field(1, _time)
+    day = Field(2, _int)
+    month = Field(3, _int)
+    year = Field(4, _int)
+    ltzh = Field(5, _int)
+    ltzn = Field(6, _int)
+
+
+_lookup = {Cls.__name__: Cls for Cls in
+           (GGA, GLL, GSA, GST, GSV, RMC, TXT, VTG, ZDA)}
+
+
+def _address(sentence):
+    """Return (talker, type) of the sentence body."""
+    end = sentence.find(',')
+    address = sentence if end < 0 else sentence[:end]
+    if address[:1] == 'P':
+        return 'P', address[1:]
+    return address[:2], address[2:]
+
+
+def parseNMEA(sentence):
+    """Return the NMEASentence (subclass) object of the sentence body.
+
+    A complete sentence with '$' and checksum is accepted as well, the
+    checksum is not tested.
+    """
+    if sentence[:1] == '$':
+        star = sentence.rfind('*')
+        sentence = sentence[1:star if star > 0 else None]
+    talker, type = _address(sentence)
+    return _lookup.get(type, NMEASentence)(sentence, talker, type)
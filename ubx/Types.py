@@ -3,6 +3,9 @@
 Each type must have a variable typ and ord.
 - typ: Contains the python struct packing letter
 - ord: Contains a sequential ordering number
+- packFmt: The struct code used when packing a whole message at once
+- textFormat: The format string equivalent to toString
+- compactFormat: The format string used in compact single-line text
 """
 
 from struct import Struct, unpack, pack
@@ -43,6 +46,14 @@ def _InitGenericType(cls):
         def serialize(self, val):
             return pack(self.fmt, val)
         setattr(cls, 'serialize', serialize)
+    # 6. add packFmt variable
+    if cls.__dict__.get('packFmt') is None:
+        setattr(cls, 'packFmt', cls.fmt)
+    # 7. add the format strings equivalent to toString and of compact text
+    if cls.__dict__.get('textFormat') is None:
+        setattr(cls, 'textFormat', "0x{:0" + str(cls._size*2) + "X}")
+    if cls.__dict__.get('compactFormat') is None:
+        setattr(cls, 'compactFormat', "{}")
     return cls
 
 
@@ -66,6 +77,7 @@ class I1:
 @_InitGenericType
 class X1:
     """UBX 1-byte bitfield."""
+    compactFormat = "0x{:X}"
     fmt = "B"
     ctype = "uint8_t"
 
@@ -84,6 +96,7 @@ class I2:
 @_InitGenericType
 class X2:
     """UBX 2-byte bitfield."""
+    compactFormat = "0x{:X}"
     fmt = "H"
     ctype = "uint16_t"
 
@@ -102,6 +115,7 @@ class I4:
 @_InitGenericType
 class X4:
     """UBX 4-byte bitfield."""
+    compactFormat = "0x{:X}"
     fmt = "I"
     ctype = "uint32_t"
 
@@ -126,6 +140,7 @@ class CH:
         self._size = N
         self._nullTerminatedString = nullTerminatedString
         self.ctype = "char[{}]".format(self.N)
+        self.packFmt = "{}s".format(self.N)
     def parse(self, msg):
         if len(msg) < self.N:
             err = "Message length {} is shorter than required {}"\
@@ -135,14 +150,24 @@ class CH:
         if self._nullTerminatedString:
             val = stringFromByteString(val)
         return val, msg[self._size:]
+    textFormat = compactFormat = '"{}"'
     @staticmethod
     def toString(val):
         return '"{}"'.format(val)
-    def serialize(self, val):
-        if len(val) != self.N:
+    def packValue(self, val):
+        if self._nullTerminatedString:
+            val = val.encode('ascii')
+            if len(val) > self.N:
+                err = "Value length {} longer than the allowed {}"\
+                      .format(len(val), self._size)
+                raise Exception(err)
+        elif len(val) != self.N:
             err = "Value length {} not equal to the required {}"\
                   .format(len(val), self._size)
             raise Exception(err)
+        return val
+    def serialize(self, val):
+        return pack(self.packFmt, self.packValue(val))
 
 class U:
     """Variable-length array of unsigned chars."""
@@ -152,6 +177,7 @@ class U:
         self._size = N
         self.N = N
         self.ctype = "uint8_t[{}]".format(self.N)
+        self.packFmt = "{}s".format(self.N)
     def parse(self, msg):
         if len(msg) < self.N:
             err = "Message length {} is shorter than required {}"\
@@ -159,12 +185,15 @@ class U:
             raise Exception(err)
         val = msg[0:self._size]
         return val, msg[self._size:]
+    textFormat = compactFormat = '"{}"'
     @staticmethod
     def toString(val):
         return '"{}"'.format(val)
-    def serialize(self, val):
+    def packValue(self, val):
         if len(val) != self.N:
             err = "Value length {} not equal to the required {}"\
                   .format(len(val), self._size)
             raise Exception(err)
         return val
+    def serialize(self, val):
+        return self.packValue(val)
@@ -165,7 +165,7 @@ class CFG:
     class TP5_GET:
         u"""§31.11.32.2 Poll Time Pulse Parameters."""
 
-        _id = 0x00
+        _id = 0x31
 
         class Fields:
             tpIdx = U1(1)  # Time pulse selection (0 = TIMEPULSE, 1 = TIMEPULSE2)
@@ -43,9 +43,18 @@ class ESF:
             payload = struct.pack('<IHH', timeTag, flags, id) + b''.join(x.to_bytes() for x in measurements)
             return parseUBXPayload(ESF._class, ESF.MEAS._id, payload)
 
+        @staticmethod
+        def encode(timeTag, measurements, id=0, dataId=None):
+            """Return the finished frame bytes for (dataType, value) pairs.
+
+            This is the fast path of create(...).serialize(), see UBXESFCodec.
+            """
+            from ubx.UBXESFCodec import encodeMEAS
+            return encodeMEAS(timeTag, measurements, id=id, dataId=dataId)
+
         @staticmethod
         def _calculate_flags(timeMarkSent=0, timeMarkEdge=0, calibTtagValid=0, numMeas=0):
             return ((numMeas & 0x1f) << 11) | \
                    ((calibTtagValid & 0x01) << 3) | \
                    ((timeMarkEdge & 0x01) << 2) | \
-                    (timeMarkSent % 0x03)
+                    (timeMarkSent & 0x03)
@@ -2,6 +2,8 @@
 
 from ubx.UBXMessage import initMessageClass, addGet
 from ubx.Types import CH, U, U1, U2, U4, X1, X4
+from ubx.UBXSpectrum import binFrequencies
+import numpy as np
 
 @initMessageClass
 class MON:
@@ -65,11 +67,21 @@ class MON:
 
         @property
         def spectra(self):
-            return [{
-                "centerFreq": self.__getattribute__(f'center_{blockNum}'),
-                "span": self.__getattribute__(f'span_{blockNum}'),
-                "res": self.__getattribute__(f'res_{blockNum}'),
-                "pga": self.__getattribute__(f'pga_{blockNum}'),
-                "spectrumBinCenterFreqs": [ self.__getattribute__(f'center_{blockNum}') + self.__getattribute__(f'span_{blockNum}') * (i - 128) / 256 for i in range(256)],
-                "spectrum": [rfBin for rfBin in self.__getattribute__(f'spectrum_{blockNum}')]
-            } for blockNum in range(1,self.numRfBlocks+1) ]
\ No newline at end of file
+            """
+            List of dicts per RF block, the spectrum as a uint8 array that
+            views the message, the bin frequencies as a cached array.
+            """
+            spectra = []
+            for blockNum in range(1, self.numRfBlocks + 1):
+                center = getattr(self, 'center_{}'.format(blockNum))
+                span = getattr(self, 'span_{}'.format(blockNum))
+                spectra.append({
+                    "centerFreq": center,
+                    "span": span,
+                    "res": getattr(self, 'res_{}'.format(blockNum)),
+                    "pga": getattr(self, 'pga_{}'.format(blockNum)),
+                    "spectrumBinCenterFreqs": binFrequencies(center, span),
+                    "spectrum": np.frombuffer(
+                        getattr(self, 'spectrum_{}'.format(blockNum)), np.uint8),
+                })
+            return spectra
\ No newline at end of file
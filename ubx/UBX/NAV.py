@@ -151,11 +151,32 @@ class NAV:
             """
             return 1e-3 * self.gSpeed
 
+        @property
+        def UTC_str(self):
+            """
+            UTC.isoformat()[:21], without building a datetime
+            :return:
+            """
+            nano = self.nano
+            if (0 <= nano < 999999500 and nano % 1000 != 500 and 1 <= self.month <= 12
+                    and 1 <= self.day <= 28 and self.hour < 24 and self.min < 60
+                    and self.sec < 60 and 1 <= self.year <= 9999):
+                micro = (nano + 500) // 1000
+                return (self._utcFormat if micro else self._utcFormatWhole).format(
+                    self.year, self.month, self.day, self.hour, self.min,
+                    self.sec, micro // 100000)
+            return self.UTC.isoformat()[:21]
+
+        _utcFormat = "{:04d}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}.{:d}"
+        _utcFormatWhole = "{:04d}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}+0"     # +00:00 cut
+        _summaryFormat = ("UBX.NAV.PVT:       {}z  {:12.7f} E {:11.7f} N {:8.1f} m(MSL)"
+                          " speed = {:.3f} m/s at NED: {:.3f}, {:.3f}, {:.3f}")
+
         def summary(self):
-            return ("UBX.NAV.PVT:       {}z  {:12.7f} E {:11.7f} N {:8.1f} m(MSL)"
-                .format(self.UTC.isoformat()[:21], *self.position_dm)
-                    + " speed = {:.3f} m/s at NED: {:.3f}, {:.3f}, {:.3f}"
-                    .format(self.speed_m, *self.velNED_m))
+            return self._summaryFormat.format(
+                self.UTC_str, self.lon * 1e-7, self.lat * 1e-7, self.hMSL * 1e-3,
+                self.gSpeed * 1e-3, self.velN * 1e-3, self.velE * 1e-3,
+                self.velD * 1e-3)
 
     @addGet
     class RELPOSNED:
@@ -227,8 +248,12 @@ class NAV:
             days, hours = divmod(hours, 24)
             return "{:1d}-{:02d}:{:02d}:{:04.1f}gps".format(days, hours, mins, millis/1000)
 
+        _summaryFormat = ("UBX.NAV.RELPOSNED: TOW = {} NED = {:8.5f}, {:8.5f}, {:8.5f} m"
+                          "-> heading {:9.2f} deg, {:8.2f} up, len {:.3f} m")
+
         def summary(self):
-            return ("UBX.NAV.RELPOSNED: TOW = {} NED = {:8.5f}, {:8.5f}, {:8.5f} m"
-                    .format(self.TOW_str, *self.relPosNED_m)
-                    + "-> heading {:9.2f} deg, {:8.2f} up, len {:.3f} m"
-                    .format(self.heading_deg, self.pitch_deg, self.length_m))
+            north, east, down = self.relPosNED_m
+            length = self.length_m
+            return self._summaryFormat.format(
+                self.TOW_str, north, east, down, self.heading_deg,
+                math.degrees(math.asin(-down / length)), length)
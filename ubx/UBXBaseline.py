@@ -0,0 +1,198 @@
+"""Moving-baseline (GPS compass) analytics of NAV-RELPOSNED.
+
+baselines() computes, for a batch of NAV-RELPOSNED columns (see
+UBXColumns), the NED vector, length, heading and pitch with the cm and
+0.1 mm parts combined, and the flags as arrays:
+
+    rel = baselines(collect(data, UBX.NAV.RELPOSNED))
+    rel['heading'][rel['carrSoln'] == CARR_FIXED]
+
+BaselineMonitor keeps running statistics of a live stream in O(1) memory,
+Welford's mean and variance of the length and the circular mean and
+spread of the heading:
+
+    monitor = BaselineMonitor()
+    manager.onUBX = monitor.add     # or monitor.addBatch(columns)
+    monitor.length.mean, monitor.length.std, monitor.heading.std
+"""
+
+import math
+import numpy as np
+
+CARR_NONE, CARR_FLOAT, CARR_FIXED = 0, 1, 2
+
+# name: (bit, width) of the flags of RELPOSNED version 1 (protocol 27.11)
+FLAGS = {
+    'gnssFixOK': (0, 1),
+    'diffSoln': (1, 1),
+    'relPosValid': (2, 1),
+    'carrSoln': (3, 2),
+    'isMoving': (5, 1),
+    'refPosMiss': (6, 1),
+    'refObsMiss': (7, 1),
+    'relPosHeadingValid': (8, 1),
+    'relPosNormalized': (9, 1),
+}
+
+
+def decodeFlags(flags):
+    """Return {name: array} of the bits in FLAGS; 1-bit flags are bool."""
+    flags = np.asarray(flags)
+    decoded = {}
+    for name, (bit, width) in FLAGS.items():
+        value = (flags >> bit) & ((1 << width) - 1)
+        decoded[name] = value.astype(bool) if width == 1 else value.astype(np.uint8)
+    return decoded
+
+
+def baselines(rel):
+    """Return {name: array} of the NAV-RELPOSNED columns rel.
+
+    ned is (N, 3) in m, length in m, heading and pitch in degrees (pitch
+    positive up, NaN for a zero length), and the flags of decodeFlags.
+    The sine of the pitch is clipped to [-1, 1], as the HP parts of down
+    and length are rounded separately.
+    """
+    ned = np.stack([rel['relPosN'] * 1e-2 + rel['relPosHPN'] * 1e-4,
+                    rel['relPosE'] * 1e-2 + rel['relPosHPE'] * 1e-4,
+                    rel['relPosD'] * 1e-2 + rel['relPosHPD'] * 1e-4], axis=-1)
+    length = rel['relPosLength'] * 1e-2 + rel['relPosHPLength'] * 1e-4
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sine = np.where(length > 0, -ned[:, 2] / length, np.nan)
+        pitch = np.degrees(np.arcsin(np.clip(sine, -1.0, 1.0)))
+    result = {
+        'iTOW': rel['iTOW'],
+        'ned': ned,
+        'length': length,
+        'heading': rel['relPosHeading'] * 1e-5,
+        'pitch': pitch,
+        'accLength': rel['accLength'] * 1e-4,
+        'accHeading': rel['accHeading'] * 1e-5,
+    }
+    result.update(decodeFlags(rel['flags']))
+    return result
+
+
+class Welford:
+    """Running mean and variance."""
+
+    __slots__ = ('n', 'mean', '_m2')
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (x - self.mean)
+
+    def addBatch(self, xs):
+        """Add an array of values (Chan et al.'s parallel update)."""
+        xs = np.asarray(xs, dtype=np.float64)
+        n = len(xs)
+        if n == 0:
+            return
+        mean = float(xs.mean())
+        m2 = float(((xs - mean) ** 2).sum())
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+
+    @property
+    def variance(self):
+        """Sample variance, NaN for less than 2 values."""
+        return self._m2 / (self.n - 1) if self.n > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class CircularStats:
+    """Running circular mean and spread of angles in degrees."""
+
+    __slots__ = ('n', '_sin', '_cos')
+
+    def __init__(self):
+        self.n = 0
+        self._sin = 0.0
+        self._cos = 0.0
+
+    def add(self, deg):
+        rad = math.radians(deg)
+        self.n += 1
+        self._sin += math.sin(rad)
+        self._cos += math.cos(rad)
+
+    def addBatch(self, degs):
+        rad = np.radians(np.asarray(degs, dtype=np.float64))
+        self.n += len(rad)
+        self._sin += float(np.sin(rad).sum())
+        self._cos += float(np.cos(rad).sum())
+
+    @property
+    def mean(self):
+        """Mean direction in degrees, 0..360."""
+        return math.degrees(math.atan2(self._sin, self._cos)) % 360 if self.n else math.nan
+
+    @property
+    def resultant(self):
+        """Mean resultant length R, 1 if all angles are equal."""
+        return math.hypot(self._sin, self._cos) / self.n if self.n else math.nan
+
+    @property
+    def std(self):
+        """Circular standard deviation sqrt(-2 ln R) in degrees."""
+        r = self.resultant
+        return math.degrees(math.sqrt(-2 * math.log(r))) if r > 0 else math.inf
+
+
+class BaselineMonitor:
+    """Running statistics of the baseline length, heading and pitch."""
+
+    def __init__(self, fixedOnly=True):
+        """
+        :param fixedOnly: only count epochs with a fixed carrier solution
+        """
+        self.fixedOnly = fixedOnly
+        self.length = Welford()
+        self.pitch = Welford()
+        self.heading = CircularStats()
+        self.skipped = 0
+
+    def _accept(self, flags):
+        if not flags & 0x04:        # relPosValid
+            return False
+        return not self.fixedOnly or (flags >> 3) & 3 == CARR_FIXED
+
+    def add(self, msg):
+        """Add a NAV-RELPOSNED object, other messages are ignored."""
+        if getattr(msg, 'relPosHeading', None) is None:
+            return
+        if not self._accept(msg.flags):
+            self.skipped += 1
+            return
+        down = msg.relPosD * 1e-2 + msg.relPosHPD * 1e-4
+        length = msg.length_m
+        self.length.add(length)
+        self.heading.add(msg.relPosHeading * 1e-5)
+        if length > 0:
+            sine = max(-1.0, min(1.0, -down / length))   # rounding, near vertical
+            self.pitch.add(math.degrees(math.asin(sine)))
+
+    def addBatch(self, rel):
+        """Add NAV-RELPOSNED columns."""
+        flags = np.asarray(rel['flags'])
+        ok = (flags & 0x04) != 0
+        if self.fixedOnly:
+            ok &= ((flags >> 3) & 3) == CARR_FIXED
+        self.skipped += int((~ok).sum())
+        b = baselines(rel[ok])
+        self.length.addBatch(b['length'])
+        self.heading.addBatch(b['heading'])
+        self.pitch.addBatch(b['pitch'][b['length'] > 0])
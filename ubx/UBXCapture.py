@@ -0,0 +1,137 @@
+"""Read and write captures, plain or compressed with gzip, xz or bz2.
+
+openCapture() detects the compression of a capture from its first bytes
+and returns a file object that decompresses in large blocks. readChunks()
+and feedCapture() pass it to a framer, UBXManager or Demux in chunks of a
+MiB, so a .ubx.gz is processed at about the speed of decompression:
+
+    with openCapture('drive.ubx.xz') as f:
+        data = f.read()
+    feedCapture(manager, 'drive.ubx.gz')    # or a Demux
+
+CaptureWriter compresses a raw capture while it is recorded, the format
+chosen by the file name suffix:
+
+    with CaptureWriter('drive.ubx.gz') as capture:
+        capture.write(data)
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+import time
+
+# compression -> (magic, open, keyword of the level, default level)
+FORMATS = {
+    'gzip': (b'\x1f\x8b', gzip.open, 'compresslevel', 6),
+    'xz': (b'\xfd7zXZ\x00', lzma.open, 'preset', 6),
+    'bz2': (b'BZh', bz2.open, 'compresslevel', 9),
+}
+SUFFIXES = {'.gz': 'gzip', '.xz': 'xz', '.bz2': 'bz2'}
+
+CHUNK_SIZE = 1 << 20
+
+
+def detectCompression(header):
+    """Return 'gzip', 'xz', 'bz2' or None for the first bytes of a file."""
+    for name, (magic, _, _, _) in FORMATS.items():
+        if header.startswith(magic):
+            return name
+    return None
+
+
+def compressionFromName(path):
+    """Return the compression implied by the suffix of path, or None."""
+    return SUFFIXES.get(os.path.splitext(str(path))[1].lower())
+
+
+def openCapture(file, mode='rb', compression=None, level=None):
+    """Open a capture for reading ('rb') or writing ('wb', 'ab').
+
+    file is a path or a binary file object. When reading, the compression
+    is detected from the first bytes (of a file object only if it has
+    peek()), when writing it is taken from the suffix of the path.
+    level is the compression level.
+    """
+    isPath = isinstance(file, (str, os.PathLike))
+    if compression is None:
+        if mode != 'rb':
+            compression = compressionFromName(file) if isPath else None
+        elif isPath:
+            with open(file, 'rb') as f:
+                compression = detectCompression(f.read(6))
+        elif hasattr(file, 'peek'):
+            compression = detectCompression(file.peek(6)[:6])
+    if compression is None:
+        return open(file, mode, buffering=CHUNK_SIZE) if isPath else file
+    if compression not in FORMATS:
+        raise ValueError("unknown compression {!r}".format(compression))
+    _, opener, levelName, defaultLevel = FORMATS[compression]
+    if mode == 'rb':
+        return opener(file, 'rb')
+    return opener(file, mode, **{levelName: defaultLevel if level is None else level})
+
+
+def readChunks(file, chunkSize=CHUNK_SIZE):
+    """Yield the (decompressed) content of a capture in chunks."""
+    f = openCapture(file)
+    try:
+        while True:
+            data = f.read(chunkSize)
+            if not data:
+                break
+            yield data
+    finally:
+        if f is not file:
+            f.close()
+
+
+def feedCapture(target, file, chunkSize=CHUNK_SIZE):
+    """Feed a capture to target.feed(), e.g. a UBXManager or Demux.
+
+    Return the number of (decompressed) bytes.
+    """
+    total = 0
+    for data in readChunks(file, chunkSize):
+        target.feed(data)
+        total += len(data)
+    return total
+
+
+class CaptureWriter:
+    """Record a raw capture, compressed according to the file name."""
+
+    def __init__(self, file, compression=None, level=None, flushInterval=1.0):
+        """
+        :param file: path, e.g. drive.ubx.gz, or binary file object
+        :param compression: 'gzip', 'xz', 'bz2' or None, default from the path
+        :param level: compression level
+        :param flushInterval: seconds between flushes to the file, 0 for every write
+        """
+        self._file = openCapture(file, 'wb', compression, level)
+        self.flushInterval = flushInterval
+        self.written = 0
+        self._flushed = time.monotonic()
+
+    def write(self, data):
+        self._file.write(data)
+        self.written += len(data)
+        now = time.monotonic()
+        if now - self._flushed >= self.flushInterval:
+            self._file.flush()
+            self._flushed = now
+        return len(data)
+
+    def flush(self):
+        self._file.flush()
+        self._flushed = time.monotonic()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
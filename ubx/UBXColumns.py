@@ -0,0 +1,84 @@
+"""Decode batches of UBX frames into NumPy columns.
+
+A batch of frames of the same message and length, e.g. all NAV-PVT of a
+drive, is viewed as a structured array with one field per message field,
+without creating message objects:
+
+    pvt = columns(b''.join(frames), UBX.NAV.PVT)
+    pvt['lat'] * 1e-7           # all latitudes in degrees
+
+Messages with a Repeated block are supported for a fixed number of
+repeats, which become sub-arrays, e.g. pvt['repeated']['cno'].
+"""
+
+import numpy as np
+from ubx.UBXCapture import openCapture
+from ubx.UBXFramer import UBXFramer, FrameKind
+
+_codes = {'B': 'u1', 'b': 'i1', 'H': '<u2', 'h': '<i2', 'I': '<u4',
+          'i': '<i4', 'f': '<f4', 'd': '<f8'}
+
+
+def _fieldsDtype(fieldInfo):
+    types, names = fieldInfo['once']
+    fields = []
+    for name, t in zip(names, types):
+        code = _codes.get(t.packFmt)
+        fields.append((name, code if code else 'S{}'.format(t._size)))
+    return fields
+
+
+def payloadDtype(msgCls, repeats=0):
+    """Return the NumPy dtype of the payload of message class msgCls."""
+    fields = _fieldsDtype(msgCls._fieldInfo)
+    repeat = msgCls._fieldInfo['repeat']
+    if repeat:
+        fields.append(('repeated', np.dtype(_fieldsDtype(repeat)), (repeats,)))
+    return np.dtype(fields)
+
+
+def frameDtype(msgCls, repeats=0):
+    """Return the NumPy dtype of a complete frame of msgCls."""
+    return np.dtype([
+        ('sync', 'u1', 2), ('msgClass', 'u1'), ('msgId', 'u1'),
+        ('length', '<u2'), ('payload', payloadDtype(msgCls, repeats)),
+        ('chksum', 'u1', 2)
+    ])
+
+
+def columns(data, msgCls, repeats=0):
+    """Return the payloads of the frames in data as a structured array.
+
+    data holds complete frames of msgCls, all with repeats repeated
+    blocks, back to back. The result is a view of data, not a copy.
+    """
+    dtype = frameDtype(msgCls, repeats)
+    if len(data) % dtype.itemsize:
+        raise ValueError("data is not a whole number of {}-byte frames"
+                         .format(dtype.itemsize))
+    frames = np.frombuffer(data, dtype)
+    if (np.any(frames['msgClass'] != msgCls._class)
+            or np.any(frames['msgId'] != msgCls._id)
+            or np.any(frames['length'] != dtype['payload'].itemsize)):
+        raise ValueError("data contains other messages or lengths")
+    return frames['payload']
+
+
+def collect(data, msgCls, repeats=0):
+    """Return the columns of the msgCls frames found in a mixed capture.
+
+    data is a bytes-like capture; frames of other messages or lengths,
+    NMEA sentences and bad frames are skipped.
+    """
+    length = payloadDtype(msgCls, repeats).itemsize
+    header = bytes([0xb5, 0x62, msgCls._class, msgCls._id,
+                    length & 0xff, length >> 8])
+    selected = [frame for (kind, frame) in UBXFramer().feed(data)
+                if kind == FrameKind.UBX and frame[:6] == header]
+    return columns(b''.join(selected), msgCls, repeats)
+
+
+def columnsFromFile(path, msgCls, repeats=0):
+    """Return the columns of a file of msgCls frames only, e.g. from Demux."""
+    with openCapture(path) as f:
+        return columns(f.read(), msgCls, repeats)
@@ -0,0 +1,129 @@
+"""Apply a configuration profile to a receiver in one pipelined transaction.
+
+A profile is a list of CFG messages (RATE, PRT, PM2, TP5, GNSS, ...) with the
+target values. The current values of all of them are polled in parallel,
+only the messages whose serialized payload differs are sent, and all of
+those are in flight at the same time with their ACKs tracked per message:
+
+    rate = manager.poll(UBX.CFG.RATE).result()
+    rate.measRate = 200
+    result = ConfigTransaction(manager, [rate, pm2, tp5]).apply()
+    if not result.ok:
+        print(result)
+
+Messages are sent in profile order, so a CFG-PRT that changes the baud
+rate of the port in use should come last.
+"""
+
+from concurrent.futures import wait
+from ubx import UBX
+from ubx.FSM import isNAK
+
+# Poll requests of messages that exist once per port, time pulse, etc.
+# carry a selector. Maps (class, id) to a function that returns the poll
+# payload and a predicate for the response, given the target message.
+pollSelectors = {
+    (UBX.CFG._class, UBX.CFG.PRT._id): lambda msg: (
+        bytes([msg.portID]), lambda r: r.portID == msg.portID),
+    (UBX.CFG._class, UBX.CFG.TP5._id): lambda msg: (
+        bytes([msg.tpIdx]), lambda r: r.tpIdx == msg.tpIdx),
+}
+
+
+def _name(msg):
+    """Return a name like CFG-RATE for a CFG message object."""
+    cls = UBX.CFG._lookup.get(msg._id)
+    if msg._class != UBX.CFG._class or cls is None:
+        return "{:02X}-{:02X}".format(msg._class, msg._id)
+    return "CFG-" + cls.__name__
+
+
+class ConfigResult:
+    """Outcome of a ConfigTransaction.
+
+    - unchanged: messages that already had the target values
+    - applied: messages that were sent and acknowledged
+    - naked: messages that were sent and rejected with ACK-NAK
+    - failed: (message, exception) pairs of sets that got no answer
+    """
+
+    def __init__(self):
+        self.unchanged = []
+        self.applied = []
+        self.naked = []
+        self.failed = []
+
+    @property
+    def ok(self):
+        """True if every message has its target value on the receiver."""
+        return not self.naked and not self.failed
+
+    def __str__(self):
+        def names(msgs):
+            return ", ".join(_name(m) for m in msgs) or "-"
+        return ("unchanged: {}\napplied: {}\nNAKed: {}\nfailed: {}".format(
+            names(self.unchanged), names(self.applied), names(self.naked),
+            names(m for (m, _) in self.failed)))
+
+
+class ConfigTransaction:
+    """Bring the receiver behind manager to the configuration in profile."""
+
+    def __init__(self, manager, profile, timeout=None, retries=None):
+        """
+        :param manager: a running UBXManager
+        :param profile: list of CFG message objects with the target values
+        :param timeout: seconds per attempt, default see UBXManager.poll
+        :param retries: re-sends per message, default see UBXManager.poll
+        """
+        self.manager = manager
+        self.profile = list(profile)
+        self.timeout = timeout
+        self.retries = retries
+
+    def _poll(self, target):
+        selector = pollSelectors.get((target._class, target._id))
+        payload, match = (b'', None) if selector is None else selector(target)
+        return self.manager.poll(
+            target, payload=payload, match=match, timeout=self.timeout,
+            retries=self.retries)
+
+    def diff(self):
+        """Poll all current values in parallel.
+
+        Returns the list of (target, current) pairs whose serialized
+        payloads differ. current is None if it could not be polled, such
+        messages are treated as different.
+        """
+        polls = [self._poll(target) for target in self.profile]
+        wait(polls)
+        changed = []
+        for target, poll in zip(self.profile, polls):
+            try:
+                current = poll.result()
+            except Exception:
+                current = None
+            if current is not None and isNAK(current):
+                current = None
+            if current is None or current.serialize() != target.serialize():
+                changed.append((target, current))
+        return changed
+
+    def apply(self):
+        """Send the messages that differ, pipelined, return a ConfigResult."""
+        changed = [target for (target, _) in self.diff()]
+        sets = [self.manager.set(target, timeout=self.timeout,
+                                 retries=self.retries)
+                for target in changed]
+        wait(sets)
+        result = ConfigResult()
+        result.unchanged = [t for t in self.profile
+                            if not any(t is c for c in changed)]
+        for target, fut in zip(changed, sets):
+            try:
+                ack = fut.result()
+            except Exception as e:
+                result.failed.append((target, e))
+            else:
+                (result.naked if isNAK(ack) else result.applied).append(target)
+        return result
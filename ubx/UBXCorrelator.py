@@ -0,0 +1,233 @@
+"""Match polls and configuration requests with their responses.
+
+Any number of requests can be in flight at the same time. A poll is
+resolved by the next message of the polled class and id, a set is resolved
+by the next ACK-ACK or ACK-NAK with matching clsID and msgID. Responses of
+the same kind are assigned in the order the requests were sent, which is
+the order in which the receiver answers them. Requests that are not
+answered within their timeout are re-sent, after the last retry their
+future fails with a TimeoutError. When the correlator is closed the
+futures of the requests in flight fail with CorrelatorClosed.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from ubx import UBX
+from ubx.UBXTransmit import Priority, TransmitQueueClosed
+
+_CFG_CLASS = 0x06
+
+
+class CorrelatorClosed(TransmitQueueClosed):
+    """The manager has stopped, requests are not answered any more."""
+
+
+class _Request:
+    """A request in flight."""
+
+    __slots__ = ('msg', 'priority', 'responseKey', 'ackKey', 'match',
+                 'future', 'timeout', 'retries', 'name', 'settled')
+
+    def __init__(self, msg, priority, responseKey, ackKey, match, timeout,
+                 retries, name):
+        self.msg = msg
+        self.priority = priority
+        self.responseKey = responseKey  # (class, id) of the response or None
+        self.ackKey = ackKey            # (class, id) of the ACK or None
+        self.match = match
+        self.future = Future()
+        self.timeout = timeout
+        self.retries = retries
+        self.name = name
+        self.settled = False
+
+    def finished(self):
+        """Test whether the request was answered, failed or cancelled."""
+        return self.settled or self.future.cancelled()
+
+    def claim(self):
+        """Claim the right to resolve the future, False if cancelled."""
+        if self.finished() or not self.future.set_running_or_notify_cancel():
+            return False
+        self.settled = True
+        return True
+
+
+class Correlator:
+    """Keep track of requests in flight and resolve their futures."""
+
+    def __init__(self, send, timeout=1.0, retries=2):
+        """
+        :param send: function send(msg, priority) that transmits msg
+        :param timeout: default seconds to wait for a response per attempt
+        :param retries: default number of re-sends after a timeout
+        """
+        self._send = send
+        self.timeout = timeout
+        self.retries = retries
+        self._cond = threading.Condition()
+        self._responses = {}    # (class, id) -> deque of _Request
+        self._acks = {}         # (class, id) -> deque of _Request
+        self._deadlines = []    # heap of (deadline, seq, _Request)
+        self._seq = itertools.count()
+        self._timer = None
+        self._closed = False
+
+    def poll(self, msg, msgClass, msgId, priority=Priority.POLL,
+             timeout=None, retries=None, match=None):
+        """Send poll msg, return a Future of the (msgClass, msgId) response.
+
+        match is an optional predicate that the response object must
+        satisfy, e.g. to tell the responses of several CFG-PRT polls apart.
+        Polled CFG messages are also acknowledged, the future resolves to
+        the ACK-NAK object if the receiver rejects the poll.
+        """
+        key = (msgClass, msgId)
+        return self._request(
+            msg, priority, key, key if msgClass == _CFG_CLASS else None,
+            match, timeout, retries)
+
+    def set(self, msg, msgClass, msgId, priority=Priority.CONFIG,
+            timeout=None, retries=None):
+        """Send msg, return a Future of the matching ACK-ACK or ACK-NAK."""
+        return self._request(
+            msg, priority, None, (msgClass, msgId), None, timeout, retries)
+
+    def _request(self, msg, priority, responseKey, ackKey, match, timeout,
+                 retries):
+        req = _Request(
+            msg, priority, responseKey, ackKey, match,
+            self.timeout if timeout is None else timeout,
+            self.retries if retries is None else retries,
+            "{:02X}:{:02X}".format(*(responseKey or ackKey)))
+        with self._cond:
+            if self._closed:
+                raise CorrelatorClosed("Correlator is closed.")
+            self._register(req)
+            if self._timer is None:
+                self._timer = threading.Thread(
+                    target=self._timerLoop, name="UBXCorrelator", daemon=True)
+                self._timer.start()
+        self._send(msg, priority)
+        return req.future
+
+    def _register(self, req):
+        """Register one attempt of req (with _cond held)."""
+        if req.responseKey is not None:
+            q = self._responses.setdefault(req.responseKey, deque())
+            if req not in q:
+                q.append(req)
+        if req.ackKey is not None:
+            self._acks.setdefault(req.ackKey, deque()).append(req)
+        heapq.heappush(
+            self._deadlines,
+            (time.monotonic() + req.timeout, next(self._seq), req))
+        self._cond.notify()
+
+    def _unregister(self, req):
+        """Remove all pending attempts of req (with _cond held)."""
+        for table, key in ((self._responses, req.responseKey),
+                           (self._acks, req.ackKey)):
+            q = table.get(key)
+            while q is not None and req in q:
+                q.remove(req)
+            if q is not None and not q:
+                del table[key]
+
+    def pending(self):
+        """Return the number of requests waiting for a response."""
+        with self._cond:
+            return len(set(r for (_, _, r) in self._deadlines
+                           if not r.finished()))
+
+    def dispatch(self, obj):
+        """Resolve the request that obj answers, return True if there was one."""
+        if not self._responses and not self._acks:
+            return False
+        isAck = obj._class == UBX.ACK._class
+        with self._cond:
+            if isAck:
+                key = (obj.clsID, obj.msgID)
+                q = self._acks.get(key)
+                if not q:
+                    return False
+                req = q.popleft()
+                if not q:
+                    del self._acks[key]
+                if req.finished():
+                    return True     # ACK of a poll or of a retry
+                if req.responseKey is not None:
+                    if obj._id == UBX.ACK.ACK._id:
+                        return True     # the poll response comes separately
+                    self._unregister(req)
+            else:
+                key = (obj._class, obj._id)
+                q = self._responses.get(key)
+                if not q:
+                    return False
+                req = next((r for r in q if not r.finished() and
+                            (r.match is None or r.match(obj))), None)
+                if req is None:
+                    return False
+                q.remove(req)
+                if not q:
+                    del self._responses[key]
+            if not req.claim():
+                return True
+        req.future.set_result(obj)
+        return True
+
+    def _timerLoop(self):
+        """Re-send or fail the requests whose deadline has passed."""
+        while True:
+            expired = []
+            with self._cond:
+                while not self._closed:
+                    if not self._deadlines:
+                        self._cond.wait()
+                        continue
+                    wait = self._deadlines[0][0] - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if self._closed:
+                    return
+                now = time.monotonic()
+                while self._deadlines and self._deadlines[0][0] <= now:
+                    expired.append(heapq.heappop(self._deadlines)[2])
+                resend, failed = [], []
+                for req in expired:
+                    if req.finished():
+                        self._unregister(req)   # drop unanswered ACKs
+                    elif req.retries > 0:
+                        req.retries -= 1
+                        self._register(req)
+                        resend.append(req)
+                    else:
+                        self._unregister(req)
+                        if req.claim():
+                            failed.append(req)
+            for req in failed:
+                req.future.set_exception(TimeoutError(
+                    "No response to {} within {} s"
+                    .format(req.name, req.timeout)))
+            for req in resend:
+                self._send(req.msg, req.priority)
+
+    def close(self):
+        """Fail all requests in flight with CorrelatorClosed."""
+        with self._cond:
+            self._closed = True
+            requests = set(r for (_, _, r) in self._deadlines)
+            self._responses.clear()
+            self._acks.clear()
+            self._deadlines = []
+            self._cond.notify_all()
+        for req in requests:
+            if req.claim():
+                req.future.set_exception(CorrelatorClosed(
+                    "Closed before a response to {}".format(req.name)))
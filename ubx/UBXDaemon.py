@@ -0,0 +1,423 @@
+"""Share one receiver among many local processes.
+
+UBXDaemon owns the serial port, runs one framer on it and serves the frames
+to any number of clients on a Unix socket. A client receives the valid UBX
+and NMEA frames it subscribed to, byte for byte (NMEA sentences end with
+CR LF), so what a client reads looks like the receiver's output and is
+parsed by an ordinary UBXManager.
+
+Clients send records of a 4 byte header and a body, the header is
+struct '<cBH' (command, priority, length of body):
+
+- b'W': write body to the port with the given Priority
+- b'C': body continues in the next record, for writes of more than 64 KiB;
+  the bodies up to the closing b'W' are queued as one write
+- b'S': replace the subscription with the ASCII filter in body
+
+A subscription is a comma-separated list of terms, a frame is sent if it
+matches any of them:
+
+- '*': everything
+- 'UBX', 'NMEA': all UBX messages, all NMEA sentences
+- 'CC': UBX messages of class CC (hex), e.g. '06'
+- 'CC:II': UBX messages of class CC and id II (hex), e.g. '01:07'
+- '$XXX': NMEA sentences of type XXX from any talker, e.g. '$GGA'
+
+New clients receive nothing until their first b'S' record, which
+DaemonConnection sends on connect. DaemonConnection is the client end and
+is used in place of the serial port:
+
+    manager = UBXManager(DaemonConnection('/tmp/ubx.sock', '01,05,06,0A'))
+"""
+
+import os
+import selectors
+import socket
+import stat
+import struct
+import threading
+from ubx.UBXFramer import FrameKind
+from ubx.UBXManager import UBXManager
+from ubx.UBXTransmit import Priority
+
+_record = struct.Struct('<cBH')
+
+
+class Subscription:
+    """Frame filter parsed from a subscription string."""
+
+    def __init__(self, spec='*'):
+        self.spec = spec
+        self.allUBX = self.allNMEA = False
+        self.classes = set()
+        self.ids = set()
+        self.sentences = set()
+        for term in spec.split(','):
+            term = term.strip()
+            if not term:
+                continue
+            if term == '*':
+                self.allUBX = self.allNMEA = True
+            elif term.upper() == 'UBX':
+                self.allUBX = True
+            elif term.upper() == 'NMEA':
+                self.allNMEA = True
+            elif term.startswith('$'):
+                self.sentences.add(term[1:].encode('ascii'))
+            elif ':' in term:
+                msgClass, msgId = term.split(':')
+                self.ids.add((int(msgClass, 16), int(msgId, 16)))
+            else:
+                self.classes.add(int(term, 16))
+
+    def matches(self, kind, frame):
+        """Test whether the framer's (kind, frame) passes the filter."""
+        if kind == FrameKind.UBX:
+            return (self.allUBX or frame[2] in self.classes or
+                    (frame[2], frame[3]) in self.ids)
+        if kind == FrameKind.NMEA:
+            if self.allNMEA:
+                return True
+            address = frame[1:frame.find(b',')]
+            return address[2:] in self.sentences or address in self.sentences
+        return False
+
+
+class _Client:
+    """A connected client and its unsent output."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.subscription = Subscription('')
+        self.out = bytearray()
+        self.inbuf = bytearray()
+        self.partial = bytearray()  # bodies of b'C' records
+        self.dropped = 0    # frames dropped because the client lagged
+        self.dead = False
+
+    def push(self, frame):
+        """Send or buffer frame, return True if the server has work."""
+        if self.dead:
+            return False
+        if not self.out:
+            try:
+                n = self.sock.send(frame)
+            except BlockingIOError:
+                n = 0
+            except OSError:
+                self.dead = True
+                return True
+            if n == len(frame):
+                return False
+            frame = frame[n:]
+        self.out += frame
+        return True
+
+    def flush(self):
+        """Send as much of the buffered output as possible."""
+        try:
+            n = self.sock.send(self.out)
+        except BlockingIOError:
+            return
+        except OSError:
+            self.dead = True
+            return
+        del self.out[:n]
+
+
+class UBXDaemon(UBXManager):
+    """UBXManager that serves the receiver's frames on a Unix socket."""
+
+    def __init__(self, ser, path, debug=False, eofTimeout=None,
+                 maxBuffer=1 << 20, overflow='drop', lagging=None):
+        """
+        :param ser: serial port, passed to UBXManager
+        :param path: path of the Unix socket
+        :param maxBuffer: bytes buffered per client that is not keeping up
+        :param overflow: what happens to a client whose buffer is full,
+            'drop' drops the frames that do not fit, 'evict' disconnects it
+        :param lagging: optional subscription string, a client with more
+            than half of maxBuffer buffered only gets the frames that match
+            it, e.g. '01:07,$GGA' to keep the fixes and shed the rest
+        """
+        if overflow not in ('drop', 'evict'):
+            raise ValueError("overflow must be 'drop' or 'evict'")
+        UBXManager.__init__(self, ser, debug=debug, eofTimeout=eofTimeout)
+        self.path = path
+        self.maxBuffer = maxBuffer
+        self.overflow = overflow
+        self.lagging = None if lagging is None else Subscription(lagging)
+        self.evicted = 0
+        self._dropped = 0       # frames dropped for clients that are gone
+        self._clients = {}      # socket -> _Client, with _lock
+        self._lock = threading.Lock()
+        self._wakeRead, self._wakeWrite = socket.socketpair()
+        self._wakeWrite.setblocking(False)
+        self._listener = self._listen()
+        self._closed = False
+
+    def run(self):
+        """Run the server, the parser and the transmitter."""
+        server = threading.Thread(
+            target=self._serveLoop, name="UBXDaemon", daemon=True)
+        server.start()
+        try:
+            UBXManager.run(self)
+        finally:
+            self._close()
+
+    def _onFrame(self, kind, frame):
+        """Pass the frame to the subscribed clients, without parsing it."""
+        if kind == FrameKind.NMEA:
+            frame += b'\r\n'
+        elif kind != FrameKind.UBX:
+            return
+        pending = False
+        with self._lock:
+            for client in self._clients.values():
+                if client.dead or not client.subscription.matches(kind, frame):
+                    continue
+                backlog = len(client.out)
+                if backlog:
+                    # Frames are buffered whole or not at all, so that the
+                    # client never sees a partial frame
+                    if backlog + len(frame) > self.maxBuffer:
+                        if self.overflow == 'evict':
+                            client.dead = True
+                            self.evicted += 1
+                            pending = True
+                        else:
+                            client.dropped += 1
+                        continue
+                    if (self.lagging is not None and
+                            2 * backlog > self.maxBuffer and
+                            not self.lagging.matches(kind, frame)):
+                        client.dropped += 1
+                        continue
+                pending |= client.push(frame)
+        if pending:
+            self._wake()
+
+    def _wake(self):
+        try:
+            self._wakeWrite.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass    # a wake-up is already pending, or shutting down
+
+    def stats(self):
+        stats = UBXManager.stats(self)
+        with self._lock:
+            stats['clients'] = len(self._clients)
+            stats['droppedFrames'] = self._dropped + sum(
+                c.dropped for c in self._clients.values())
+            stats['evictedClients'] = self.evicted
+        return stats
+
+    def clients(self):
+        """Return a list of (subscription, buffered bytes, dropped frames)."""
+        with self._lock:
+            return [(c.subscription.spec, len(c.out), c.dropped)
+                    for c in self._clients.values()]
+
+    def _serveLoop(self):
+        """Accept clients, execute their records, send buffered output."""
+        sel = selectors.DefaultSelector()
+        try:
+            sel.register(self._listener, selectors.EVENT_READ)
+            sel.register(self._wakeRead, selectors.EVENT_READ)
+        except (OSError, ValueError):
+            return  # shut down before the loop started
+        interest = {}
+        while not self._closed:
+            try:
+                events = sel.select(timeout=0.5)
+            except (OSError, ValueError):
+                break   # closed by shutdown
+            for key, mask in events:
+                if key.fileobj is self._listener:
+                    self._accept(sel, interest)
+                elif key.fileobj is self._wakeRead:
+                    try:
+                        self._wakeRead.recv(4096)
+                    except OSError:
+                        break   # closed by shutdown
+                else:
+                    client = key.data
+                    if mask & selectors.EVENT_READ:
+                        self._receive(client)
+                    if mask & selectors.EVENT_WRITE:
+                        with self._lock:
+                            client.flush()
+            with self._lock:
+                for sock, client in list(self._clients.items()):
+                    if client.dead:
+                        self._dropped += client.dropped
+                        del self._clients[sock]
+                        del interest[sock]
+                        sel.unregister(sock)
+                        sock.close()
+                        continue
+                    events = selectors.EVENT_READ
+                    if client.out:
+                        events |= selectors.EVENT_WRITE
+                    if interest[sock] != events:
+                        interest[sock] = events
+                        sel.modify(sock, events, client)
+        sel.close()
+
+    def _accept(self, sel, interest):
+        try:
+            sock, _ = self._listener.accept()
+        except OSError:
+            return
+        sock.setblocking(False)
+        client = self._newClient(sock)
+        with self._lock:
+            self._clients[sock] = client
+        interest[sock] = selectors.EVENT_READ
+        sel.register(sock, selectors.EVENT_READ, client)
+
+    def _newClient(self, sock):
+        """Return the _Client of a newly accepted connection."""
+        return _Client(sock)
+
+    def _receive(self, client):
+        """Read from client and handle the data."""
+        try:
+            data = client.sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            client.dead = True
+            return
+        self._onClientData(client, data)
+
+    def _onClientData(self, client, data):
+        """Execute the complete records sent by client."""
+        buf = client.inbuf
+        buf += data
+        pos = 0
+        while len(buf) - pos >= _record.size:
+            command, priority, length = _record.unpack_from(buf, pos)
+            end = pos + _record.size + length
+            if end > len(buf):
+                break
+            body = bytes(buf[pos + _record.size:end])
+            pos = end
+            try:
+                if command == b'W':
+                    if client.partial:
+                        body = bytes(client.partial) + body
+                        client.partial.clear()
+                    self.send(body, Priority(priority))
+                elif command == b'C':
+                    client.partial += body
+                elif command == b'S':
+                    subscription = Subscription(body.decode('ascii'))
+                    with self._lock:
+                        client.subscription = subscription
+                else:
+                    raise ValueError("unknown command {}".format(command))
+            except Exception:
+                client.dead = True  # protocol error, disconnect
+                return
+        del buf[:pos]
+
+    def shutdown(self):
+        """Stop the daemon and remove the socket."""
+        UBXManager.shutdown(self)
+        self._close()
+
+    def _close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            clients = list(self._clients)
+            self._clients.clear()
+        self._unlink()
+        for sock in [self._listener, self._wakeRead, self._wakeWrite] + clients:
+            sock.close()
+
+    def _listen(self):
+        """Listen on the Unix socket, replace it if it is stale."""
+        path = self.path
+        if os.path.exists(path):
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise Exception("{} exists and is not a socket".format(path))
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except OSError:
+                os.unlink(path)     # nobody listening
+            else:
+                raise Exception("A daemon is already listening on {}".format(path))
+            finally:
+                probe.close()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(path)
+        os.chmod(path, 0o600)   # only the owner, before anyone can connect
+        listener.listen(16)
+        listener.setblocking(False)
+        return listener
+
+    def _unlink(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class DaemonConnection:
+    """Connection to a UBXDaemon that can be used as ser of a UBXManager.
+
+    recv() returns the subscribed frames, sendall() writes to the port.
+    """
+
+    def __init__(self, path, subscription='*', priority=Priority.CONFIG):
+        """
+        :param path: path of the daemon's Unix socket
+        :param subscription: filter, see the module documentation
+        :param priority: Priority of the data written with sendall
+        """
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.priority = priority
+        self._closed = False
+        self.subscribe(subscription)
+
+    def subscribe(self, subscription):
+        """Replace the subscription."""
+        self._send(b'S', 0, subscription.encode('ascii'))
+
+    def recv(self, n):
+        try:
+            return self.sock.recv(n)
+        except OSError:
+            if self._closed:
+                return b''
+            raise
+
+    def sendall(self, data):
+        """Have the daemon write data to the port, as one write."""
+        last = max(len(data) - 1, 0) // 0xffff * 0xffff
+        for i in range(0, last, 0xffff):
+            self._send(b'C', self.priority, data[i:i+0xffff])
+        self._send(b'W', self.priority, data[last:])
+
+    def _send(self, command, priority, body):
+        self.sock.sendall(_record.pack(command, priority, len(body)) + body)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        """Close the connection, a blocked recv() returns b''."""
+        self._closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Split a capture into one stream per message type.
+
+Frames are routed by their header only, payloads are not decoded. UBX
+frames go to a stream per class and id (NAV-PVT.ubx, or 01-FF.ubx for a
+message without definition), NMEA sentences to NMEA.nmea, or with
+splitNMEA to one stream per sentence type (NMEA-GGA.nmea), and frames
+with bad checksums and all other bytes to undecoded.bin:
+
+    with Demux(directoryOpener('out')) as demux:
+        for chunk in chunks:
+            demux.feed(chunk)
+    demux.counts        # {'NAV-PVT': [frames, bytes], ...}
+
+The frames of each stream in a chunk are written with a single write.
+"""
+
+import argparse
+import os
+import sys
+import time
+from ubx.UBXCapture import openCapture
+from ubx.UBXFramer import UBXFramer, FrameKind
+from ubx.UBXMetrics import messageName
+
+UNDECODED = 'undecoded'
+_extensions = {FrameKind.UBX: '.ubx', FrameKind.NMEA: '.nmea'}
+
+
+def directoryOpener(path, bufferSize=1 << 20):
+    """Return an opener that creates the stream files in directory path."""
+    os.makedirs(path, exist_ok=True)
+
+    def opener(filename):
+        return open(os.path.join(path, filename), 'wb', buffering=bufferSize)
+    return opener
+
+
+class Demux:
+    """Route the frames of a byte stream to one output per message type."""
+
+    def __init__(self, opener, splitNMEA=False):
+        """
+        :param opener: opener(filename) returns the binary file of a stream
+        :param splitNMEA: one stream per NMEA sentence type
+        """
+        self.opener = opener
+        self.splitNMEA = splitNMEA
+        self.outputs = {}       # name -> file
+        self.counts = {}        # name -> [frames, bytes]
+        self._names = {}        # (class, id) or NMEA address -> (name, filename)
+        self._framer = UBXFramer()
+
+    def _route(self, kind, frame):
+        """Return (name, filename) of the stream of the frame."""
+        if kind == FrameKind.UBX:
+            name = messageName(frame[2], frame[3])
+        elif kind == FrameKind.NMEA and self.splitNMEA:
+            address = frame[1:frame.find(b',')].decode('ascii', 'replace')
+            name = "NMEA-" + (address if address[:1] == 'P' else address[2:])
+        elif kind == FrameKind.NMEA:
+            name = "NMEA"
+        else:
+            name = UNDECODED
+        return name, name + _extensions.get(kind, '.bin')
+
+    def feed(self, data):
+        """Route the complete frames in data, keep the rest for later."""
+        names = self._names
+        groups = {}
+        for kind, frame in self._framer.feed(data):
+            if kind == FrameKind.UBX:
+                key = frame[2] << 8 | frame[3]
+            elif kind == FrameKind.NMEA:
+                key = frame[1:frame.find(b',')] if self.splitNMEA else b'$'
+                frame += b'\r\n'
+            else:
+                key = None
+            route = names.get(key)
+            if route is None:
+                route = names[key] = self._route(kind, frame)
+            frames = groups.get(route)
+            if frames is None:
+                frames = groups[route] = []
+            frames.append(frame)
+        for route, frames in groups.items():
+            self._write(route, frames)
+
+    def _write(self, route, frames):
+        name, filename = route
+        out = self.outputs.get(name)
+        if out is None:
+            out = self.outputs[name] = self.opener(filename)
+            self.counts[name] = [0, 0]
+        data = b''.join(frames)
+        out.write(data)
+        count = self.counts[name]
+        count[0] += len(frames)
+        count[1] += len(data)
+
+    def close(self):
+        """Write the bytes of an incomplete last frame as undecoded, close."""
+        pending = self._framer.reset()
+        if pending:
+            self._write((UNDECODED, UNDECODED + '.bin'), [pending])
+        for out in self.outputs.values():
+            out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def demux_main():
+    parser = argparse.ArgumentParser(
+        description='Split a UBX/NMEA capture into one file per message type.')
+    parser.add_argument('capture', help='binary capture, may be compressed, - for stdin')
+    parser.add_argument('-o', '--output', default='.', help='output directory')
+    parser.add_argument('--split-nmea', dest='splitNMEA', action='store_true',
+                        help='one file per NMEA sentence type')
+    parser.add_argument('--chunk-size', dest='chunkSize', type=int, default=1 << 20,
+                        help='bytes per read (default 1 MiB)')
+    args = parser.parse_args()
+
+    f = openCapture(sys.stdin.buffer if args.capture == '-' else args.capture)
+    total = 0
+    t0 = time.perf_counter()
+    try:
+        with Demux(directoryOpener(args.output), args.splitNMEA) as demux:
+            while True:
+                data = f.read(args.chunkSize)
+                if not data:
+                    break
+                total += len(data)
+                demux.feed(data)
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+    dt = max(time.perf_counter() - t0, 1e-9)
+    for name, (frames, size) in sorted(demux.counts.items()):
+        sys.stderr.write("{:20s} {:10d} frames {:14d} bytes\n".format(name, frames, size))
+    sys.stderr.write("{:.1f} MB in {:.2f} s: {:.1f} MB/s\n".format(
+        total / 1e6, dt, total / 1e6 / dt))
+
+
+if __name__ == '__main__':
+    demux_main()
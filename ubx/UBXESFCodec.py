@@ -0,0 +1,167 @@
+"""Vectorized encoding and decoding of ESF.MEAS messages.
+
+The scale factors and wire formats are the ones of SensorTransform, but all
+values of a batch are scaled and bit-packed in one NumPy step, and complete
+UBX frames (header, payload and checksum) are produced without creating
+SensorMeasurement or message objects. Likewise a batch of ESF.MEAS payloads
+is decoded into one time series per sensor data type in one pass.
+"""
+
+import struct
+from functools import lru_cache
+import numpy as np
+from ubx.UBXESFSensor import SensorDataType, SensorTransform
+from ubx.UBX.ESF import ESF
+
+
+def _checksums(frames):
+    """Write the UBX checksums of all rows of the uint8 array frames."""
+    body = frames[:, 2:-2].astype(np.int64)
+    weights = np.arange(body.shape[1], 0, -1, dtype=np.int64)
+    frames[:, -2] = body.sum(axis=1) & 0xff
+    frames[:, -1] = (body @ weights) & 0xff
+
+
+class MEASEncoder:
+    """Encode ESF.MEAS frames for a fixed list of sensor data types.
+
+    Each epoch carries one value per data type, in the order given here:
+
+        enc = MEASEncoder([SensorDataType.GYRO_Z, SensorDataType.SPEED], id=2)
+        frame = enc.encode(timeTag, [0.1, 12.5])
+        frames = enc.encodeBatch(timeTags, values)  # values.shape = (N, 2)
+    """
+
+    def __init__(self, dataTypes, id=0, dataId=None, timeMarkSent=0,
+                 timeMarkEdge=0, calibTtagValid=0):
+        """
+        :param dataTypes: sequence of SensorDataType, one per channel
+        :param id: identification number of the data provider
+        :param dataId: the 2 top bits of each data word, defaults to id
+        """
+        dataTypes = [SensorDataType(t) for t in dataTypes]
+        if not 0 < len(dataTypes) <= 0x1f:
+            raise ValueError('number of channels must be 1..31')
+        if any(t not in SensorTransform.scale for t in dataTypes):
+            raise ValueError('data_type does not exist')
+        dataId = id if dataId is None else dataId
+        if dataId > 0x03:
+            raise ValueError('data_id out of range')
+        self.dataTypes = dataTypes
+        self.id = id
+        numMeas = len(dataTypes)
+        scales = [SensorTransform.scale[t] for t in dataTypes]
+        self._tick = np.array([s is None for s in scales])
+        self._scale = np.array([1.0 if s is None else s for s in scales])
+        self._wordBase = np.array(
+            [dataId << 30 | t << 24 for t in dataTypes], dtype=np.uint32)
+        self._flags = ESF.MEAS._calculate_flags(
+            timeMarkSent, timeMarkEdge, calibTtagValid, numMeas)
+        self._dtype = np.dtype([
+            ('sync', 'u1', 2), ('msgClass', 'u1'), ('msgId', 'u1'),
+            ('length', '<u2'), ('timeTag', '<u4'), ('flags', '<u2'),
+            ('id', '<u2'), ('data', '<u4', (numMeas,)), ('chksum', 'u1', 2)
+        ])
+        self.frameSize = self._dtype.itemsize
+
+    def scale(self, values):
+        """Return the 24-bit wire representation of values, shape (N, C)."""
+        values = np.asarray(values, dtype=np.float64)
+        scaled = np.trunc(values * self._scale)
+        if np.any((scaled < -0x800000) | (scaled > 0x7fffff)):
+            raise ValueError('value out of range')
+        scaled = scaled.astype(np.int64)
+        tick = ((scaled < 0) << 23) | np.abs(scaled)
+        return np.where(self._tick, tick, scaled & 0xffffff).astype(np.uint32)
+
+    def encodeBatch(self, timeTags, values):
+        """Return the concatenated frames of N epochs as bytes.
+
+        :param timeTags: N time tags
+        :param values: N x C values, C being the number of data types
+        """
+        timeTags = np.atleast_1d(np.asarray(timeTags, dtype=np.uint32))
+        values = np.asarray(values, dtype=np.float64)\
+            .reshape(len(timeTags), len(self.dataTypes))
+        frames = np.zeros(len(timeTags), dtype=self._dtype)
+        frames['sync'] = (0xb5, 0x62)
+        frames['msgClass'] = ESF._class
+        frames['msgId'] = ESF.MEAS._id
+        frames['length'] = self.frameSize - 8
+        frames['timeTag'] = timeTags
+        frames['flags'] = self._flags
+        frames['id'] = self.id
+        frames['data'] = self._wordBase | self.scale(values)
+        _checksums(frames.view(np.uint8).reshape(len(frames), -1))
+        return frames.tobytes()
+
+    def encode(self, timeTag, values):
+        """Return the frame of a single epoch as bytes."""
+        return self.encodeBatch([timeTag], [values])
+
+
+@lru_cache(maxsize=64)
+def _encoder(dataTypes, id, dataId):
+    return MEASEncoder(dataTypes, id=id, dataId=dataId)
+
+
+def encodeMEAS(timeTag, measurements, id=0, dataId=None):
+    """Return the ESF.MEAS frame for a sequence of (dataType, value) pairs.
+
+    The encoders of the last 64 channel layouts are cached, so calling this
+    at a high rate with the same data types only costs the vectorized
+    scaling and packing.
+    """
+    dataTypes, values = zip(*measurements)
+    return _encoder(dataTypes, id, dataId).encode(timeTag, values)
+
+
+_measHeader = struct.Struct('<IHH')     # timeTag, flags, id
+
+
+def decodeMEAS(payloads):
+    """Decode ESF.MEAS payloads into per-sensor time series.
+
+    payloads is any iterable (a list or a generator fed from a stream) of
+    ESF.MEAS payloads. Returns a dict that maps each SensorDataType found
+    to a tuple (timeTag, value) of NumPy arrays. Values are scaled and
+    sign-converted like SensorTransform.inverse_transform does, wheel ticks
+    are int64 and all other values float64. Unknown data types are skipped.
+    Payloads shorter than numMeas data words are clipped to the complete
+    words they hold, shorter than the header skipped.
+    """
+    timeTags, counts, chunks = [], [], []
+    for payload in payloads:
+        if len(payload) < _measHeader.size:
+            continue
+        timeTag, flags, _ = _measHeader.unpack_from(payload)
+        numMeas = min(flags >> 11 & 0x1f, (len(payload) - _measHeader.size) // 4)
+        timeTags.append(timeTag)
+        counts.append(numMeas)
+        chunks.append(payload[8:8+4*numMeas])
+    words = np.frombuffer(b''.join(chunks), dtype='<u4')
+    timeTag = np.repeat(np.array(timeTags, dtype=np.uint32), counts)
+    dataType = (words >> 24) & 0x1f     # as SensorMeasurement.from_integer
+    raw = (words & 0xffffff).astype(np.int64)
+    value = np.where(raw & 0x800000, -(raw & 0x7fffff), raw)
+    series = {}
+    for t in np.unique(dataType).tolist():
+        if t not in SensorTransform.scale:
+            continue
+        sel = dataType == t
+        scale = SensorTransform.scale[t]
+        series[SensorDataType(t)] = (
+            timeTag[sel], value[sel] if scale is None else value[sel] / scale)
+    return series
+
+
+def decodeMEASFrames(frames):
+    """Like decodeMEAS, but for complete UBX frames.
+
+    Frames that are not ESF.MEAS are ignored, so the frames of a mixed
+    capture can be passed in directly.
+    """
+    return decodeMEAS(
+        frame[6:-2] for frame in frames
+        if frame[2] == ESF._class and frame[3] == ESF.MEAS._id
+    )
@@ -24,46 +24,22 @@ class SensorDataType(IntEnum):
 
 
 class SensorTransform:
-    scaler = {
-        SensorDataType.WHEELTICK_FL: {
-            'forward': lambda x: SensorTransform.convert_tick2wire(x),
-            'backward': lambda x: SensorTransform.convert_wire2tick(x)},
-        SensorDataType.WHEELTICK_FR: {
-            'forward': lambda x: SensorTransform.convert_tick2wire(x),
-            'backward': lambda x: SensorTransform.convert_wire2tick(x)},
-        SensorDataType.WHEELTICK_RL: {
-            'forward': lambda x: SensorTransform.convert_tick2wire(x),
-            'backward': lambda x: SensorTransform.convert_wire2tick(x)},
-        SensorDataType.WHEELTICK_RR: {
-            'forward': lambda x: SensorTransform.convert_tick2wire(x),
-            'backward': lambda x: SensorTransform.convert_wire2tick(x)},
-        SensorDataType.WHEELTICK_SINGLE: {
-            'forward': lambda x: SensorTransform.convert_tick2wire(x),
-            'backward': lambda x: SensorTransform.convert_wire2tick(x)},
-        SensorDataType.SPEED: {
-            'forward': lambda x: SensorTransform.scale_float2int(x, 1e3),
-            'backward': lambda x: SensorTransform.scale_int2float(x, 1e3)},
-        SensorDataType.GYRO_TEMPERATURE: {
-            'forward': lambda x: SensorTransform.scale_float2int(x, 1e2),
-            'backward': lambda x: SensorTransform.scale_int2float(x, 1e2)},
-        SensorDataType.GYRO_X: {
-            'forward': lambda x: SensorTransform.scale_float2int(x, 2 ** 12),
-            'backward': lambda x: SensorTransform.scale_int2float(x, 2 ** 12)},
-        SensorDataType.GYRO_Y: {
-            'forward': lambda x: SensorTransform.scale_float2int(x, 2 ** 12),
-            'backward': lambda x: SensorTransform.scale_int2float(x, 2 ** 12)},
-        SensorDataType.GYRO_Z: {
-            'forward': lambda x: SensorTransform.scale_float2int(x, 2 ** 12),
-            'backward': lambda x: SensorTransform.scale_int2float(x, 2 ** 12)},
-        SensorDataType.ACCEL_X: {
-            'forward': lambda x: SensorTransform.scale_float2int(x, 2 ** 10),
-            'backward': lambda x: SensorTransform.scale_int2float(x, 2 ** 10)},
-        SensorDataType.ACCEL_Y: {
-            'forward': lambda x: SensorTransform.scale_float2int(x, 2 ** 10),
-            'backward': lambda x: SensorTransform.scale_int2float(x, 2 ** 10)},
-        SensorDataType.ACCEL_Z: {
-            'forward': lambda x: SensorTransform.scale_float2int(x, 2 ** 10),
-            'backward': lambda x: SensorTransform.scale_int2float(x, 2 ** 10)}
+    # Scale factor of each data type. Wheel ticks are not scaled, they are
+    # sent as sign and magnitude (bit 23 is the direction).
+    scale = {
+        SensorDataType.WHEELTICK_FL: None,
+        SensorDataType.WHEELTICK_FR: None,
+        SensorDataType.WHEELTICK_RL: None,
+        SensorDataType.WHEELTICK_RR: None,
+        SensorDataType.WHEELTICK_SINGLE: None,
+        SensorDataType.SPEED: 1e3,
+        SensorDataType.GYRO_TEMPERATURE: 1e2,
+        SensorDataType.GYRO_X: 2 ** 12,
+        SensorDataType.GYRO_Y: 2 ** 12,
+        SensorDataType.GYRO_Z: 2 ** 12,
+        SensorDataType.ACCEL_X: 2 ** 10,
+        SensorDataType.ACCEL_Y: 2 ** 10,
+        SensorDataType.ACCEL_Z: 2 ** 10,
     }
 
     @staticmethod
@@ -85,6 +61,14 @@ class SensorTransform:
         x = -(x & 0x7fffff) if x & 0x800000 else x
         return x
 
+    @staticmethod
+    def _mkScaler(scaler):
+        if scaler is None:
+            return {'forward': SensorTransform.convert_tick2wire,
+                    'backward': SensorTransform.convert_wire2tick}
+        return {'forward': lambda x: SensorTransform.scale_float2int(x, scaler),
+                'backward': lambda x: SensorTransform.scale_int2float(x, scaler)}
+
     @staticmethod
     def transform(data_type, value):
         value = SensorTransform.scaler.get(data_type)['forward'](value)
@@ -97,6 +81,12 @@ class SensorTransform:
         return SensorTransform.scaler.get(data_type)['backward'](value)
 
 
+SensorTransform.scaler = {
+    data_type: SensorTransform._mkScaler(scaler)
+    for data_type, scaler in SensorTransform.scale.items()
+}
+
+
 class SensorMeasurement:
 
     def __init__(self, data_id: int, data_type: SensorDataType, value):
@@ -0,0 +1,168 @@
+"""Group the NAV messages of a navigation epoch by iTOW.
+
+The receiver sends NAV-PVT, NAV-DOP, NAV-SVINFO, NAV-RELPOSNED, ... of
+one epoch as separate frames with the same iTOW. EpochAssembler collects
+them and calls onEpoch once per epoch:
+
+    def onEpoch(epoch):
+        pvt, dop = epoch.get(UBX.NAV.PVT), epoch.get(UBX.NAV.DOP)
+
+    assembler = EpochAssembler(onEpoch, expected=[UBX.NAV.PVT, UBX.NAV.DOP],
+                               timeout=0.5)
+    manager.onUBX = assembler.add
+
+An epoch is closed when all expected types are in, when a later epoch
+starts (window epochs can be open at once, for frames out of order), when
+it is older than timeout, or by flush(). Frames of closed epochs are
+counted in late and dropped. An iTOW more than resetAfter ms before the
+latest epoch, e.g. after a receiver reset or at the start of another
+capture, closes the open epochs and starts over; it is counted in resets.
+"""
+
+import threading
+import time
+from ubx.UBX import NAV
+
+WEEK = 7 * 24 * 3600 * 1000     # iTOW wraps at the end of the week, ms
+
+
+def _newer(a, b):
+    """Whether iTOW a is later than iTOW b, across the week rollover."""
+    return 0 < (a - b) % WEEK < WEEK // 2
+
+
+class Epoch:
+    """The NAV messages with the same iTOW, by message class."""
+
+    def __init__(self, iTOW, rxTime):
+        self.iTOW = iTOW
+        self.rxTime = rxTime        # of the first message
+        self.messages = {}          # message class, e.g. UBX.NAV.PVT -> obj
+        self.complete = False       # whether all expected types are in
+
+    def __getitem__(self, msgCls):
+        return self.messages[msgCls]
+
+    def __contains__(self, msgCls):
+        return msgCls in self.messages
+
+    def __len__(self):
+        return len(self.messages)
+
+    def get(self, msgCls, default=None):
+        return self.messages.get(msgCls, default)
+
+    def __repr__(self):
+        return "Epoch({}, [{}])".format(self.iTOW, ", ".join(
+            "{}-{}".format(c._className, c.__name__) for c in self.messages))
+
+
+class EpochAssembler:
+    """Collect NAV messages into epochs and pass each epoch to onEpoch."""
+
+    def __init__(self, onEpoch, expected=(), timeout=None, window=1, resetAfter=5000):
+        """
+        :param onEpoch: called with each closed Epoch
+        :param expected: message classes that complete an epoch
+        :param timeout: seconds after its first message an epoch is closed
+        :param window: number of epochs that are open at the same time
+        :param resetAfter: backward iTOW jump in ms that starts over
+        """
+        self.onEpoch = onEpoch
+        self.expected = frozenset(expected)
+        self.timeout = timeout
+        self.window = window
+        self.resetAfter = resetAfter
+        self.epochs = 0             # closed epochs
+        self.late = 0               # messages of closed epochs
+        self.resets = 0             # backward jumps of iTOW
+        self._open = {}             # iTOW -> Epoch
+        self._lastClosed = None
+        self._latest = None         # iTOW of the latest epoch opened
+        self._lock = threading.Lock()
+
+    def _byAge(self):
+        """Return the open epochs, oldest first."""
+        if not self._open:
+            return []
+        ref = next(iter(self._open)) - WEEK // 2
+        return [self._open[t] for t in sorted(self._open, key=lambda t: (t - ref) % WEEK)]
+
+    def _close(self, epoch, closed):
+        del self._open[epoch.iTOW]
+        epoch.complete = self.expected.issubset(epoch.messages)
+        if self._lastClosed is None or _newer(epoch.iTOW, self._lastClosed):
+            self._lastClosed = epoch.iTOW
+        self.epochs += 1
+        closed.append(epoch)
+
+    def _expire(self, now, closed):
+        limit = now - self.timeout * 1e9
+        for epoch in [e for e in self._byAge() if e.rxTime <= limit]:
+            self._close(epoch, closed)
+
+    def _reset(self, iTOW, closed):
+        """Start over if iTOW jumped back by more than resetAfter."""
+        back = (self._latest - iTOW) % WEEK
+        if back <= self.resetAfter or back > WEEK // 2:
+            return
+        for epoch in self._byAge():
+            self._close(epoch, closed)
+        self._lastClosed = self._latest = None
+        self.resets += 1
+
+    def _emit(self, closed):
+        for epoch in closed:
+            self.onEpoch(epoch)
+
+    def add(self, obj):
+        """Add a message; messages without iTOW or of other classes are ignored."""
+        if getattr(obj, '_class', None) != NAV._class:
+            return
+        iTOW = getattr(obj, 'iTOW', None)
+        if iTOW is None:
+            return
+        now = getattr(obj, 'rxTime', None)
+        if now is None:
+            now = time.monotonic_ns()
+        closed = []
+        with self._lock:
+            if self.timeout is not None:
+                self._expire(now, closed)
+            epoch = self._open.get(iTOW)
+            if epoch is None and self._latest is not None:
+                self._reset(iTOW, closed)
+            if epoch is None:
+                if self._lastClosed is not None and not _newer(iTOW, self._lastClosed):
+                    self.late += 1
+                else:
+                    epoch = self._open[iTOW] = Epoch(iTOW, now)
+                    if self._latest is None or _newer(iTOW, self._latest):
+                        self._latest = iTOW
+            if epoch is not None:
+                epoch.messages[type(obj)] = obj
+                if self.expected and self.expected.issubset(epoch.messages):
+                    self._close(epoch, closed)
+                if len(self._open) > self.window:
+                    for old in self._byAge()[:len(self._open) - self.window]:
+                        self._close(old, closed)
+        self._emit(closed)
+
+    __call__ = add
+
+    def check(self, now=None):
+        """Close the epochs older than timeout, now in monotonic ns."""
+        if self.timeout is None:
+            return
+        closed = []
+        with self._lock:
+            self._expire(time.monotonic_ns() if now is None else now, closed)
+        self._emit(closed)
+
+    def flush(self):
+        """Close all open epochs, oldest first."""
+        closed = []
+        with self._lock:
+            for epoch in self._byAge():
+                self._close(epoch, closed)
+        self._emit(closed)
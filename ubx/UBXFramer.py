@@ -0,0 +1,166 @@
+"""Split a byte stream into complete UBX and NMEA frames.
+
+The framer works on chunks of any size: bytes are appended to an internal
+buffer and every complete frame is returned as a (kind, frame) tuple, where kind
+is a FrameKind and frame is the raw bytes of the frame:
+
+- UBX: a UBX message with correct checksum, from sync chars to checksum
+- NMEA: an NMEA sentence with correct checksum, from '$' to the two
+  checksum digits (without the trailing CR LF)
+- UBX_BAD, NMEA_BAD: a frame that failed the checksum test
+- JUNK: bytes that do not belong to any frame (line ends are not junk)
+
+Incomplete frames stay in the buffer until the next chunk arrives.
+
+feedTimed() also returns the arrival time of every frame: the time passed
+with the chunk that contained the frame's first byte.
+"""
+
+import re
+from enum import IntEnum
+from itertools import accumulate
+
+
+class FrameKind(IntEnum):
+    UBX = 0
+    NMEA = 1
+    UBX_BAD = 2
+    NMEA_BAD = 3
+    JUNK = 4
+
+
+UBX, NMEA, UBX_BAD, NMEA_BAD, JUNK = FrameKind
+
+MAX_NMEA_LENGTH = 1024     # u-blox PUBX,03 can be several hundred bytes
+
+_start = re.compile(rb'[\xb5$]')
+_lineEnds = re.compile(rb'[\r\n]*')
+
+
+def checksumUBX(frame):
+    """Return the checksum of the UBX frame, as stored in its last 2 bytes."""
+    body = memoryview(frame)[2:-2]
+    return bytes([sum(body) & 0xff, sum(accumulate(body)) & 0xff])
+
+
+def checksumNMEA(body):
+    """Return the NMEA checksum of body (between '$' and '*') as an int."""
+    chksum = 0
+    for c in body:
+        chksum ^= c
+    return chksum
+
+
+class UBXFramer:
+    """Incremental framer for a mixed UBX/NMEA byte stream."""
+
+    def __init__(self, maxUBXLength=8192, maxNMEALength=MAX_NMEA_LENGTH):
+        """
+        :param maxUBXLength: longer UBX payloads are considered corrupt
+        :param maxNMEALength: longer NMEA sentences are considered corrupt
+        """
+        self.maxUBXLength = maxUBXLength
+        self.maxNMEALength = maxNMEALength
+        self._buf = bytearray()
+        self._time = None       # arrival time of the buffered bytes
+        self._carried = 0       # frames of the last feed that began in _buf
+        self._pendingCarried = False    # _buf began in an earlier chunk
+
+    def pending(self):
+        """Return the number of buffered bytes of an incomplete frame."""
+        return len(self._buf)
+
+    def reset(self):
+        """Drop the buffered bytes and return them."""
+        pending = bytes(self._buf)
+        self._buf = bytearray()
+        self._time = None
+        return pending
+
+    def feedTimed(self, data, t):
+        """Like feed, but return (kind, frame, t) triples.
+
+        t is the time data arrived, e.g. time.monotonic_ns(). Frames that
+        began in an earlier chunk get the time of that chunk.
+        """
+        before = self._time
+        frames = self.feed(data)
+        carried = self._carried
+        if not self._buf:
+            self._time = None
+        elif not self._pendingCarried:
+            self._time = t
+        timed = [(kind, frame, t) for (kind, frame) in frames]
+        for i in range(carried):
+            timed[i] = (frames[i][0], frames[i][1], before)
+        return timed
+
+    def feed(self, data):
+        """Append data and return the list of (kind, frame) found."""
+        buf = self._buf
+        old = len(buf)
+        buf += data
+        n = len(buf)
+        pos = 0
+        frames = []
+        carried = None
+        while pos < n:
+            if carried is None and pos >= old:
+                carried = len(frames)
+            c = buf[pos]
+            if c == 0xb5:
+                if n - pos < 6:
+                    if n - pos >= 2 and buf[pos+1] != 0x62:
+                        frames.append((JUNK, bytes(buf[pos:pos+1])))
+                        pos += 1
+                        continue
+                    break
+                if buf[pos+1] != 0x62:
+                    frames.append((JUNK, bytes(buf[pos:pos+1])))
+                    pos += 1
+                    continue
+                length = buf[pos+4] | buf[pos+5] << 8
+                if length > self.maxUBXLength:
+                    frames.append((JUNK, bytes(buf[pos:pos+2])))
+                    pos += 2
+                    continue
+                end = pos + 8 + length
+                if end > n:
+                    break
+                frame = bytes(buf[pos:end])
+                if checksumUBX(frame) == frame[-2:]:
+                    frames.append((UBX, frame))
+                else:
+                    frames.append((UBX_BAD, frame))
+                pos = end
+            elif c == 0x24:     # '$'
+                star = buf.find(b'*', pos+1, pos + self.maxNMEALength)
+                if star < 0:
+                    if n - pos < self.maxNMEALength:
+                        break
+                    frames.append((JUNK, bytes(buf[pos:pos+1])))
+                    pos += 1
+                    continue
+                end = star + 3
+                if end > n:
+                    break
+                frame = bytes(buf[pos:end])
+                try:
+                    ok = int(frame[-2:], 16) == checksumNMEA(frame[1:-3])
+                except ValueError:
+                    ok = False
+                frames.append((NMEA if ok else NMEA_BAD, frame))
+                pos = end
+            else:
+                pos = _lineEnds.match(buf, pos).end()
+                if pos == n:
+                    break
+                m = _start.search(buf, pos)
+                end = n if m is None else m.start()
+                if end > pos:
+                    frames.append((JUNK, bytes(buf[pos:end])))
+                pos = end
+        self._carried = len(frames) if carried is None else carried
+        self._pendingCarried = pos < old
+        del buf[:pos]
+        return frames
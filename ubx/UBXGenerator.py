@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""Generate synthetic UBX and NMEA traffic.
+
+UBX frames are built from the Fields definitions of the message classes,
+with random values, scripted values or a mix of both. The number of
+repeated blocks is random or fixed, and a count field such as numCh is set
+accordingly. Epochs of a configurable message mix are produced at a given
+navigation rate, NMEA sentences can be interleaved, and bit flips,
+truncated frames and garbage bytes can be injected:
+
+    gen = TrafficGenerator(
+        [Stream(UBX.NAV.PVT), Stream(UBX.NAV.SVINFO, repeats=12),
+         Stream(UBX.ESF.MEAS, perEpoch=10)],
+        nmea=['GGA', 'RMC'], rate=10,
+        noise=Noise(bitFlips=1e-5, truncations=1e-3, garbage=1e-3))
+
+gen.frames() yields (timestamp, frame) pairs like a capture, so the sinks
+and pacing of UBXReplay apply, e.g. to feed a pty at 10 times real
+traffic:
+
+    Replay(gen.frames(epochs=6000), PtySink(), speed=10, clock='host').run()
+"""
+
+import argparse
+import math
+import random
+import struct
+import sys
+from ubx import UBX
+from ubx.UBXMessage import UBXMessage
+from ubx.parse_NMEA_log import NMEAChkSum
+
+# Messages with a repeated block whose count is stored in a field. Maps
+# (class, id) to (field name, bit offset, bit width) of the count.
+repeatCounts = {
+    (UBX.CFG._class, UBX.CFG.GNSS._id): ('numConfigBlocks', 0, 8),
+    (UBX.NAV._class, UBX.NAV.SVINFO._id): ('numCh', 0, 8),
+    (UBX.MON._class, UBX.MON.SPAN._id): ('numRfBlocks', 0, 8),
+    (UBX.ESF._class, UBX.ESF.MEAS._id): ('flags', 11, 5),
+}
+
+
+def randomValue(typ, rng):
+    """Return a random value of Types instance typ."""
+    if typ.fmt in ('f', 'd'):
+        return rng.uniform(-1e4, 1e4)
+    if typ.fmt is None:     # CH or U
+        if getattr(typ, '_nullTerminatedString', False):
+            n = rng.randrange(typ.N)
+            return ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 .')
+                           for _ in range(n))
+        return bytes(rng.getrandbits(8) for _ in range(typ.N))
+    bits = 8 * typ._size
+    value = rng.getrandbits(bits)
+    if typ.fmt.islower():   # signed
+        value -= 1 << (bits - 1)
+    return value
+
+
+def buildPayload(msgCls, values=None, repeats=None, n=0, rng=random):
+    """Return the payload of a msgCls message, e.g. UBX.NAV.SVINFO.
+
+    values maps field names to values. A value can be a callable f(n) for
+    scripted values, n is passed through and usually counts the messages.
+    A value of a field in the repeated block is a list with one entry per
+    block or a callable f(n, i) of the block index i. Fields without a
+    value are random, reserved fields are zero. repeats is the number of
+    repeated blocks, random if None.
+    """
+    values = values or {}
+    types, names = msgCls._fieldInfo['once']
+    repeat = msgCls._fieldInfo['repeat']
+    key = (_classOf(msgCls), msgCls._id)
+    if repeat and repeats is None:
+        limit = 8
+        if key in repeatCounts:
+            limit = min(limit, (1 << repeatCounts[key][2]) - 1)
+        repeats = rng.randint(1, limit)
+
+    def value(name, typ, v):
+        if name.startswith('reserved'):
+            return bytes(typ._size) if typ.fmt is None else 0
+        if v is None:
+            return randomValue(typ, rng)
+        return v
+
+    fmt = ['<']
+    args = []
+    for typ, name in zip(types, names):
+        v = values.get(name)
+        args.append(value(name, typ, v(n) if callable(v) else v))
+        fmt.append(typ.packFmt)
+    if key in repeatCounts and repeat:
+        name, shift, width = repeatCounts[key]
+        i = names.index(name)
+        mask = ((1 << width) - 1) << shift
+        args[i] = (args[i] & ~mask) | (repeats << shift)
+    if repeat:
+        rTypes, rNames = repeat['once']
+        for i in range(repeats):
+            for typ, name in zip(rTypes, rNames):
+                v = values.get(name)
+                if callable(v):
+                    v = v(n, i)
+                elif v is not None:
+                    v = v[i % len(v)]
+                args.append(value(name, typ, v))
+                fmt.append(typ.packFmt)
+    allTypes = list(types) + (list(repeat['once'][0]) * repeats if repeat else [])
+    args = [t.packValue(a) if hasattr(t, 'packValue') else a
+            for t, a in zip(allTypes, args)]
+    return struct.pack(''.join(fmt), *args)
+
+
+def _classOf(msgCls):
+    """Return the UBX class number of message class msgCls."""
+    name = msgCls.__qualname__.split('.')[0]
+    return getattr(UBX, name)._class
+
+
+class Stream:
+    """A message in the mix of a TrafficGenerator."""
+
+    def __init__(self, msgCls, perEpoch=1, values=None, repeats=None):
+        """
+        :param msgCls: the message class, e.g. UBX.NAV.PVT
+        :param perEpoch: number of messages per epoch
+        :param values: field values, see buildPayload
+        :param repeats: number of repeated blocks, random if None
+        """
+        self.msgCls = msgCls
+        self.msgClass = _classOf(msgCls)
+        self.perEpoch = perEpoch
+        self.values = dict(values or {})
+        self.repeats = repeats
+        self.count = 0
+
+
+class Noise:
+    """Faults injected into the generated frames."""
+
+    def __init__(self, bitFlips=0.0, truncations=0.0, garbage=0.0,
+                 maxGarbage=64):
+        """
+        :param bitFlips: probability that a byte has a flipped bit
+        :param truncations: probability that a frame is cut short
+        :param garbage: probability that random bytes precede a frame
+        :param maxGarbage: most garbage bytes inserted at once
+        """
+        self.bitFlips = bitFlips
+        self.truncations = truncations
+        self.garbage = garbage
+        self.maxGarbage = maxGarbage
+
+
+class TrafficGenerator:
+    """Produce epochs of UBX messages and NMEA sentences."""
+
+    NMEA_TYPES = ('GGA', 'RMC', 'GSA', 'VTG', 'GLL')
+
+    def __init__(self, mix, nmea=(), rate=1.0, noise=None, seed=None,
+                 startTOW=0):
+        """
+        :param mix: list of Stream
+        :param nmea: NMEA sentence types per epoch, see NMEA_TYPES
+        :param rate: epochs per second
+        :param noise: optional Noise
+        :param seed: seed of the random generator, for reproducible output
+        :param startTOW: iTOW of the first epoch in ms
+        """
+        for t in nmea:
+            if t not in self.NMEA_TYPES:
+                raise ValueError("Unknown NMEA sentence type {}".format(t))
+        self.mix = mix
+        self.nmea = list(nmea)
+        self.rate = rate
+        self.noise = noise
+        self.rng = random.Random(seed)
+        self.startTOW = startTOW
+        self.injected = {'bitFlips': 0, 'truncations': 0, 'garbage': 0}
+
+    def iTOW(self, epoch):
+        """Return the iTOW of epoch in ms."""
+        return self.startTOW + int(round(1000 * epoch / self.rate))
+
+    def epoch(self, epoch):
+        """Return the list of frames of epoch number epoch."""
+        frames = []
+        tow = self.iTOW(epoch)
+        for stream in self.mix:
+            for _ in range(stream.perEpoch):
+                values = stream.values
+                if 'iTOW' in stream.msgCls._fieldInfo['once'][1] and 'iTOW' not in values:
+                    values = dict(values, iTOW=tow)
+                payload = buildPayload(stream.msgCls, values, stream.repeats,
+                                       stream.count, self.rng)
+                stream.count += 1
+                frames.append(bytes(UBXMessage.make(
+                    stream.msgClass, stream.msgCls._id, payload)))
+        for sentence in self.nmea:
+            frames.append(self._nmea(sentence, tow))
+        if self.noise is not None:
+            frames = [self._corrupt(f) for f in frames]
+        return frames
+
+    def frames(self, epochs=None):
+        """Yield (timestamp, frame) of epochs epochs, forever if None."""
+        epoch = 0
+        while epochs is None or epoch < epochs:
+            t = epoch / self.rate
+            for frame in self.epoch(epoch):
+                yield t, frame
+            epoch += 1
+
+    def _nmea(self, sentence, tow):
+        rng = self.rng
+        secs = (tow // 1000) % 86400
+        hms = "{:02d}{:02d}{:02d}.{:02d}".format(
+            secs // 3600, secs // 60 % 60, secs % 60, tow % 1000 // 10)
+        lat = "{:02d}{:08.5f},{}".format(rng.randrange(90), rng.uniform(0, 60),
+                                         rng.choice('NS'))
+        lon = "{:03d}{:08.5f},{}".format(rng.randrange(180), rng.uniform(0, 60),
+                                         rng.choice('EW'))
+        if sentence == 'GGA':
+            body = "GNGGA,{},{},{},1,{:02d},{:.2f},{:.1f},M,{:.1f},M,,".format(
+                hms, lat, lon, rng.randrange(4, 30), rng.uniform(0.5, 3),
+                rng.uniform(0, 1000), rng.uniform(-50, 50))
+        elif sentence == 'RMC':
+            body = "GNRMC,{},A,{},{},{:.3f},,010120,,,A".format(
+                hms, lat, lon, rng.uniform(0, 50))
+        elif sentence == 'GSA':
+            sats = ",".join("{:02d}".format(rng.randrange(1, 33)) for _ in range(12))
+            body = "GNGSA,A,3,{},{:.2f},{:.2f},{:.2f}".format(
+                sats, rng.uniform(1, 3), rng.uniform(0.5, 2), rng.uniform(0.5, 2))
+        elif sentence == 'VTG':
+            body = "GNVTG,{:.2f},T,,M,{:.3f},N,{:.3f},K,A".format(
+                rng.uniform(0, 360), rng.uniform(0, 30), rng.uniform(0, 55))
+        else:
+            body = "GNGLL,{},{},{},A,A".format(lat, lon, hms)
+        return "${}*{}\r\n".format(body, NMEAChkSum(body).upper()).encode('ascii')
+
+    def _corrupt(self, frame):
+        """Apply the noise to frame."""
+        noise, rng = self.noise, self.rng
+        if noise.bitFlips > 0:
+            frame = bytearray(frame)
+            pos = _skip(rng, noise.bitFlips)
+            while pos < len(frame):
+                frame[pos] ^= 1 << rng.randrange(8)
+                self.injected['bitFlips'] += 1
+                pos += 1 + _skip(rng, noise.bitFlips)
+            frame = bytes(frame)
+        if noise.truncations > 0 and rng.random() < noise.truncations:
+            frame = frame[:rng.randrange(1, len(frame))]
+            self.injected['truncations'] += 1
+        if noise.garbage > 0 and rng.random() < noise.garbage:
+            n = rng.randint(1, noise.maxGarbage)
+            frame = bytes(rng.getrandbits(8) for _ in range(n)) + frame
+            self.injected['garbage'] += 1
+        return frame
+
+
+def _skip(rng, p):
+    """Return the number of bytes before the next event of probability p."""
+    if p >= 1:
+        return 0
+    return int(math.log(1.0 - rng.random()) / math.log(1.0 - p))
+
+
+def _messageClass(name):
+    """Return the message class of a name like NAV-PVT."""
+    clsName, _, msgName = name.partition('-')
+    try:
+        return getattr(getattr(UBX, clsName), msgName)
+    except AttributeError:
+        raise ValueError("Unknown message {}".format(name))
+
+
+def generate_main():
+    parser = argparse.ArgumentParser(
+        description='Generate synthetic UBX/NMEA traffic.')
+    parser.add_argument('--mix', default='NAV-PVT,NAV-SVINFO',
+                        help='messages per epoch, e.g. NAV-PVT,ESF-MEAS:10')
+    parser.add_argument('--nmea', default='GGA,RMC',
+                        help='NMEA sentences per epoch, e.g. GGA,RMC,GSA')
+    parser.add_argument('--rate', type=float, default=1.0, help='epochs per second')
+    parser.add_argument('--epochs', type=int, help='number of epochs, default forever')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='multiple of real time, 0 = as fast as possible')
+    parser.add_argument('--bit-flips', dest='bitFlips', type=float, default=0.0,
+                        help='probability of a bit flip per byte')
+    parser.add_argument('--truncate', type=float, default=0.0,
+                        help='probability of a truncated frame')
+    parser.add_argument('--garbage', type=float, default=0.0,
+                        help='probability of garbage bytes before a frame')
+    parser.add_argument('--seed', type=int, help='random seed')
+    parser.add_argument('--output', default='-',
+                        help='file to write to, - for stdout (default)')
+    parser.add_argument('--pty', action='store_true', help='write to a pty')
+    parser.add_argument('--tcp', metavar='HOST:PORT', help='write to HOST:PORT')
+    parser.add_argument('--listen', action='store_true',
+                        help='with --tcp, wait for a client on HOST:PORT')
+    args = parser.parse_args()
+
+    from ubx.UBXReplay import Replay, PtySink, TCPSink
+    mix = []
+    for item in filter(None, args.mix.split(',')):
+        name, _, count = item.partition(':')
+        mix.append(Stream(_messageClass(name), int(count or 1)))
+    noise = None
+    if args.bitFlips or args.truncate or args.garbage:
+        noise = Noise(args.bitFlips, args.truncate, args.garbage)
+    gen = TrafficGenerator(mix, list(filter(None, args.nmea.split(','))),
+                           args.rate, noise, args.seed)
+    if args.tcp:
+        host, _, port = args.tcp.rpartition(':')
+        sink = TCPSink((host, int(port)), listen=args.listen)
+    elif args.pty:
+        sink = PtySink()
+        sys.stderr.write("Writing to {}, press return to start\n".format(sink.name))
+        sys.stdin.readline()
+    else:
+        sink = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        stats = Replay(gen.frames(args.epochs), sink, args.speed, 'host').run()
+    except (KeyboardInterrupt, BrokenPipeError):
+        return
+    finally:
+        if sink is not sys.stdout.buffer:
+            sink.close()
+    sys.stderr.write("{}\n".format(stats))
+
+
+if __name__ == '__main__':
+    generate_main()
@@ -0,0 +1,123 @@
+"""Vectorized WGS-84 coordinate conversions for batches of epochs.
+
+All functions take NumPy arrays (or scalars) and convert whole tracks at
+once. Angles are in degrees, lengths in meters, ECEF and ENU/NED vectors
+are arrays of shape (N, 3):
+
+    pvt = columns(data, UBX.NAV.PVT)
+    lat, lon, height = pvtLLH(pvt)
+    xyz = llhToECEF(lat, lon, height)
+    enu = ecefToENU(xyz, svinECEF(svin))     # relative to a survey-in base
+"""
+
+import numpy as np
+
+A = 6378137.0                   # WGS-84 semi-major axis
+F = 1 / 298.257223563           # flattening
+B = A * (1 - F)                 # semi-minor axis
+E2 = F * (2 - F)                # first eccentricity squared
+EP2 = E2 / (1 - E2)             # second eccentricity squared
+
+
+def pvtLLH(pvt, msl=False):
+    """Return lat, lon (deg) and height (m) of NAV-PVT columns.
+
+    The height is above the ellipsoid, or above mean sea level with msl.
+    """
+    return (pvt['lat'] * 1e-7, pvt['lon'] * 1e-7,
+            (pvt['hMSL'] if msl else pvt['height']) * 1e-3)
+
+
+def pvtVelNED(pvt):
+    """Return the NED velocities (m/s) of NAV-PVT columns, shape (N, 3)."""
+    return np.stack([pvt['velN'], pvt['velE'], pvt['velD']], axis=-1) * 1e-3
+
+
+def svinECEF(svin):
+    """Return the ECEF mean position (m) of a TIM-SVIN message."""
+    return np.array([svin.meanX, svin.meanY, svin.meanZ]) * 1e-2
+
+
+def llhToECEF(lat, lon, height):
+    """Convert geodetic coordinates to ECEF, shape (N, 3)."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    sinLat, cosLat = np.sin(lat), np.cos(lat)
+    n = A / np.sqrt(1 - E2 * sinLat * sinLat)
+    return np.stack([(n + height) * cosLat * np.cos(lon),
+                     (n + height) * cosLat * np.sin(lon),
+                     (n * (1 - E2) + height) * sinLat], axis=-1)
+
+
+def ecefToLLH(xyz):
+    """Convert ECEF to lat, lon (deg) and height (m), closed form."""
+    xyz = np.asarray(xyz, dtype=np.float64)
+    x, y, z = xyz[..., 0], xyz[..., 1], xyz[..., 2]
+    # Heikkinen (1982)
+    p2 = x * x + y * y
+    p = np.sqrt(p2)
+    z2 = z * z
+    f = 54 * B * B * z2
+    g = p2 + (1 - E2) * z2 - E2 * (A * A - B * B)
+    c = E2 * E2 * f * p2 / (g * g * g)
+    s = np.cbrt(1 + c + np.sqrt(c * c + 2 * c))
+    k = s + 1 + 1 / s
+    pp = f / (3 * k * k * g * g)
+    q = np.sqrt(1 + 2 * E2 * E2 * pp)
+    r0 = (-pp * E2 * p / (1 + q)
+          + np.sqrt(np.maximum(
+              0.5 * A * A * (1 + 1 / q) - pp * (1 - E2) * z2 / (q * (1 + q))
+              - 0.5 * pp * p2, 0)))
+    d = p - E2 * r0
+    u = np.sqrt(d * d + z2)
+    v = np.sqrt(d * d + (1 - E2) * z2)
+    z0 = B * B * z / (A * v)
+    height = u * (1 - B * B / (A * v))
+    lat = np.degrees(np.arctan2(z + EP2 * z0, p))
+    lon = np.degrees(np.arctan2(y, x))
+    return lat, lon, height
+
+
+def enuRotation(lat, lon):
+    """Return the rotation matrices from ECEF to ENU, shape (..., 3, 3)."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    sinLat, cosLat = np.sin(lat), np.cos(lat)
+    sinLon, cosLon = np.sin(lon), np.cos(lon)
+    zero = np.zeros_like(sinLat * sinLon)
+    return np.stack([
+        np.stack([-sinLon + zero, cosLon + zero, zero], axis=-1),
+        np.stack([-sinLat * cosLon, -sinLat * sinLon, cosLat + zero], axis=-1),
+        np.stack([cosLat * cosLon, cosLat * sinLon, sinLat + zero], axis=-1),
+    ], axis=-2)
+
+
+def ecefToENU(xyz, ref):
+    """Return the ENU coordinates of ECEF xyz about the ECEF point ref."""
+    ref = np.asarray(ref, dtype=np.float64)
+    lat, lon, _ = ecefToLLH(ref)
+    return (np.asarray(xyz) - ref) @ enuRotation(lat, lon).T
+
+
+def enuToECEF(enu, ref):
+    """Return the ECEF coordinates of ENU enu about the ECEF point ref."""
+    ref = np.asarray(ref, dtype=np.float64)
+    lat, lon, _ = ecefToLLH(ref)
+    return np.asarray(enu) @ enuRotation(lat, lon) + ref
+
+
+def nedToENU(ned):
+    """Swap NED vectors to ENU."""
+    ned = np.asarray(ned)
+    return np.stack([ned[..., 1], ned[..., 0], -ned[..., 2]], axis=-1)
+
+
+def nedToECEF(ned, lat, lon):
+    """Rotate NED vectors at lat, lon (one per vector) to ECEF."""
+    ned = np.asarray(ned)
+    north, east, up = ned[..., 0], ned[..., 1], -ned[..., 2]
+    lat, lon = np.radians(lat), np.radians(lon)
+    sinLat, cosLat = np.sin(lat), np.cos(lat)
+    sinLon, cosLon = np.sin(lon), np.cos(lon)
+    horizontal = cosLat * up - sinLat * north
+    return np.stack([cosLon * horizontal - sinLon * east,
+                     sinLon * horizontal + cosLon * east,
+                     cosLat * north + sinLat * up], axis=-1)
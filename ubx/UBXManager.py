@@ -5,14 +5,34 @@ import threading
 from enum import Enum
 import sys
 from queue import Queue
+from concurrent.futures import Future
 from ubx import UBXMessage
+from ubx.UBXFramer import (UBXFramer, FrameKind, checksumUBX, checksumNMEA,
+                           MAX_NMEA_LENGTH)
+from ubx.UBXTransmit import Priority, TransmitQueue
+from ubx.UBXCorrelator import Correlator
+from ubx.UBXMetrics import Metrics
+from ubx.UBXStore import MessageStore
+from ubx.UBXCapture import CaptureWriter, compressionFromName
+from ubx.NMEA import parseNMEA
 import time
 
 
 class UBXManager(threading.Thread):
-    """The NMEA/UBX reader/writer thread."""
+    """The NMEA/UBX reader/writer thread.
+
+    Every parsed message has an attribute rxTime, the time.monotonic_ns()
+    at which the read that returned its first byte completed. While onNMEA
+    runs the time of the sentence is in self.rxTime. With wallClock set the
+    messages also get rxWallTime, the same time in ns since the epoch.
+    The latest message of each type is kept in self.store.
+    """
 
     class STATE(Enum):
+        """Deprecated, the states of the former byte-by-byte parser.
+
+        The receive path uses UBXFramer now, the manager has no state.
+        """
         START = 0
         NMEA_BODY = 1
         NMEA_CHKSUM_1 = 2
@@ -26,169 +46,167 @@ class UBXManager(threading.Thread):
         UBX_CHKSUM_1 = 10
         UBX_CHKSUM_2 = 11
 
-    def __init__(self, ser, debug=False, eofTimeout=None):
+    _traceOnConsume = False     # whether the consumer records the trace
+
+    def __init__(self, ser, debug=False, eofTimeout=None, maxNMEALength=MAX_NMEA_LENGTH):
         """Instantiate with serial.
 
-        :param ser: serial port, file, or other object that supports ser.read(1)
+        :param ser: serial port, file, socket, or other object that supports ser.read(1)
         :param debug: write to log.   (filename, or if True, default to ./UBX.log)
         :param eofTimeout:  seconds to wait for more bytes on read.  Default None->keep trying
+        :param maxNMEALength: longer NMEA sentences are dropped as junk
         """
         threading.Thread.__init__(self)
         self.ser = ser
         self.debug = debug
         self.eofTimeout = eofTimeout
+        self.chunkSize = 4096
+        self.drainTimeout = 1.0     # seconds to write queued messages on stop
         self._shutDown = False
-        self.ubx_chksum = UBXMessage.Checksum()
+        self._framer = UBXFramer(maxNMEALength=maxNMEALength)
+        self._txQueue = TransmitQueue()
+        self._correlator = Correlator(self.send)
+        self.metrics = Metrics()
+        self.store = MessageStore()
+        self.tracer = None
+        self.wallClock = False
+        self.rxTime = None
+        self._wallOffset = 0
+        self._nmeaHandlers = {}     # (talker, type) -> tuple of handlers
+        self._handlerLock = threading.Lock()
+        self._transmitter = None
+        self._transmitterLock = threading.Lock()
 
     def run(self):
-        """Run the parser."""
-        transitionFrom = [
-            self._fromSTART,
-            self._fromNMEA_BODY,
-            self._fromNMEA_CHKSUM_1,
-            self._fromNMEA_CHKSUM_2,
-            self._fromUBX_SYNC_CHAR_2,
-            self._fromUBX_CLASS,
-            self._fromUBX_ID,
-            self._fromUBX_LENGTH_1,
-            self._fromUBX_LENGTH_2,
-            self._fromUBX_PAYLOAD,
-            self._fromUBX_CHKSUM_1,
-            self._fromUBX_CHKSUM_2,
-        ]
+        """Run the parser and the transmitter.
+
+        When the parser stops, messages that are still queued are written
+        for up to drainTimeout seconds, the rest is cancelled.
+        """
+        self._startTransmitter()
+        try:
+            self._receiveLoop()
+        finally:
+            self._correlator.close()
+            self._txQueue.wait(self.drainTimeout)
+            for future in self._txQueue.close():
+                future.cancel()
+
+    def _read(self):
+        """Read the bytes that are available, block until there is one."""
+        ser = self.ser
+        if hasattr(ser, 'in_waiting'):      # pyserial
+            return ser.read(max(1, ser.in_waiting))
+        if hasattr(ser, 'read1'):           # buffered files and pipes
+            return ser.read1(self.chunkSize)
+        if hasattr(ser, 'read'):
+            return ser.read(1)
+        return ser.recv(self.chunkSize)
+
+    def _receiveLoop(self):
+        logfile = None
         if self.debug:
             debugfile = "UBX.log" if self.debug is True else self.debug
-            logfile = open(debugfile, "wb")
+            # a plain log is flushed with every read, so a crash loses nothing
+            compressed = compressionFromName(debugfile) is not None
+            logfile = CaptureWriter(debugfile, flushInterval=1.0 if compressed else 0)
             sys.stderr.write("Writing log to {}\n".format(debugfile))
-        self._reset()
-        while not self._shutDown:
-            if hasattr(self.ser, 'read'):
-                byte = self.ser.read(1)
-                if len(byte) == 0:
-                    if self.eofTimeout is None:
-                        time.sleep(0.01)    # Sleep 10 ms so at least it is not just busy-waiting
-                        continue
-                    else:
-                        time.sleep(self.eofTimeout)
-                        byte = self.ser.read(1)
-                        if len(byte) == 0:
-                            break   # Still nothing.  Done
-            else:
-                byte = self.ser.recv(1)
-            if self.debug:
-                logfile.write(byte)
-                logfile.flush()
-            self.state = transitionFrom[self.state.value](byte)
-
-    def _reset(self):
-        self.buffer = b''
-        self.chksum = 0
-        self.chksum_calc = 0
-        self.ubx_class = 0
-        self.ubx_id = 0
-        self.ubx_length = 0
-        self.state = UBXManager.STATE.START
-        self.ubx_chksum.reset()
-
-    def _fromSTART(self, byte):
-        if byte == b'$':
-            return UBXManager.STATE.NMEA_BODY
-        elif byte == b'\xb5':
-            return UBXManager.STATE.UBX_SYNC_CHAR_2
-        else:
-            return UBXManager.STATE.START
-
-    def _fromNMEA_BODY(self, byte):
-        if byte == b'*':
-            return UBXManager.STATE.NMEA_CHKSUM_1
-        else:
-            self.buffer += byte
-            self.chksum_calc ^= ord(byte)
-            return UBXManager.STATE.NMEA_BODY
-
-    def _fromNMEA_CHKSUM_1(self, byte):
         try:
-            self.chksum = int(byte, 16) * 16
-        except ValueError:
-            return UBXManager.STATE.START
-        return UBXManager.STATE.NMEA_CHKSUM_2
+            self._receiveChunks(logfile)
+        finally:
+            if logfile is not None:
+                logfile.close()
 
-    def _fromNMEA_CHKSUM_2(self, byte):
-        try:
-            self.chksum += int(byte, 16)
-        except ValueError:
-            return UBXManager.STATE.START
-        if self.chksum == self.chksum_calc:
-            self._onNMEA(self.buffer.decode('ascii'))
-        else:
-            self._onNMEAError(
-                "Incorrect Checksum: {:02X} should be {:02X}"
-                .format(self.chksum_calc, self.chksum)
-            )
-        self._reset()
-        return UBXManager.STATE.START
-
-    def _fromUBX_SYNC_CHAR_2(self, byte):
-        if byte == b'\x62':
-            return UBXManager.STATE.UBX_CLASS
-        else:
-            return UBXManager.STATE.START
-
-    def _fromUBX_CLASS(self, byte):
-        self.ubx_class = ord(byte)
-        self.ubx_chksum.update(byte)
-        return UBXManager.STATE.UBX_ID
-
-    def _fromUBX_ID(self, byte):
-        self.ubx_id = ord(byte)
-        self.ubx_chksum.update(byte)
-        return UBXManager.STATE.UBX_LENGTH_1
-
-    def _fromUBX_LENGTH_1(self, byte):
-        self.ubx_length = ord(byte)
-        self.ubx_chksum.update(byte)
-        return UBXManager.STATE.UBX_LENGTH_2
-
-    def _fromUBX_LENGTH_2(self, byte):
-        self.ubx_length = self.ubx_length + 256 * ord(byte)
-        self.ubx_chksum.update(byte)
-        return UBXManager.STATE.UBX_PAYLOAD
-
-    def _fromUBX_PAYLOAD(self, byte):
-        if self.ubx_length > 0:
-            self.buffer += byte
-            self.ubx_length -= 1
-            self.ubx_chksum.update(byte)
-            return UBXManager.STATE.UBX_PAYLOAD
-        else:
-            self.chksum = 256 * ord(byte)   # CK_A shifted left
-            return UBXManager.STATE.UBX_CHKSUM_1
-
-    def _fromUBX_CHKSUM_1(self, byte):
-        self.chksum += ord(byte)  # 256 * CK_A + CK_B
-        return UBXManager.STATE.UBX_CHKSUM_2
-
-    def _fromUBX_CHKSUM_2(self, byte):
-        if self.chksum == self.ubx_chksum.get():
-            self._onUBX(self.ubx_class, self.ubx_id, self.buffer)
-        else:
+    def _receiveChunks(self, logfile):
+        while not self._shutDown:
+            data = self._read()
+            rxTime = time.monotonic_ns()
+            if len(data) == 0:
+                if not hasattr(self.ser, 'read'):
+                    break   # socket closed
+                if self.eofTimeout is None:
+                    time.sleep(0.01)    # Sleep 10 ms so at least it is not just busy-waiting
+                    continue
+                time.sleep(self.eofTimeout)
+                data = self._read()
+                if len(data) == 0:
+                    break   # Still nothing.  Done
+            if logfile is not None:
+                logfile.write(data)
+            self.feed(data, rxTime)
+
+    def feed(self, data, rxTime=None):
+        """Parse data as if it had been read from ser.
+
+        rxTime is the time.monotonic_ns() at which data was read, it
+        defaults to now.
+        """
+        if rxTime is None:
+            rxTime = time.monotonic_ns()
+        if self.wallClock:
+            self._wallOffset = time.time_ns() - time.monotonic_ns()
+        metrics = self.metrics
+        metrics.read(len(data))
+        tracing = self.tracer is not None
+        for kind, frame, self.rxTime in self._framer.feedTimed(data, rxTime):
+            metrics.frame(kind, frame)
+            if tracing:
+                self._framedTime = time.monotonic_ns()
+            self._onFrame(kind, frame)
+
+    def _onFrame(self, kind, frame):
+        """Handle a (kind, frame) pair from the framer."""
+        if kind == FrameKind.UBX:
+            self._onUBX(frame[2], frame[3], frame[6:-2])
+        elif kind == FrameKind.NMEA:
+            self._onNMEA(frame[1:-3].decode('ascii', 'replace'))
+        elif kind == FrameKind.UBX_BAD:
             self._onUBXError(
-                self.ubx_class,
-                self.ubx_id,
-                "Incorrect Checksum: {:04X} should be {:04X}"
-                    .format(self.ubx_chksum.get(), self.chksum)
-            )
-        self._reset()
-        if byte == b'$':
-            return UBXManager.STATE.NMEA_BODY
-        elif byte == b'\xb5':
-            return UBXManager.STATE.UBX_SYNC_CHAR_2
-        else:
-            return UBXManager.STATE.START
+                frame[2], frame[3],
+                "Incorrect Checksum: {} should be {}".format(
+                    checksumUBX(frame).hex(), frame[-2:].hex()))
+        elif kind == FrameKind.NMEA_BAD:
+            self._onNMEAError(
+                "Incorrect Checksum: {:02X} should be {}".format(
+                    checksumNMEA(frame[1:-3]),
+                    frame[-2:].decode('ascii', 'replace')))
 
     def _onNMEA(self, buffer):
+        handlers = self._nmeaHandlers
+        if handlers:
+            obj = parseNMEA(buffer)
+            obj.rxTime = self.rxTime
+            talker, type = obj.talker, obj.type
+            for key in ((talker, type), (None, type), (talker, None), (None, None)):
+                for handler in handlers.get(key, ()):
+                    handler(obj)
         self.onNMEA(buffer)
 
+    def addNMEAHandler(self, handler, sentence=None, talker=None):
+        """Call handler(obj) with the parsed NMEA sentences, see ubx.NMEA.
+
+        sentence selects the sentence type, e.g. 'GGA', talker the talker,
+        e.g. 'GN', None matches any. Handlers run in the manager's thread
+        before onNMEA.
+        """
+        with self._handlerLock:
+            handlers = dict(self._nmeaHandlers)
+            key = (talker, sentence)
+            handlers[key] = handlers.get(key, ()) + (handler,)
+            self._nmeaHandlers = handlers
+
+    def removeNMEAHandler(self, handler, sentence=None, talker=None):
+        """Remove a handler added with addNMEAHandler."""
+        with self._handlerLock:
+            handlers = dict(self._nmeaHandlers)
+            key = (talker, sentence)
+            remaining = tuple(h for h in handlers.get(key, ()) if h != handler)
+            if remaining:
+                handlers[key] = remaining
+            else:
+                handlers.pop(key, None)
+            self._nmeaHandlers = handlers
+
     def onNMEA(self, buffer):
         """Default handler for good NMEA message."""
         print("NMEA: {}".format(buffer))
@@ -202,14 +220,41 @@ class UBXManager(threading.Thread):
 
     def _onUBX(self, msgClass, msgId, buffer):
         from ubx.UBXMessage import parseUBXPayload, formatByteString
+        t0 = time.perf_counter_ns()
         try:
             obj = parseUBXPayload(msgClass, msgId, buffer)
         except Exception as e:
+            self.metrics.parseFailed(msgClass, msgId)
             errMsg = "No parse, \"{}\", payload={}".format(
                      e, formatByteString(buffer))
             self.onUBXError(msgClass, msgId, errMsg)
         else:
-            self.onUBX(obj)
+            self.metrics.parsed(msgClass, msgId, time.perf_counter_ns() - t0)
+            obj.rxTime = self.rxTime
+            if self.wallClock:
+                obj.rxWallTime = self.rxTime + self._wallOffset
+            self.store.update(obj)
+            if self.tracer is None:
+                self._correlator.dispatch(obj)
+                self.onUBX(obj)
+            else:
+                self._traceUBX(obj)
+
+    def _traceUBX(self, obj):
+        """Dispatch obj like _onUBX does, and stamp its _trace."""
+        obj._trace = trace = {'read': obj.rxTime,
+                              'framed': self._framedTime,
+                              'parsed': time.monotonic_ns()}
+        self._correlator.dispatch(obj)
+        trace['dispatched'] = time.monotonic_ns()
+        self.onUBX(obj)
+        if not self._traceOnConsume:
+            trace['handled'] = time.monotonic_ns()
+            self.tracer.record(obj)
+
+    def setTracer(self, tracer):
+        """Stamp messages and record them in tracer, None to stop."""
+        self.tracer = tracer
 
     def onUBX(self, obj):
         """Default handler for good UBX message."""
@@ -223,15 +268,106 @@ class UBXManager(threading.Thread):
         print("UBX ERR {:02X}:{:02X} {}"
               .format(msgClass, msgId, errMsg))
 
-    def send(self, msg):
-        """Send message to ser."""
+    def send(self, msg, priority=Priority.CONFIG, future=False):
+        """Queue message for sending to ser and return immediately.
+
+        Messages are written by the manager's transmitter in priority order
+        (see Priority), small messages are coalesced into one write. The
+        transmitter starts with the first send() or with run(), whichever
+        comes first. If future is True a concurrent.futures.Future is
+        returned that completes when the message has been written. Raises
+        TransmitQueueClosed once the manager has stopped.
+        """
         from ubx.UBXMessage import formatByteString
         if self.debug:
             print("SEND: {}".format(formatByteString(msg)))
+        fut = Future() if future else None
+        self._txQueue.put(msg, priority, fut)
+        self._startTransmitter()
+        return fut
+
+    def _startTransmitter(self):
+        """Start the transmitter thread, also for managers that only send."""
+        if self._transmitter is not None:
+            return
+        with self._transmitterLock:
+            if self._transmitter is None:
+                self._transmitter = threading.Thread(
+                    target=self._transmitLoop, name="UBXManager-tx", daemon=True)
+                self._transmitter.start()
+
+    def poll(self, msgCls, payload=b'', timeout=None, retries=None,
+             match=None):
+        """Poll message msgCls, e.g. UBX.CFG.RATE, and return a Future.
+
+        The future resolves to the parsed response. Polls with a payload
+        (such as CFG-PRT with a port ID) pass it as payload, match is an
+        optional predicate the response has to satisfy. If no response
+        arrives within timeout seconds the poll is re-sent up to retries
+        times before the future fails with a TimeoutError.
+        """
+        msg = UBXMessage.make(msgCls._class, msgCls._id, payload)
+        return self._correlator.poll(
+            msg, msgCls._class, msgCls._id, timeout=timeout, retries=retries,
+            match=match)
+
+    def set(self, msg, timeout=None, retries=None):
+        """Send message msg and return a Future of its ACK-ACK or ACK-NAK.
+
+        msg is a message object or a serialized message. Timeouts and
+        retries are handled as in poll().
+        """
+        if isinstance(msg, (bytes, bytearray)):
+            msgClass, msgId = msg[2], msg[3]
+        else:
+            msgClass, msgId, msg = msg._class, msg._id, msg.serialize()
+        return self._correlator.set(
+            msg, msgClass, msgId, timeout=timeout, retries=retries)
+
+    def transmitBacklog(self):
+        """Return the number of bytes waiting to be written."""
+        return self._txQueue.backlog()
+
+    def flush(self, timeout=None):
+        """Wait until all queued messages are written, False on timeout."""
+        return self._txQueue.wait(timeout)
+
+    def _write(self, data):
         if hasattr(self.ser, 'write'):
-            self.ser.write(msg)
+            self.ser.write(data)
         else:
-            self.ser.send(msg)
+            self.ser.sendall(data)
+
+    def _transmitLoop(self):
+        """Write queued messages until the queue is closed."""
+        while True:
+            item = self._txQueue.take()
+            if item is None:
+                break
+            data, futures = item
+            try:
+                self._write(data)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                self.onWriteError(data, e)
+            else:
+                self.metrics.written(len(data))
+                for future in futures:
+                    future.set_result(None)
+            finally:
+                self._txQueue.written(len(data))
+
+    def onWriteError(self, data, error):
+        """Default handler for a failed write of data to ser."""
+        sys.stderr.write("UBX WRITE ERR {} bytes: {}\n".format(len(data), error))
+
+    def stats(self):
+        """Return a snapshot of the metrics, see UBXMetrics."""
+        stats = self.metrics.snapshot()
+        stats['txBacklog'] = self.transmitBacklog()
+        stats['pendingRequests'] = self._correlator.pending()
+        return stats
 
     def shutdown(self):
         """Stop the manger."""
@@ -244,28 +380,42 @@ class UBXQueue(UBXManager):
     Use .empty() and .get() as for a queue.Queue
     """
 
-    def __init__(self, ser, debug=False, start=False, eofTimeout=None, queue=None):
+    def __init__(self, ser, debug=False, start=False, eofTimeout=None, queue=None,
+                 maxNMEALength=MAX_NMEA_LENGTH):
         """
         :param ser: Passed to UBXManager
         :param eofTimeout: Passed to UBXManager
+        :param maxNMEALength: Passed to UBXManager
         :param start: start thread immediately on init
         :param queue: Optional queue to use, otherwise uses own
         """
         self._queue = queue if queue else Queue()
         # Reflects the has-a queue's get() and empty() methods
         self.empty = self._queue.empty
-        super(UBXQueue, self).__init__(ser=ser, debug=debug, eofTimeout=eofTimeout)
+        super(UBXQueue, self).__init__(ser=ser, debug=debug, eofTimeout=eofTimeout,
+                                       maxNMEALength=maxNMEALength)
         if start:
             self.start()
 
+    _traceOnConsume = True
+
     def get(self, *args, **kwargs):
         m = self._queue.get(*args, **kwargs)
         self._queue.task_done()
+        trace = getattr(m, '_trace', None)
+        if trace is not None and self.tracer is not None:
+            trace['consumed'] = time.monotonic_ns()
+            self.tracer.record(m)
         return m
 
     def onUBX(self, obj):  # handle good UBX message
         self._queue.put(obj)
 
+    def stats(self):
+        stats = super(UBXQueue, self).stats()
+        stats['queueDepth'] = self._queue.qsize()
+        return stats
+
     def join(self):
         super(UBXQueue, self).join()
         self._queue.join()
@@ -4,6 +4,8 @@
 import struct
 import inspect
 from enum import Enum
+from itertools import accumulate
+import operator
 import sys
 
 import ubx.UBX
@@ -49,12 +51,20 @@ class UBXMessage(object):
     @staticmethod
     def make(msgClass, msgId, payload):
         """Return a proper UBX message from the given class, id and payload."""
-        msg = struct.pack('cc', UBXMessage.sync_char_1, UBXMessage.sync_char_2)
-        msg += struct.pack('cc', _byte(msgClass), _byte(msgId))
-        msg += struct.pack('<h', len(payload))
-        msg += payload
-        msg += struct.pack('>H', UBXMessage.Checksum(msg[2:]).get())
-        return msg
+        buf = bytearray(8 + len(payload))
+        UBXMessage.makeInto(buf, 0, msgClass, msgId, payload)
+        return bytes(buf)
+
+    @staticmethod
+    def makeInto(buf, offset, msgClass, msgId, payload):
+        """Write a UBX message into the preallocated buf at offset.
+
+        Returns the offset just past the written message.
+        """
+        n = len(payload)
+        _header.pack_into(buf, offset, 0xb5, 0x62, msgClass, msgId, n)
+        buf[offset+6:offset+6+n] = payload
+        return _putChecksum(buf, offset, 8 + n)
 
     @staticmethod
     def extract(msg):
@@ -81,6 +91,15 @@ class UBXMessage(object):
         """Serialize the UBXMessage."""
         return UBXMessage.make(self._class, self._id, self._payload)
 
+    def frameSize(self):
+        """Return the length of the serialized message in bytes."""
+        return 8 + len(self._payload)
+
+    def serializeInto(self, buf, offset=0):
+        """Serialize into the preallocated buf at offset, return new offset."""
+        return UBXMessage.makeInto(
+            buf, offset, self._class, self._id, self._payload)
+
     class Checksum:
         """Incrementally calculate UBX message checksums."""
 
@@ -92,8 +111,7 @@ class UBXMessage(object):
             """
             self.reset()
             if msg is not None:
-                for i in msg:
-                    self.update(bytes([i]))
+                self.updateBytes(msg)
 
         def reset(self):
             """Reset the checksums to zero."""
@@ -107,11 +125,125 @@ class UBXMessage(object):
             self.b += self.a
             self.b &= 0xff
 
+        def updateBytes(self, data):
+            """Update checksums with all bytes in data at once."""
+            # After n bytes, b has accumulated n times the old a plus the
+            # running sums of the new bytes.
+            self.b = (self.b + len(data) * self.a
+                      + sum(accumulate(data))) & 0xff
+            self.a = (self.a + sum(data)) & 0xff
+
         def get(self):
             """Return the checksum (a 16-bit integer, ck_a is the MSB)."""
             return self.a * 256 + self.b
 
 
+_header = struct.Struct('<BBBBH')     # sync chars, class, id, length
+
+
+def _putChecksum(buf, offset, size):
+    """Write the checksum of the message at buf[offset:offset+size].
+
+    The message must be complete except for the two checksum bytes.
+    Returns the offset just past the message.
+    """
+    end = offset + size
+    body = memoryview(buf)[offset+2:end-2]
+    a = sum(body)
+    b = sum(accumulate(body))
+    body.release()
+    buf[end-2] = a & 0xff
+    buf[end-1] = b & 0xff
+    return end
+
+
+class _FrameLayout:
+    """Precompiled layout of a complete UBX frame of a given payload length.
+
+    The header and all payload fields are packed with a single
+    Struct.pack_into, the checksum is appended in place.
+    """
+
+    def __init__(self, msgClass, msgId, fieldInfo, msgLength):
+        varNames, varTypes = _mkNamesAndTypes(fieldInfo, msgLength)
+        self.msgClass = msgClass
+        self.msgId = msgId
+        self.struct = struct.Struct(
+            '<BBBBH' + ''.join(t.packFmt for t in varTypes))
+        self.payloadLength = self.struct.size - 6
+        self.size = self.struct.size + 2
+        getter = operator.attrgetter(*varNames)
+        self.getValues = getter if len(varNames) > 1 \
+            else lambda obj: (getter(obj),)
+        self.converters = [
+            (i, t.packValue) for i, t in enumerate(varTypes)
+            if hasattr(t, 'packValue')
+        ]
+
+    def packInto(self, obj, buf, offset):
+        """Pack obj into buf at offset, return the new offset."""
+        values = self.getValues(obj)
+        if self.converters:
+            values = list(values)
+            for i, conv in self.converters:
+                values[i] = conv(values[i])
+        self.struct.pack_into(
+            buf, offset, 0xb5, 0x62, self.msgClass, self.msgId,
+            self.payloadLength, *values)
+        return _putChecksum(buf, offset, self.size)
+
+
+def _frameLayout(cls, msgLength):
+    """Return the cached _FrameLayout of message class cls."""
+    layout = cls._layouts.get(msgLength)
+    if layout is None:
+        layout = _FrameLayout(cls._class, cls._id, cls._fieldInfo, msgLength)
+        cls._layouts[msgLength] = layout
+    return layout
+
+
+class _TextLayout:
+    """Precompiled text of a message of a given payload length.
+
+    text is the format of __str__, compact the one of a single line of
+    name=value pairs, both are filled with one str.format call.
+    """
+
+    def __init__(self, name, fieldInfo, msgLength):
+        varNames, varTypes = _mkNamesAndTypes(fieldInfo, msgLength)
+        getter = operator.attrgetter(*varNames)
+        self.getValues = getter if len(varNames) > 1 \
+            else lambda obj: (getter(obj),)
+        self.converters = [
+            (i, t.toString) for i, t in enumerate(varTypes)
+            if not hasattr(t, 'textFormat')
+        ]
+        self.text = name + ":" + "".join(
+            "\n  " + n + "=" + getattr(t, 'textFormat', "{}")
+            for n, t in zip(varNames, varTypes))
+        self.compact = name + " " + " ".join(
+            n + "=" + getattr(t, 'compactFormat', "{}")
+            for n, t in zip(varNames, varTypes))
+
+    def render(self, obj, compact=False):
+        values = self.getValues(obj)
+        if self.converters:
+            values = list(values)
+            for i, conv in self.converters:
+                values[i] = conv(values[i])
+        return (self.compact if compact else self.text).format(*values)
+
+
+def _textLayout(cls, msgLength):
+    """Return the cached _TextLayout of message class cls."""
+    layout = cls._texts.get(msgLength)
+    if layout is None:
+        name = "{}-{}".format(cls._className, cls.__name__)
+        layout = _TextLayout(name, cls._fieldInfo, msgLength)
+        cls._texts[msgLength] = layout
+    return layout
+
+
 def _mkFieldInfo(Fields):
     # The following is a list of (name, formatChar) tuples, such as
     # [(1, 'clsID', U1), (2, 'msgID', U1)]
@@ -148,8 +280,8 @@ def _mkNamesAndTypes(fieldInfo, msgLength):
             errmsg = "message length {} does not match {}"\
                      .format(msgLength, sizeTotal)
             raise Exception(errmsg)
-        varTypes += N * varTypesRepeat
-        varNames += _flatten(list(
+        varTypes = varTypes + N * varTypesRepeat
+        varNames = varNames + _flatten(list(
             map(lambda i: list(map(lambda s: s+"_"+str(i),
                                    varNamesRepeat)
                               ),
@@ -177,7 +309,11 @@ def initMessageClass(cls):
     cls_name = cls.__name__
     subClasses = [c for c in cls.__dict__.values() if type(c) == type]
 
-    lookup = dict([(getattr(subcls, '_id'), subcls) for subcls in subClasses])
+    # If several subclasses share an ID the first one is used for parsing,
+    # the others (such as poll requests like CFG.PRT_GET) are only sent.
+    lookup = {}
+    for subcls in subClasses:
+        lookup.setdefault(getattr(subcls, '_id'), subcls)
     setattr(cls, "_lookup", lookup)
 
     for sc in subClasses:
@@ -190,8 +326,7 @@ def initMessageClass(cls):
         if sc.__dict__.get('__init__') is None:
             def __init__(self, msg):
                 """Instantiate object from message bytestring."""
-                fieldInfo = _mkFieldInfo(self.Fields)
-                varNames, varTypes = _mkNamesAndTypes(fieldInfo, len(msg))
+                varNames, varTypes = _mkNamesAndTypes(self._fieldInfo, len(msg))
                 if not varNames:
                     errmsg = 'No variables found in UBX.{}.{}.'\
                              .format(cls_name, sc.__name__)
@@ -214,30 +349,36 @@ def initMessageClass(cls):
         if sc.__dict__.get('__str__') is None:
             def __str__(self):
                 """Return human readable string."""
-                fieldInfo = _mkFieldInfo(self.Fields)
-                varNames, varTypes = _mkNamesAndTypes(fieldInfo, self._len)
-                s = "{}-{}:".format(cls_name, type(self).__name__)
-                for (varName, varType) in zip(varNames, varTypes):
-                    s += "\n  {}={}".format(
-                        varName,
-                        varType.toString(getattr(self, varName))    # prettify
-                        )
-                return s
+                return _textLayout(type(self), self._len).render(self)
             setattr(sc, "__str__", __str__)
         # add serialize to subclass if necessary
         if sc.__dict__.get('serialize') is None:
             def serialize(self):
                 """UBX-serialize this object."""
-                fieldInfo = _mkFieldInfo(self.Fields)
-                varNames, varTypes = _mkNamesAndTypes(fieldInfo, self._len)
-                payload = b''
-                for name, typ in zip(varNames, varTypes):
-                    val = getattr(self, name)
-                    payload += typ.serialize(val)
-                return UBXMessage.make(
-                    self._class, self._id, payload
-                    )
+                layout = _frameLayout(type(self), self._len)
+                buf = bytearray(layout.size)
+                layout.packInto(self, buf, 0)
+                return bytes(buf)
             setattr(sc, "serialize", serialize)
+        if sc.__dict__.get('frameSize') is None:
+            def frameSize(self):
+                """Return the length of the serialized message in bytes."""
+                return _frameLayout(type(self), self._len).size
+            setattr(sc, "frameSize", frameSize)
+        if sc.__dict__.get('serializeInto') is None:
+            def serializeInto(self, buf, offset=0):
+                """Serialize into the preallocated buf at offset.
+
+                Returns the offset just past the written message.
+                """
+                return _frameLayout(type(self), self._len)\
+                    .packInto(self, buf, offset)
+            setattr(sc, "serializeInto", serializeInto)
+        # cache the field info, the frame layouts and the text layouts
+        setattr(sc, '_fieldInfo', _mkFieldInfo(sc.Fields))
+        setattr(sc, '_layouts', {})
+        setattr(sc, '_texts', {})
+        setattr(sc, '_className', cls_name)
         # set the '_class' class variable in subclass
         setattr(sc, '_class', cls._class)
     return cls
@@ -280,6 +421,20 @@ def parseUBXMessage(msg):
     return parseUBXPayload(msgClass, msgId, payload)
 
 
+def serialize_many(messages):
+    """Serialize all messages into one contiguous bytearray.
+
+    The buffer is allocated once and each message is packed into it in
+    place, so the result can be handed to a single write().
+    """
+    messages = list(messages)
+    buf = bytearray(sum(m.frameSize() for m in messages))
+    offset = 0
+    for m in messages:
+        offset = m.serializeInto(buf, offset)
+    return buf
+
+
 def formatByteString(s):
     """Return a readable string of hex numbers."""
     return " ".join('{:02x}'.format(x) for x in s)
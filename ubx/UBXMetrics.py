@@ -0,0 +1,224 @@
+"""Runtime metrics of a UBXManager.
+
+Every manager keeps counters of what it read and wrote, and histograms of
+the time spent parsing each message type. manager.stats() returns a
+snapshot as a dict, prometheus() formats it in the Prometheus text format
+and MetricsServer serves it over HTTP:
+
+    server = MetricsServer(manager, ('127.0.0.1', 9108))
+    server.start()      # curl localhost:9108/metrics, or /stats for JSON
+
+The counters take no lock: each is written by one thread only, the
+receive counters by the manager's thread and bytesWritten by its
+transmitter. snapshot() copies the tables, so it can run in any thread.
+"""
+
+import json
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ubx.UBXFramer import FrameKind
+
+# Upper bounds of the parse time histogram buckets in ns
+PARSE_BUCKETS = (2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000,
+                 1000000, 10000000)
+
+
+@lru_cache(maxsize=1024)
+def messageName(msgClass, msgId):
+    """Return a name like NAV-PVT, or 01-FF for an unknown message."""
+    from ubx.UBXMessage import classFromMessageClass
+    Cls = classFromMessageClass().get(msgClass)
+    Subcls = None if Cls is None else Cls._lookup.get(msgId)
+    if Subcls is None:
+        return "{:02X}-{:02X}".format(msgClass, msgId)
+    return "{}-{}".format(Cls.__name__, Subcls.__name__)
+
+
+@lru_cache(maxsize=1024)
+def isKnown(msgClass, msgId):
+    """Test whether a parser for the message is defined."""
+    from ubx.UBXMessage import classFromMessageClass
+    Cls = classFromMessageClass().get(msgClass)
+    return Cls is not None and msgId in Cls._lookup
+
+
+class Histogram:
+    """Counts of values in PARSE_BUCKETS."""
+
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(PARSE_BUCKETS) + 1)
+        self.sum = 0
+
+    def add(self, ns):
+        self.counts[bisect_left(PARSE_BUCKETS, ns)] += 1
+        self.sum += ns
+
+    def snapshot(self):
+        """Return count, sum in seconds and cumulative (le, count) pairs."""
+        buckets, total = [], 0
+        for le, n in zip(PARSE_BUCKETS + (float('inf'),), list(self.counts)):
+            total += n
+            buckets.append((le * 1e-9, total))
+        return {'count': total, 'sum': self.sum * 1e-9, 'buckets': buckets}
+
+
+class Metrics:
+    """Counters and histograms updated by the manager's threads."""
+
+    def __init__(self):
+        self.bytesRead = 0
+        self.bytesWritten = 0
+        self.frames = [0] * len(FrameKind)      # by FrameKind
+        self.junkBytes = 0
+        self.messages = {}          # (class, id) -> count
+        self.unknown = {}           # (class, id) -> count
+        self.parseErrors = {}       # (class, id) -> count
+        self.parseTimes = {}        # (class, id) -> Histogram
+
+    def read(self, n):
+        self.bytesRead += n
+
+    def written(self, n):
+        self.bytesWritten += n
+
+    def frame(self, kind, frame):
+        self.frames[kind] += 1
+        if kind == FrameKind.UBX:
+            key = (frame[2], frame[3])
+            self.messages[key] = self.messages.get(key, 0) + 1
+        elif kind == FrameKind.JUNK:
+            self.junkBytes += len(frame)
+
+    def parsed(self, msgClass, msgId, ns):
+        hist = self.parseTimes.get((msgClass, msgId))
+        if hist is None:
+            hist = self.parseTimes[(msgClass, msgId)] = Histogram()
+        hist.add(ns)
+
+    def parseFailed(self, msgClass, msgId):
+        table = self.parseErrors if isKnown(msgClass, msgId) else self.unknown
+        key = (msgClass, msgId)
+        table[key] = table.get(key, 0) + 1
+
+    def snapshot(self):
+        """Return the metrics as a dict of plain values."""
+        def named(table):
+            return {messageName(*key): value for key, value in table.copy().items()}
+        frames = list(self.frames)
+        return {
+            'bytesRead': self.bytesRead,
+            'bytesWritten': self.bytesWritten,
+            'frames': {kind.name: frames[kind] for kind in FrameKind},
+            'checksumErrors': {
+                'UBX': frames[FrameKind.UBX_BAD],
+                'NMEA': frames[FrameKind.NMEA_BAD]},
+            'junkBytes': self.junkBytes,
+            'messages': named(self.messages),
+            'unknownMessages': named(self.unknown),
+            'parseErrors': named(self.parseErrors),
+            'parseTime': {messageName(*key): hist.snapshot()
+                          for key, hist in self.parseTimes.copy().items()},
+        }
+
+
+def _labels(**labels):
+    return "{" + ",".join('{}="{}"'.format(k, v)
+                          for k, v in labels.items()) + "}"
+
+
+def prometheus(stats, prefix="ubx"):
+    """Return the dict returned by manager.stats() in Prometheus format."""
+    lines = []
+
+    def metric(name, kind, samples):
+        lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+        for labels, value in samples:
+            lines.append("{}_{}{} {}".format(prefix, name, labels, value))
+
+    metric("bytes_read_total", "counter", [("", stats['bytesRead'])])
+    metric("bytes_written_total", "counter", [("", stats['bytesWritten'])])
+    metric("frames_total", "counter",
+           [(_labels(kind=k), n) for k, n in stats['frames'].items()])
+    metric("checksum_errors_total", "counter",
+           [(_labels(protocol=p), n) for p, n in stats['checksumErrors'].items()])
+    metric("junk_bytes_total", "counter", [("", stats['junkBytes'])])
+    for name in ('messages', 'unknownMessages', 'parseErrors'):
+        metric({'messages': 'messages_total',
+                'unknownMessages': 'unknown_messages_total',
+                'parseErrors': 'parse_errors_total'}[name], "counter",
+               [(_labels(message=m), n) for m, n in sorted(stats[name].items())])
+    lines.append("# TYPE {}_parse_seconds histogram".format(prefix))
+    for m, hist in sorted(stats['parseTime'].items()):
+        for le, n in hist['buckets']:
+            le = "+Inf" if le == float('inf') else "{:g}".format(le)
+            lines.append("{}_parse_seconds_bucket{} {}".format(
+                prefix, _labels(message=m, le=le), n))
+        lines.append("{}_parse_seconds_sum{} {:.9f}".format(
+            prefix, _labels(message=m), hist['sum']))
+        lines.append("{}_parse_seconds_count{} {}".format(
+            prefix, _labels(message=m), hist['count']))
+    gauges = [('txBacklog', 'tx_backlog_bytes'),
+              ('pendingRequests', 'pending_requests'),
+              ('queueDepth', 'queue_depth'),
+              ('clients', 'clients')]
+    for key, name in gauges:
+        if key in stats:
+            metric(name, "gauge", [("", stats[key])])
+    counters = [('droppedFrames', 'dropped_frames_total'),
+                ('evictedClients', 'evicted_clients_total')]
+    for key, name in counters:
+        if key in stats:
+            metric(name, "counter", [("", stats[key])])
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """HTTP endpoint with /metrics (Prometheus) and /stats (JSON)."""
+
+    daemon_threads = True
+
+    def __init__(self, manager, address=('127.0.0.1', 9108)):
+        """
+        :param manager: object with a stats() method, e.g. a UBXManager
+        :param address: (host, port), port 0 picks a free one
+        """
+        self.manager = manager
+        ThreadingHTTPServer.__init__(self, address, _MetricsHandler)
+        self._thread = None
+
+    def start(self):
+        """Serve in a daemon thread."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="UBXMetrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        stats = self.server.manager.stats()
+        if self.path == '/metrics':
+            body = prometheus(stats).encode()
+            contentType = 'text/plain; version=0.0.4'
+        elif self.path == '/stats':
+            body = json.dumps(stats, default=str).encode()
+            contentType = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
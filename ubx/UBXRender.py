@@ -0,0 +1,94 @@
+"""Text output of messages at full rate.
+
+render() returns the text of a message, str(obj) or, with compact=True,
+a single line of name=value pairs. Both are filled into a format template
+that is compiled once per message type and length.
+
+TextLog renders and writes in a background thread, in batches, so that
+the thread that receives the messages only appends them to a queue:
+
+    log = TextLog(open('ubx.log', 'w'), compact=True)
+    manager.onUBX = log.write
+    ...
+    log.close()
+"""
+
+import sys
+import threading
+from collections import deque
+from ubx.UBXMessage import _textLayout
+
+
+def render(obj, compact=False):
+    """Return the text of a message object or NMEA sentence."""
+    if isinstance(obj, str):
+        return obj
+    if compact:
+        try:
+            return _textLayout(type(obj), obj._len).render(obj, True)
+        except AttributeError:
+            pass
+    return str(obj)
+
+
+class TextLog:
+    """Write the text of messages to a file from a background thread."""
+
+    def __init__(self, file=None, compact=False, interval=0.1, maxPending=100000):
+        """
+        :param file: text file, default sys.stdout
+        :param compact: one line per message
+        :param interval: seconds between writes
+        :param maxPending: messages that are not yet written; more are dropped
+        """
+        self.file = sys.stdout if file is None else file
+        self.compact = compact
+        self.interval = interval
+        self.maxPending = maxPending
+        self.dropped = 0
+        self.written = 0
+        self._pending = deque()
+        self._lock = threading.Lock()   # one writer at a time
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="TextLog", daemon=True)
+        self._thread.start()
+
+    def write(self, obj):
+        """Queue obj for writing, never blocks."""
+        if len(self._pending) >= self.maxPending:
+            self.dropped += 1
+            return
+        self._pending.append(obj)
+
+    __call__ = write
+
+    def _drain(self):
+        with self._lock:
+            pending = self._pending
+            n = len(pending)
+            if n == 0:
+                return
+            compact = self.compact
+            lines = [render(pending.popleft(), compact) for _ in range(n)]
+            lines.append("")
+            self.file.write("\n".join(lines))
+            self.file.flush()
+            self.written += n
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._drain()
+        self._drain()
+
+    def flush(self):
+        """Write the queued messages now, from the calling thread."""
+        self._drain()
+
+    def close(self):
+        """Write the queued messages and stop the thread."""
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""Replay a capture with the timing of the recording.
+
+A capture is an iterable of (timestamp, frame) pairs, where frame is a
+complete UBX or NMEA frame and timestamp is the host time in seconds at
+which it was recorded, or None if unknown. readCapture() reads a binary
+capture (raw receiver output) and readNMEALog() the output of
+UBXtool.py --NMEA.
+
+Frames are paced by the iTOW of the UBX messages that carry one
+(clock='itow') or by the recorded timestamps (clock='host'), at speed
+times real time, or as fast as possible if speed is 0. Frames that
+belong to the same instant are written in one go.
+
+    sink = PtySink()            # looks like a serial device at sink.name
+    stats = Replay(readCapture('drive.ubx'), sink, speed=10).run()
+    print(stats)
+
+Sinks are objects with a write(data) method: ManagerSink feeds a
+UBXManager directly, PtySink a pseudo-terminal and TCPSink a socket.
+"""
+
+import argparse
+import datetime
+import os
+import socket
+import struct
+import sys
+import time
+import tty
+from ubx.UBXCapture import openCapture
+from ubx.UBXFramer import UBXFramer, FrameKind
+
+_U4 = struct.Struct('<I')
+_iTOWOffsets = None
+
+
+def iTOWOffsets():
+    """Return a dict that maps (class, id) to the payload offset of iTOW."""
+    global _iTOWOffsets
+    if _iTOWOffsets is None:
+        from ubx import UBX
+        from ubx.introspect import getClassesInModule
+        offsets = {}
+        for Cls in getClassesInModule(UBX):
+            for msgId, Subcls in Cls._lookup.items():
+                types, names = Subcls._fieldInfo['once']
+                if 'iTOW' in names:
+                    i = names.index('iTOW')
+                    offsets[(Cls._class, msgId)] = sum(
+                        t._size for t in types[:i])
+        _iTOWOffsets = offsets
+    return _iTOWOffsets
+
+
+def iTOW(frame):
+    """Return the iTOW of UBX frame in ms, None if it has none."""
+    offset = iTOWOffsets().get((frame[2], frame[3]))
+    if offset is None or frame[0] != 0xb5 or len(frame) < offset + 12:
+        return None
+    return _U4.unpack_from(frame, 6 + offset)[0]
+
+
+def readCapture(file, chunkSize=1 << 16):
+    """Yield (None, frame) for the UBX and NMEA frames in a binary capture.
+
+    file is a file name or a binary file object, plain or compressed with
+    gzip, xz or bz2. NMEA sentences are terminated with CR LF, bytes that
+    are not part of a frame are skipped.
+    """
+    f = openCapture(file)
+    try:
+        framer = UBXFramer()
+        while True:
+            data = f.read(chunkSize)
+            if not data:
+                break
+            for kind, frame in framer.feed(data):
+                if kind == FrameKind.UBX:
+                    yield None, frame
+                elif kind == FrameKind.NMEA:
+                    yield None, frame + b'\r\n'
+    finally:
+        if f is not file:
+            f.close()
+
+
+def readNMEALog(file):
+    """Yield (timestamp, frame) for the lines written by UBXtool.py --NMEA."""
+    from ubx.parse_NMEA_log import NMEAChkSum
+    f = open(file, 'r') if isinstance(file, str) else file
+    try:
+        for line in f:
+            try:
+                dt, NMEA = line.strip().split(" ")
+                t = datetime.datetime.fromisoformat(dt).timestamp()
+            except ValueError:
+                continue
+            yield t, "${}*{}\r\n".format(NMEA, NMEAChkSum(NMEA).upper()).encode()
+    finally:
+        if f is not file:
+            f.close()
+
+
+class ReplayStats:
+    """Throughput achieved by Replay.run()."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.seconds = 0.0          # wall-clock duration of the replay
+        self.captureSeconds = 0.0   # duration of the capture
+        self.maxLag = 0.0           # worst delay behind schedule, seconds
+
+    @property
+    def framesPerSecond(self):
+        return self.frames / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytesPerSecond(self):
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        speedup = (self.captureSeconds / self.seconds) if self.seconds else 0.0
+        return ("{} frames, {} bytes in {:.3f} s: {:.0f} frames/s, {:.0f} "
+                "bytes/s ({:.1f}x real time), max lag {:.1f} ms".format(
+                    self.frames, self.bytes, self.seconds,
+                    self.framesPerSecond, self.bytesPerSecond, speedup,
+                    1e3 * self.maxLag))
+
+
+class Replay:
+    """Write the frames of a capture to a sink with their original timing."""
+
+    def __init__(self, capture, sink, speed=1.0, clock='itow', maxGap=None,
+                 maxWrite=1 << 16):
+        """
+        :param capture: iterable of (timestamp, frame), see readCapture
+        :param sink: object with write(data)
+        :param speed: 1 is real time, 10 ten times faster, 0 unthrottled
+        :param clock: 'itow' or 'host', the time base of the pacing
+        :param maxGap: optional longest pause in capture seconds, longer
+            gaps in the recording are shortened to this
+        :param maxWrite: largest write when unthrottled
+        """
+        if clock not in ('itow', 'host'):
+            raise ValueError("clock must be 'itow' or 'host'")
+        self.capture = capture
+        self.sink = sink
+        self.speed = speed
+        self.clock = clock
+        self.maxGap = maxGap
+        self.maxWrite = maxWrite
+
+    def _schedule(self):
+        """Yield (capture seconds since the first frame, frame)."""
+        t = 0.0
+        last = None     # last clock reading
+        for timestamp, frame in self.capture:
+            if self.clock == 'itow':
+                ms = iTOW(frame) if frame[:1] == b'\xb5' else None
+                now = None if ms is None else 1e-3 * ms
+            else:
+                now = timestamp
+            if now is not None:
+                if last is not None:
+                    dt = now - last
+                    if dt < 0:
+                        dt = 0.0    # week rollover or a new recording
+                    elif self.maxGap is not None:
+                        dt = min(dt, self.maxGap)
+                    t += dt
+                last = now
+            yield t, frame
+
+    def run(self):
+        """Replay the capture, return ReplayStats."""
+        stats = ReplayStats()
+        speed = self.speed
+        batch, size = [], 0
+        current = 0.0
+        start = time.monotonic()
+        for t, frame in self._schedule():
+            if batch and (t != current or size >= self.maxWrite):
+                self.sink.write(b''.join(batch))
+                batch, size = [], 0
+            if speed and t != current:
+                delay = start + t / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    stats.maxLag = max(stats.maxLag, -delay)
+            current = t
+            batch.append(frame)
+            size += len(frame)
+            stats.frames += 1
+            stats.bytes += len(frame)
+        if batch:
+            self.sink.write(b''.join(batch))
+        stats.seconds = time.monotonic() - start
+        stats.captureSeconds = current
+        return stats
+
+
+class ManagerSink:
+    """Feed the frames to a UBXManager, which need not be started."""
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def write(self, data):
+        self.manager.feed(data)
+
+    def close(self):
+        pass
+
+
+class PtySink:
+    """Write to a pseudo-terminal, open name like a serial device to read."""
+
+    def __init__(self):
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)     # no echo, no line discipline
+        self.name = os.ttyname(self._slave)
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._master, view):]
+
+    def close(self):
+        os.close(self._master)
+        os.close(self._slave)
+
+
+class TCPSink:
+    """Write to a TCP connection, made to address or accepted on it."""
+
+    def __init__(self, address, listen=False):
+        """
+        :param address: (host, port)
+        :param listen: wait for a client on address instead of connecting
+        """
+        if listen:
+            with socket.create_server(address) as listener:
+                self.sock, _ = listener.accept()
+        else:
+            self.sock = socket.create_connection(address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def write(self, data):
+        self.sock.sendall(data)
+
+    def close(self):
+        self.sock.close()
+
+
+def replay_main():
+    parser = argparse.ArgumentParser(
+        description='Replay a UBX/NMEA capture with its original timing.')
+    parser.add_argument('capture', help='binary capture, or UBXtool --NMEA log with --clock host')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='1 = real time, 0 = as fast as possible')
+    parser.add_argument('--clock', choices=['itow', 'host'], default='itow',
+                        help='pace by iTOW or by recorded host timestamps')
+    parser.add_argument('--max-gap', dest='maxGap', type=float,
+                        help='shorten pauses longer than this many seconds')
+    parser.add_argument('--tcp', metavar='HOST:PORT',
+                        help='write to HOST:PORT instead of a pty')
+    parser.add_argument('--listen', action='store_true',
+                        help='with --tcp, wait for a client on HOST:PORT')
+    args = parser.parse_args()
+
+    if args.tcp:
+        host, _, port = args.tcp.rpartition(':')
+        sink = TCPSink((host, int(port)), listen=args.listen)
+    else:
+        sink = PtySink()
+        sys.stderr.write("Replaying on {}, press return to start\n".format(sink.name))
+        sys.stdin.readline()
+    capture = readNMEALog(args.capture) if args.clock == 'host' else readCapture(args.capture)
+    try:
+        stats = Replay(capture, sink, args.speed, args.clock, args.maxGap).run()
+    finally:
+        sink.close()
+    sys.stderr.write("{}\n".format(stats))
+
+
+if __name__ == '__main__':
+    replay_main()
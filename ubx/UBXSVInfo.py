@@ -0,0 +1,159 @@
+"""Per-satellite time series of NAV-SVINFO.
+
+NAV-SVINFO lists the satellites in channel order, which changes from
+epoch to epoch. SVInfoStore sorts the channels into one preallocated ring
+buffer per svid, so that the history of a satellite is an array:
+
+    store = SVInfoStore(capacity=3600)
+    manager.onUBX = store.add           # or store.addPayload(payload)
+    store.window(12, start, end)['cno'] # C/N0 of svid 12, start <= iTOW < end
+    store.meanCNO()                     # {svid: mean C/N0}
+"""
+
+import operator
+import numpy as np
+from ubx import UBX
+from ubx.UBXColumns import payloadDtype
+from ubx.UBXEpoch import WEEK
+
+# one sample of a satellite; elev and azim in deg, prRes in cm
+SAMPLE = np.dtype([
+    ('iTOW', '<u4'), ('t', '<f8'), ('cno', 'u1'), ('elev', 'i1'),
+    ('azim', '<i2'), ('prRes', '<i4'), ('flags', 'u1'), ('quality', 'u1')
+])
+
+_BLOCK = payloadDtype(UBX.NAV.SVINFO)['repeated'].base
+_HEADER = 8     # bytes before the repeated blocks
+
+
+class SatelliteHistory:
+    """Ring buffer of the last samples of one satellite."""
+
+    def __init__(self, capacity):
+        self._data = np.zeros(capacity, SAMPLE)
+        self._keys = np.zeros(capacity, np.int64)  # iTOW extended over weeks
+        self._pos = 0
+        self._lastKey = None
+        self.count = 0              # samples added
+
+    def _key(self, iTOW):
+        """Return the week-extended iTOW closest to the latest sample."""
+        ref = self._lastKey
+        if ref is None:
+            return iTOW
+        return ref + (iTOW - ref + WEEK // 2) % WEEK - WEEK // 2
+
+    def append(self, sample):
+        """Add a sample, a tuple in the order of SAMPLE."""
+        key = self._lastKey = self._key(sample[0])
+        self._data[self._pos] = sample
+        self._keys[self._pos] = key
+        self._pos = (self._pos + 1) % len(self._data)
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, len(self._data))
+
+    def _ordered(self, data):
+        if self.count < len(data):
+            return data[:self.count]
+        return np.concatenate((data[self._pos:], data[:self._pos]))
+
+    def samples(self):
+        """Return the stored samples, oldest first."""
+        return self._ordered(self._data)
+
+    def window(self, start=None, end=None):
+        """Return the samples with start <= iTOW < end, oldest first.
+
+        start and end are taken within half a week of the latest sample,
+        so a window may span the week rollover, e.g. start=604790000,
+        end=10000.
+        """
+        samples = self.samples()
+        if start is None and end is None:
+            return samples
+        keys = self._ordered(self._keys)
+        mask = np.ones(len(keys), bool)
+        if start is not None:
+            mask &= keys >= self._key(start)
+        if end is not None:
+            mask &= keys < self._key(end)
+        return samples[mask]
+
+
+class SVInfoStore:
+    """Per-svid histories of C/N0, elevation, azimuth and residual."""
+
+    def __init__(self, capacity=3600):
+        """
+        :param capacity: number of samples kept per satellite
+        """
+        self.capacity = capacity
+        self.satellites = {}    # svid -> SatelliteHistory
+        self.epochs = 0
+        self._getters = {}      # numCh -> attrgetter of the channel fields
+
+    def _history(self, svid):
+        history = self.satellites.get(svid)
+        if history is None:
+            history = self.satellites[svid] = SatelliteHistory(self.capacity)
+        return history
+
+    def _getter(self, numCh):
+        getter = self._getters.get(numCh)
+        if getter is None:
+            names = [name + '_' + str(i) for i in range(1, numCh + 1)
+                     for name in ('svid', 'cno', 'elev', 'axim', 'prRes', 'flags', 'quality')]
+            getter = self._getters[numCh] = operator.attrgetter(*names)
+        return getter
+
+    def add(self, msg):
+        """Add a NAV-SVINFO object, other messages are ignored."""
+        if not isinstance(msg, UBX.NAV.SVINFO):
+            return
+        iTOW = msg.iTOW
+        t = getattr(msg, 'rxTime', np.nan)
+        values = self._getter(msg.numCh)(msg) if msg.numCh else ()
+        for i in range(0, len(values), 7):
+            svid, cno, elev, azim, prRes, flags, quality = values[i:i + 7]
+            self._history(svid).append(
+                (iTOW, t, cno, elev, azim, prRes, flags, quality))
+        self.epochs += 1
+
+    def addPayload(self, payload, t=np.nan):
+        """Add the payload of a NAV-SVINFO message, without parsing it."""
+        iTOW = int.from_bytes(payload[:4], 'little')
+        self._addBlocks(iTOW, t, np.frombuffer(payload, _BLOCK, offset=_HEADER))
+
+    def addColumns(self, cols, t=np.nan):
+        """Add NAV-SVINFO columns, see UBXColumns.columns()."""
+        for iTOW, blocks in zip(cols['iTOW'].tolist(), cols['repeated']):
+            self._addBlocks(iTOW, t, blocks)
+
+    def _addBlocks(self, iTOW, t, blocks):
+        for (chn, svid, flags, quality, cno, elev, azim, prRes) in blocks.tolist():
+            self._history(svid).append(
+                (iTOW, t, cno, elev, azim, prRes, flags, quality))
+        self.epochs += 1
+
+    def history(self, svid):
+        """Return the stored samples of svid, oldest first."""
+        history = self.satellites.get(svid)
+        return history.samples() if history is not None else np.zeros(0, SAMPLE)
+
+    def window(self, svid, start=None, end=None):
+        """Return the samples of svid with start <= iTOW < end."""
+        history = self.satellites.get(svid)
+        return history.window(start, end) if history is not None else np.zeros(0, SAMPLE)
+
+    def meanCNO(self, start=None, end=None, minElev=None):
+        """Return {svid: mean C/N0} over the window, optionally above minElev."""
+        means = {}
+        for svid, history in self.satellites.items():
+            samples = history.window(start, end)
+            if minElev is not None:
+                samples = samples[samples['elev'] >= minElev]
+            if len(samples):
+                means[svid] = float(samples['cno'].mean())
+        return means
@@ -0,0 +1,161 @@
+"""Fan out the receiver's frames to TCP clients.
+
+UBXServer forwards the complete UBX and NMEA frames read from the port to
+every connected client, e.g. loggers, an RTK engine and dashboards. Each
+client has a bounded send buffer. A client that does not keep up loses
+frames or is disconnected (see UBXDaemon), it never delays the reader or
+the other clients.
+
+    server = UBXServer(ser, ('127.0.0.1', 2101), maxBuffer=256 << 10,
+                       overflow='evict')
+    server.start()
+
+The server listens on localhost unless another host is given, e.g.
+('0.0.0.0', 2101), as clients are not authenticated.
+
+Clients only read. With writable=True the RTCM3 and UBX frames a client
+sends, e.g. corrections, are written to the port unchanged, each frame as
+one entry of the transmit queue, so that the frames of different clients
+never interleave. Bytes outside of valid frames are dropped.
+"""
+
+import re
+import socket
+from ubx.UBXDaemon import UBXDaemon, Subscription
+from ubx.UBXFramer import checksumUBX
+from ubx.UBXTransmit import Priority
+
+
+def _crc24qTable():
+    table = []
+    for i in range(256):
+        crc = i << 16
+        for _ in range(8):
+            crc <<= 1
+            if crc & 0x1000000:
+                crc ^= 0x1864cfb
+        table.append(crc & 0xffffff)
+    return table
+
+
+_CRC24Q = _crc24qTable()
+_frameStart = re.compile(rb'[\xd3\xb5]')
+
+
+def crc24q(data):
+    """Return the CRC-24Q of data, as used by RTCM3."""
+    crc = 0
+    for b in data:
+        crc = ((crc << 8) & 0xffffff) ^ _CRC24Q[(crc >> 16) ^ b]
+    return crc
+
+
+class CorrectionFramer:
+    """Cut the complete RTCM3 and UBX frames out of a client's byte stream."""
+
+    def __init__(self, maxUBXLength=8192):
+        self.maxUBXLength = maxUBXLength
+        self.junk = 0       # bytes dropped
+        self._buf = bytearray()
+
+    def feed(self, data):
+        """Append data and return the list of complete, valid frames."""
+        buf = self._buf
+        buf += data
+        n = len(buf)
+        pos = 0
+        frames = []
+        while pos < n:
+            m = _frameStart.search(buf, pos)
+            start = n if m is None else m.start()
+            self.junk += start - pos
+            pos = start
+            if pos == n:
+                break
+            if buf[pos] == 0xd3:    # RTCM3: 6 reserved bits, 10 bits length
+                if n - pos < 3:
+                    break
+                if buf[pos+1] & 0xfc:
+                    self.junk += 1
+                    pos += 1
+                    continue
+                end = pos + 6 + ((buf[pos+1] & 0x03) << 8 | buf[pos+2])
+                if end > n:
+                    break
+                frame = bytes(buf[pos:end])
+                ok = crc24q(frame[:-3]) == int.from_bytes(frame[-3:], 'big')
+            else:                   # UBX
+                if n - pos < 2:
+                    break
+                if buf[pos+1] != 0x62:
+                    self.junk += 1
+                    pos += 1
+                    continue
+                if n - pos < 6:
+                    break
+                length = buf[pos+4] | buf[pos+5] << 8
+                if length > self.maxUBXLength:
+                    self.junk += 1
+                    pos += 1
+                    continue
+                end = pos + 8 + length
+                if end > n:
+                    break
+                frame = bytes(buf[pos:end])
+                ok = checksumUBX(frame) == frame[-2:]
+            if ok:
+                frames.append(frame)
+                pos = end
+            else:
+                self.junk += 1
+                pos += 1
+        del buf[:pos]
+        return frames
+
+
+class UBXServer(UBXDaemon):
+    """UBXDaemon that serves raw frames on a TCP port."""
+
+    def __init__(self, ser, address=('127.0.0.1', 0), subscription='*',
+                 writable=False, sendBuffer=None, **kwargs):
+        """
+        :param ser: serial port, passed to UBXManager
+        :param address: (host, port) to listen on, port 0 picks a free one,
+            '' or '0.0.0.0' for all interfaces
+        :param subscription: filter of the frames sent to every client,
+            see UBXDaemon
+        :param writable: write the RTCM3 and UBX frames clients send to the port
+        :param sendBuffer: optional SO_SNDBUF of the client sockets, the
+            kernel buffers several MB per client by default, which hides a
+            slow client from maxBuffer for that long
+        :param kwargs: maxBuffer, overflow, lagging, debug and eofTimeout,
+            see UBXDaemon
+        """
+        self.address = address
+        self.subscription = subscription
+        self.writable = writable
+        self.sendBuffer = sendBuffer
+        UBXDaemon.__init__(self, ser, None, **kwargs)
+
+    def _listen(self):
+        listener = socket.create_server(self.address, backlog=16)
+        listener.setblocking(False)
+        self.address = listener.getsockname()[:2]
+        return listener
+
+    def _unlink(self):
+        pass
+
+    def _newClient(self, sock):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.sendBuffer is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sendBuffer)
+        client = UBXDaemon._newClient(self, sock)
+        client.subscription = Subscription(self.subscription)
+        client.framer = CorrectionFramer()
+        return client
+
+    def _onClientData(self, client, data):
+        if self.writable:
+            for frame in client.framer.feed(data):
+                self.send(frame, Priority.CORRECTION)
@@ -0,0 +1,110 @@
+"""Spectra of MON-SPAN as NumPy arrays.
+
+MON-SPAN.spectra gives each RF block's 256 bins as a uint8 array that
+views the message, and the bin frequencies from binFrequencies(), which
+are cached per (center, span).
+
+Spectrogram keeps the last N sweeps of each RF block in a preallocated
+ring buffer. The min, max and mean of each bin are computed over the
+stored sweeps:
+
+    spectrogram = Spectrogram(sweeps=3600)
+    spectrogram.add(span)                   # a MON-SPAN message
+    block = spectrogram.blocks[1]
+    block.sweeps(), block.times(), block.min, block.max, block.mean
+"""
+
+from functools import lru_cache
+import numpy as np
+
+BINS = 256
+
+
+@lru_cache(maxsize=64)
+def binFrequencies(center, span):
+    """Return the (read-only) center frequencies of the bins in Hz."""
+    freqs = center + span * (np.arange(BINS) - BINS // 2) / BINS
+    freqs.flags.writeable = False
+    return freqs
+
+
+class BlockSpectrogram:
+    """The sweeps of one RF block."""
+
+    def __init__(self, sweeps, center, span):
+        self.center = center
+        self.span = span
+        self.frequencies = binFrequencies(center, span)
+        self._data = np.zeros((sweeps, BINS), np.uint8)
+        self._times = np.full(sweeps, np.nan)
+        self._pos = 0
+        self.count = 0              # sweeps added
+
+    def add(self, spectrum, t=np.nan):
+        """Add a sweep, spectrum is an array of 256 values."""
+        self._data[self._pos] = spectrum
+        self._times[self._pos] = t
+        self._pos = (self._pos + 1) % len(self._data)
+        self.count += 1
+
+    def _stored(self):
+        """Return the stored sweeps in buffer order."""
+        return self._data[:min(self.count, len(self._data))]
+
+    @property
+    def min(self):
+        """Minimum of each bin over the stored sweeps."""
+        stored = self._stored()
+        return stored.min(axis=0) if len(stored) else np.zeros(BINS, np.uint8)
+
+    @property
+    def max(self):
+        """Maximum of each bin over the stored sweeps."""
+        stored = self._stored()
+        return stored.max(axis=0) if len(stored) else np.zeros(BINS, np.uint8)
+
+    @property
+    def mean(self):
+        """Mean of each bin over the stored sweeps."""
+        stored = self._stored()
+        return stored.mean(axis=0) if len(stored) else np.zeros(BINS)
+
+    def _ordered(self, a):
+        if self.count < len(a):
+            return a[:self.count]
+        return np.concatenate((a[self._pos:], a[:self._pos]))
+
+    def sweeps(self):
+        """Return the stored sweeps, oldest first, shape (n, 256)."""
+        return self._ordered(self._data)
+
+    def times(self):
+        """Return the times given to add() of the stored sweeps."""
+        return self._ordered(self._times)
+
+
+class Spectrogram:
+    """Ring buffers of the last sweeps of every RF block of MON-SPAN."""
+
+    def __init__(self, sweeps=3600):
+        """
+        :param sweeps: number of sweeps kept per RF block
+        """
+        self.sweeps = sweeps
+        self.blocks = {}    # RF block number (from 1) -> BlockSpectrogram
+
+    def add(self, span, t=None):
+        """Add the blocks of a MON-SPAN message.
+
+        t defaults to the rxTime of the message, if any. A block whose
+        center or span changes starts over.
+        """
+        if t is None:
+            t = getattr(span, 'rxTime', np.nan)
+        for blockNum, spectrum in enumerate(span.spectra, 1):
+            block = self.blocks.get(blockNum)
+            if (block is None or block.center != spectrum['centerFreq']
+                    or block.span != spectrum['span']):
+                block = self.blocks[blockNum] = BlockSpectrogram(
+                    self.sweeps, spectrum['centerFreq'], spectrum['span'])
+            block.add(spectrum['spectrum'], t)
@@ -0,0 +1,104 @@
+"""Latest message of each type, and optional bounded histories.
+
+Every UBXManager updates manager.store with each parsed message, so that
+the latest state can be read from any thread without a queue:
+
+    pvt = manager.store.latest(UBX.NAV.PVT)         # None before the first
+    manager.store.keep(UBX.NAV.RELPOSNED, 100)      # ring buffer of 100
+    manager.store.history(UBX.NAV.RELPOSNED, seconds=10)
+    hw = manager.store.wait(UBX.MON.HW, timeout=2)  # the next MON-HW
+
+Reads take no lock. The writer only takes the lock when a thread waits.
+"""
+
+import threading
+from collections import deque
+
+
+class _Slot:
+    __slots__ = ('value', 'count', 'history')
+
+    def __init__(self):
+        self.value = None
+        self.count = 0          # updates
+        self.history = None     # deque, if kept
+
+
+class MessageStore:
+    """Last value cache per message type."""
+
+    def __init__(self):
+        self._slots = {}        # message class, e.g. UBX.NAV.PVT -> _Slot
+        self._cond = threading.Condition()
+        self._waiters = 0
+
+    def _slot(self, msgCls):
+        slot = self._slots.get(msgCls)
+        if slot is None:
+            with self._cond:
+                slot = self._slots.setdefault(msgCls, _Slot())
+        return slot
+
+    def update(self, obj):
+        """Store obj as the latest message of its type."""
+        slot = self._slots.get(type(obj))
+        if slot is None:
+            slot = self._slot(type(obj))
+        slot.value = obj
+        if slot.history is not None:
+            slot.history.append(obj)
+        slot.count += 1
+        if self._waiters:
+            with self._cond:
+                self._cond.notify_all()
+
+    def keep(self, msgCls, n):
+        """Keep the last n messages of msgCls for history(), 0 to stop."""
+        slot = self._slot(msgCls)
+        slot.history = deque(slot.history or (), maxlen=n) if n else None
+
+    def latest(self, msgCls, default=None):
+        """Return the latest message of msgCls, or default."""
+        slot = self._slots.get(msgCls)
+        value = None if slot is None else slot.value
+        return default if value is None else value
+
+    def count(self, msgCls):
+        """Return the number of msgCls messages stored so far."""
+        slot = self._slots.get(msgCls)
+        return 0 if slot is None else slot.count
+
+    def history(self, msgCls, seconds=None):
+        """Return the kept messages of msgCls, oldest first.
+
+        With seconds only those received at most that long before the
+        latest one, by rxTime.
+        """
+        slot = self._slots.get(msgCls)
+        if slot is None or slot.history is None:
+            return []
+        msgs = list(slot.history)
+        if seconds is not None and msgs:
+            start = msgs[-1].rxTime - seconds * 1e9
+            msgs = [m for m in msgs if m.rxTime >= start]
+        return msgs
+
+    def wait(self, msgCls, timeout=None):
+        """Return the next message of msgCls, None after timeout seconds."""
+        slot = self._slot(msgCls)
+        with self._cond:
+            count = slot.count
+            self._waiters += 1
+            try:
+                if not self._cond.wait_for(lambda: slot.count != count, timeout):
+                    return None
+            finally:
+                self._waiters -= 1
+            return slot.value
+
+    def clear(self):
+        """Forget all messages, the kept history sizes stay."""
+        for slot in list(self._slots.values()):
+            slot.value = None
+            if slot.history is not None:
+                slot.history.clear()
@@ -0,0 +1,86 @@
+"""Trace the latency of messages through the stages of a UBXManager.
+
+With a Tracer set on a manager every parsed message carries a dict _trace
+of time.monotonic_ns() stamps:
+
+- read: the first byte of the frame was read (the rxTime of the message)
+- framed: the framer handed the frame over
+- parsed: the payload was parsed
+- dispatched: onUBX was called
+- handled: onUBX returned, or for a UBXQueue
+- consumed: get() returned the message
+
+The tracer aggregates the stamps into latency percentiles per message type,
+relative to read:
+
+    tracer = Tracer()
+    manager.setTracer(tracer)
+    ...
+    print(tracer)
+
+Without a tracer the manager only tests for None.
+"""
+
+import threading
+from collections import deque
+from ubx.UBXMetrics import messageName
+
+STAGES = ('framed', 'parsed', 'dispatched', 'handled', 'consumed')
+
+
+class Tracer:
+    """Collect the stage latencies of the last maxSamples messages per type."""
+
+    def __init__(self, maxSamples=10000):
+        self.maxSamples = maxSamples
+        self._lock = threading.Lock()
+        self._samples = {}  # name -> stage -> deque of ns since read
+
+    def record(self, obj):
+        """Add the stamps in obj._trace."""
+        trace = obj._trace
+        read = trace['read']
+        name = messageName(obj._class, obj._id)
+        with self._lock:
+            stages = self._samples.get(name)
+            if stages is None:
+                stages = self._samples[name] = {}
+            for stage, t in trace.items():
+                if stage == 'read':
+                    continue
+                samples = stages.get(stage)
+                if samples is None:
+                    samples = stages[stage] = deque(maxlen=self.maxSamples)
+                samples.append(t - read)
+
+    def report(self, percentiles=(50, 90, 99)):
+        """Return {name: {stage: {'n', 'p50', ..., 'max'}}} in microseconds."""
+        with self._lock:
+            snapshot = {name: {stage: sorted(samples)
+                               for stage, samples in stages.items()}
+                        for name, stages in self._samples.items()}
+        report = {}
+        for name, stages in snapshot.items():
+            report[name] = {}
+            for stage, samples in stages.items():
+                n = len(samples)
+                row = {'n': n, 'max': samples[-1] * 1e-3}
+                for p in percentiles:
+                    row['p{}'.format(p)] = samples[min(n - 1, n * p // 100)] * 1e-3
+                report[name][stage] = row
+        return report
+
+    def __str__(self):
+        lines = ["{:16s} {:10s} {:>7s} {:>10s} {:>10s} {:>10s} {:>10s}".format(
+            "message", "stage", "n", "p50 us", "p90 us", "p99 us", "max us")]
+        for name, stages in sorted(self.report().items()):
+            for stage in STAGES:
+                row = stages.get(stage)
+                if row is None:
+                    continue
+                lines.append(
+                    "{:16s} {:10s} {:7d} {:10.1f} {:10.1f} {:10.1f} {:10.1f}"
+                    .format(name, stage, row['n'], row['p50'], row['p90'],
+                            row['p99'], row['max']))
+                name = ""
+        return "\n".join(lines)
@@ -0,0 +1,105 @@
+"""Prioritized transmit queue used by UBXManager.send."""
+
+import heapq
+import itertools
+import threading
+from enum import IntEnum
+
+
+class Priority(IntEnum):
+    """Transmit priority classes, lower values are written first."""
+
+    CORRECTION = 0  # RTCM corrections, stale corrections are useless
+    SENSOR = 1      # ESF measurements and other real-time input
+    CONFIG = 2      # configuration messages and other commands
+    POLL = 3        # polls
+
+
+class TransmitQueueClosed(Exception):
+    """The manager has stopped and does not take messages any more."""
+
+
+class TransmitQueue:
+    """Thread-safe queue of frames waiting to be written to the port.
+
+    Frames are taken in priority order, FIFO within a priority class. Small
+    frames are coalesced so that one take() returns up to maxWrite bytes
+    for a single write().
+    """
+
+    def __init__(self, maxWrite=4096):
+        self.maxWrite = maxWrite
+        self._cond = threading.Condition()
+        self._heap = []             # (priority, seq, msg, future)
+        self._seq = itertools.count()
+        self._backlog = 0           # bytes queued or being written
+        self._closed = False
+
+    def put(self, msg, priority=Priority.CONFIG, future=None):
+        """Enqueue msg, future is resolved once msg has been written."""
+        with self._cond:
+            if self._closed:
+                raise TransmitQueueClosed("Transmit queue is closed.")
+            heapq.heappush(
+                self._heap, (priority, next(self._seq), msg, future))
+            self._backlog += len(msg)
+            self._cond.notify()
+
+    def take(self, timeout=None):
+        """Return (data, futures) of the next write, None when closed.
+
+        Blocks until there is something to write. Returns ('', []) if
+        timeout expired.
+        """
+        with self._cond:
+            if not self._heap and not self._closed:
+                self._cond.wait(timeout)
+            if not self._heap:
+                return None if self._closed else (b'', [])
+            chunks, futures, size = [], [], 0
+            while self._heap:
+                msg, future = self._heap[0][2:]
+                if chunks and size + len(msg) > self.maxWrite:
+                    break
+                heapq.heappop(self._heap)
+                if future is not None \
+                        and not future.set_running_or_notify_cancel():
+                    self._backlog -= len(msg)     # cancelled by the caller
+                    continue
+                chunks.append(msg)
+                size += len(msg)
+                if future is not None:
+                    futures.append(future)
+            return b''.join(chunks), futures
+
+    def written(self, nbytes):
+        """Report that nbytes taken with take() have left the queue."""
+        with self._cond:
+            self._backlog -= nbytes
+            self._cond.notify_all()
+
+    def backlog(self):
+        """Return the number of bytes queued or being written."""
+        return self._backlog
+
+    def __len__(self):
+        return len(self._heap)
+
+    def wait(self, timeout=None):
+        """Wait until the backlog is empty, return False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._backlog == 0 or self._closed, timeout)
+
+    def close(self):
+        """Refuse further frames and wake up all waiters.
+
+        Returns the futures of the frames that will never be written.
+        """
+        with self._cond:
+            self._closed = True
+            futures = [f for (_, _, _, f) in self._heap if f is not None]
+            self._backlog -= sum(len(msg) for (_, _, msg, _) in self._heap)
+            self._heap = []
+            self._cond.notify_all()
+            return futures
@@ -6,80 +6,15 @@ import os
 import serial
 from time import sleep
 from threading import Lock
-from enum import Enum
 import argparse
 import datetime
+from ubx import UBX
 from ubx.UBXManager import UBXManager
-from ubx.FSM import *
-
-
-@FSM_Get(UBX.MON.VER)
-class FSM_VER_Get:
-    pass
-
-
-@FSM_Get(UBX.CFG.GNSS)
-class FSM_GNSS_Get:
-    pass
-
-
-@FSM_Get(UBX.CFG.PMS)
-class FSM_PMS_Get:
-    pass
-
-
-@FSM_Get(UBX.CFG.PM2)
-class FSM_PM2_Get:
-    pass
-
-
-@FSM_Get(UBX.CFG.RATE)
-class FSM_RATE_Get:
-    pass
-
-
-class FSM_RXM_Set:
-    """FSM handling MON.VER.Get"""
-    _class = UBX.CFG.RXM._class
-    _id = UBX.CFG.RXM._id
-    class STATE(Enum):
-        START = 0
-        WAIT_GET = 1
-        WAIT_GET_ACK = 2
-        WAIT_SET_ACK = 3
-        DONE = 4
-    def __init__(self, lpMode):
-        self.state = FSM_RXM_Set.STATE.START
-        self.ver = None
-        self._gottenObj = None
-        self.lpMode = lpMode
-    def done(self):
-        return self.state == FSM_RXM_Set.STATE.DONE
-    def onUBX(self, obj, manager):
-        print(obj)
-        if self.state == FSM_RXM_Set.STATE.START:
-            if isObj(obj, UBX.CFG.RXM):
-                self._gottenObj = obj
-                self.state = FSM_RXM_Set.STATE.WAIT_GET_ACK
-            else:
-                print("Didnt' get a UBX.CFG.RXM")
-                self.state = FSM_RXM_Set.STATE.DONE
-        elif self.state == FSM_RXM_Set.STATE.WAIT_GET_ACK:
-            if isACK(obj):
-                self._gottenObj.lpMode = self.lpMode
-                manager.send(self._gottenObj.serialize())
-                self.state = FSM_RXM_Set.STATE.WAIT_SET_ACK
-            else:
-                print("Ooops that went wrong, I was expecting an ACK")
-                self.state = FSM_RXM_Set.STATE.DONE
-        elif self.state == FSM_RXM_Set.STATE.WAIT_SET_ACK:
-            if isACK(obj):
-                self.state = FSM_RXM_Set.STATE.DONE
-            else:
-                print("Ooops that went wrong, I was expecting an ACK")
-                self.state = FSM_RXM_Set.STATE.DONE
-        else:
-            raise Exception("The FSM went boink.")
+from ubx.UBXDaemon import UBXDaemon, DaemonConnection
+from ubx.UBXServer import UBXServer
+from ubx.UBXMetrics import MetricsServer
+from ubx.UBXTrace import Tracer
+from ubx.FSM import isObj, isNAK
 
 
 class Manager(UBXManager):
@@ -87,20 +22,13 @@ class Manager(UBXManager):
         UBXManager.__init__(self, ser, debug)
         self._lock = Lock()
         self._dumpNMEA = True    # with _lock
-        self._fsm = None         # with _lock
     def setDumpNMEA(self, val):
         with self._lock:
             self._dumpNMEA = val
         if self.debug:
             print("dumpNMEA={}".format(val))
     def onUBX(self, obj):
-        with self._lock:
-            if self._fsm is not None:
-                self._fsm.onUBX(obj, self)
-                if self._fsm.done():
-                    self._fsm = None
-            else:
-                print(obj)
+        print(obj)
     def onUBXError(self, msgClass, msgId, errMsg):
         print(msgClass, msgId, errMsg)
     def onNMEA(self, buffer):
@@ -108,47 +36,29 @@ class Manager(UBXManager):
             dump = self._dumpNMEA
         if dump:
             print("{} {}".format(datetime.datetime.now().isoformat(), buffer))
-    def done(self):
-        with self._lock:
-            return self._fsm is None
-    def waitUntilDone(self, timeout=None):
-        sleepTime = 0
-        while not self.done():
-            sleep(0.5)
-            sleepTime += 0.5
-            if timeout is not None and sleepTime > timeout:
-                return False
-        return True
     def VER_GET(self):
-        msg = UBX.MON.VER.Get().serialize()
-        with self._lock:
-            self._fsm = FSM_VER_Get()
-        self.send(msg)
+        return self.poll(UBX.MON.VER)
     def GNSS_GET(self):
-        msg = UBX.CFG.GNSS.Get().serialize()
-        with self._lock:
-            self._fsm = FSM_GNSS_Get()
-        self.send(msg)
+        return self.poll(UBX.CFG.GNSS)
     def PMS_GET(self):
-        msg = UBX.CFG.PMS.Get().serialize()
-        with self._lock:
-            self._fsm = FSM_PMS_Get()
-        self.send(msg)
+        return self.poll(UBX.CFG.PMS)
     def PM2_GET(self):
-        msg = UBX.CFG.PM2.Get().serialize()
-        with self._lock:
-            self._fsm = FSM_PM2_Get()
-        self.send(msg)
+        return self.poll(UBX.CFG.PM2)
     def RATE_GET(self):
-        msg = UBX.CFG.RATE.Get().serialize()
-        with self._lock:
-            self._fsm = FSM_RATE_Get()
-        self.send(msg)
+        return self.poll(UBX.CFG.RATE)
     def RXM_SET(self, lpMode):
-        msg = UBX.CFG.RXM.Get().serialize()
-        with self._lock:
-            self._fsm = FSM_RXM_Set(lpMode)
-        self.send(msg)
+        rxm = self.poll(UBX.CFG.RXM).result()
+        if not isObj(rxm, UBX.CFG.RXM):
+            raise Exception("Didn't get a UBX.CFG.RXM")
+        rxm.lpMode = lpMode
+        return self.set(rxm)
+
+
+def serveMetrics(manager, address):
+    """Serve the metrics of manager on [HOST:]PORT, if given."""
+    if address:
+        host, _, port = address.rpartition(':')
+        MetricsServer(manager, (host or '127.0.0.1', int(port))).start()
 
 
 def ubxtool_main():
@@ -183,41 +93,116 @@ def ubxtool_main():
         '--NMEA', dest='NMEA', action='store_true',
         help='Dump NMEA messages.'
         )
+    parser.add_argument(
+        '--device', dest='device', default='/dev/ttyAMA0',
+        help='Serial device (default /dev/ttyAMA0)'
+        )
+    parser.add_argument(
+        '--baudrate', dest='baudrate', type=int, default=9600,
+        help='Baud rate (default 9600)'
+        )
+    parser.add_argument(
+        '--daemon', dest='daemon', action='store_true',
+        help='Own the device and serve it to other UBXtool calls on SOCKET'
+        )
+    parser.add_argument(
+        '--socket', dest='socket', default='/tmp/ubxtool.sock',
+        help='Unix socket of the daemon (default /tmp/ubxtool.sock)'
+        )
+    parser.add_argument(
+        '--tcp', dest='tcp', metavar='[HOST:]PORT',
+        help='Own the device and send its frames to TCP clients '
+             '(HOST default 127.0.0.1, 0.0.0.0 for all interfaces)'
+        )
+    parser.add_argument(
+        '--evict', dest='evict', action='store_true',
+        help='Disconnect TCP clients that fall behind instead of dropping frames'
+        )
+    parser.add_argument(
+        '--metrics', dest='metrics', metavar='[HOST:]PORT',
+        help='Serve Prometheus metrics on http://HOST:PORT/metrics'
+        )
+    parser.add_argument(
+        '--profile', dest='profile', action='store_true',
+        help='Print the latency of each processing stage on exit'
+        )
     parser.add_argument(
         '-d', '--debug', dest='debug', action='store_true',
         help='Turn on debug mode'
         )
     args = parser.parse_args()
 
-    ser = serial.Serial('/dev/ttyAMA0', 9600, timeout=None)
     debug = (os.environ.get("DEBUG") is not None) or args.debug
 
-    manager = Manager(ser, debug=debug)
+    if args.daemon or args.tcp:
+        ser = serial.Serial(args.device, args.baudrate, timeout=None)
+        if args.tcp:
+            host, _, port = args.tcp.rpartition(':')
+            daemon = UBXServer(ser, (host or '127.0.0.1', int(port)), debug=debug,
+                               overflow='evict' if args.evict else 'drop')
+        else:
+            daemon = UBXDaemon(ser, args.socket, debug=debug)
+        serveMetrics(daemon, args.metrics)
+        daemon.start()
+        try:
+            daemon.join()
+        except KeyboardInterrupt:
+            daemon.shutdown()
+        sys.exit(0)
+
+    # Use the daemon if there is one, otherwise open the device
+    try:
+        conn = DaemonConnection(
+            args.socket, '*' if args.NMEA else '05,06,0A')    # ACK, CFG, MON
+    except OSError:
+        conn = None
+    if conn is not None:
+        manager = Manager(conn, debug=debug)
+    else:
+        ser = serial.Serial(args.device, args.baudrate, timeout=None)
+        manager = Manager(ser, debug=debug)
     manager.setDumpNMEA(False)  # temporarily turn off NMEA print
+    serveMetrics(manager, args.metrics)
+    if args.profile:
+        manager.setTracer(Tracer())
     if debug:
         sys.stderr.write("Starting UBXManager...\n")
     manager.start()
 
-    sleep(1)
+    if conn is None:
+        sleep(1)
 
-    # do all getters
-    for argName in filter(lambda s: s.endswith("_GET"), args.__dict__.keys()):
-        if args.__dict__[argName]:
-            getattr(manager, argName)()
-            manager.waitUntilDone()
-
-    if args.RXM is not None:
-        manager.RXM_SET(args.RXM)
-        manager.waitUntilDone()
+    def stop(code):
+        manager.shutdown()
+        if conn is not None:
+            conn.close()
+        if args.profile:
+            manager.join(timeout=1)     # let the last message be recorded
+            sys.stderr.write("{}\n".format(manager.tracer))
+        sys.exit(code)
+
+    try:
+        # do all getters, they can be in flight at the same time
+        polls = [getattr(manager, argName)()
+                 for argName in args.__dict__.keys()
+                 if argName.endswith("_GET") and args.__dict__[argName]]
+        for poll in polls:
+            poll.result()
+
+        if args.RXM is not None:
+            if isNAK(manager.RXM_SET(args.RXM).result()):
+                sys.stderr.write("CFG-RXM was rejected\n")
+    except Exception as e:
+        sys.stderr.write("{}\n".format(e))
+        stop(1)
 
     if args.NMEA:
         manager.setDumpNMEA(True)
-        manager.join()
-    else:
-        manager.shutdown()
-        sys.exit(0)
-
-    sys.exit(1)
+        try:
+            manager.join()
+        except KeyboardInterrupt:
+            pass
+    stop(0)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -4,7 +4,17 @@ from .introspect import getClassName, getClassMembers, getClassesInModule, getMe
 from .parse_NMEA_log import NMEAChkSum, parse_NMEA_log_main
 from .Tables import GNSS_Identifiers
 from .UBXESFSensor import SensorDataType, SensorMeasurement, SensorTransform
-from .UBXMessage import UBXMessage, parseUBXMessage, parseUBXPayload, addGet
+from .UBXESFCodec import MEASEncoder, encodeMEAS, decodeMEAS, decodeMEASFrames
+from .UBXMessage import UBXMessage, parseUBXMessage, parseUBXPayload, addGet, serialize_many
+from .UBXFramer import UBXFramer, FrameKind
+from .NMEA import parseNMEA, NMEASentence
 from .UBXManager import UBXManager, UBXQueue
+from .UBXDaemon import UBXDaemon, DaemonConnection
+from .UBXServer import UBXServer
+from .UBXReplay import Replay
+from .UBXDemux import Demux
+from .UBXTransmit import Priority, TransmitQueueClosed
+from .UBXCorrelator import CorrelatorClosed
 from .UBXtool import ubxtool_main
 from . import UBX
+from . import NMEA
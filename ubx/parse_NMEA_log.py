@@ -1,9 +1,23 @@
 #!/usr/bin/env python3
 """Scan the output produced by UBXtool.py --NMEA and transform it back into
 proper NMEA with $ and * and checksum. This output can then be used with other
-tools."""
+tools.
 
+The log is processed in blocks of complete lines, so memory use does not
+depend on the size of the log. With --jobs the blocks are converted by
+worker processes and written in their original order."""
+
+import argparse
+import multiprocessing
+import os
 import sys
+import time
+from collections import deque
+import numpy as np
+
+_HEX = [b'%02x' % c for c in range(256)]
+_WHITESPACE = np.zeros(256, bool)      # what str.strip() removes, ASCII only
+_WHITESPACE[list(b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f')] = True
 
 
 def NMEAChkSum(line):
@@ -13,24 +27,146 @@ def NMEAChkSum(line):
         chksum ^= ord(c)
     return '{:02x}'.format(chksum)
 
-def parse_NMEA_log_main():
-    if len(sys.argv) < 2:
-        sys.stderr.write("Usage:\n  {} FILENAME\n\n".format(sys.argv[0]) + __doc__)
-        sys.exit(1)
 
-    with open(sys.argv[1], "r") as file:
+def convertBlock(data):
+    """Convert a block of complete log lines.
+
+    Return (output, lines, bad) where bad is the number of lines that are
+    not of the form 'TIMESTAMP SENTENCE'. Lines end with LF, CR LF or CR
+    and are stripped of ASCII whitespace, like line.strip() of a log read
+    in text mode. The checksums of all lines are computed at once with
+    numpy.
+    """
+    if not data:
+        return b'', 0, 0
+    buf = np.frombuffer(data, np.uint8).copy()
+    cr = np.flatnonzero(buf == 13)
+    lone = cr[(cr + 1 == len(buf)) | (buf[np.minimum(cr + 1, len(buf) - 1)] != 10)]
+    buf[lone] = 10                          # a CR not followed by LF ends a line
+    if buf[-1] != 10:
+        buf = np.append(buf, np.uint8(10))
+    data = buf.tobytes()
+    ends = np.flatnonzero(buf == 10)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    text = np.flatnonzero(~_WHITESPACE[buf])
+    spaces = np.flatnonzero(buf == 32)
+    if len(text) == 0 or len(spaces) == 0:
+        return b'', len(ends), len(ends)
+    # first and last non-whitespace byte of each line
+    firstIdx = np.searchsorted(text, starts)
+    lastIdx = np.searchsorted(text, ends) - 1
+    good = firstIdx <= lastIdx
+    first = text[np.minimum(firstIdx, len(text) - 1)]
+    stops = text[np.maximum(lastIdx, 0)] + 1
+    # exactly one space between them
+    spaceIdx = np.searchsorted(spaces, first)
+    good &= np.searchsorted(spaces, stops) - spaceIdx == 1
+    bodies = spaces[np.minimum(spaceIdx, len(spaces) - 1)] + 1
+    bodies, stops = bodies[good], stops[good]
+    if len(bodies) == 0:
+        return b'', len(ends), len(ends)
+    bounds = np.empty(2 * len(bodies), np.intp)
+    bounds[0::2] = bodies
+    bounds[1::2] = stops
+    chksums = np.bitwise_xor.reduceat(buf, bounds)[0::2]
+    out = b''.join([b'$%s*%s\n' % (data[s:e], _HEX[c]) for (s, e, c) in
+                    zip(bodies.tolist(), stops.tolist(), chksums.tolist())])
+    return out, len(ends), len(ends) - len(bodies)
+
+
+def readBlocks(file, blockSize):
+    """Yield blocks of about blockSize bytes of complete lines from file."""
+    while True:
+        data = file.read(blockSize)
+        if not data:
+            break
+        yield data + file.readline()
+
+
+def blockRanges(file, blockSize):
+    """Yield (start, end) of blocks of complete lines of a seekable file."""
+    size = os.fstat(file.fileno()).st_size
+    start = 0
+    while start < size:
+        file.seek(min(start + blockSize, size))
+        file.readline()
+        end = file.tell()
+        yield start, end
+        start = end
+
+
+def _convertRange(name, start, end):
+    with open(name, 'rb') as file:
+        file.seek(start)
+        return convertBlock(file.read(end - start))
+
+
+def convertLog(name, out, jobs=1, blockSize=1 << 22):
+    """Convert the log file name ('-' for stdin) to out, a binary file.
+
+    Return (bytes, lines, bad).
+    """
+    total = lines = bad = 0
+    if jobs <= 1:
+        file = sys.stdin.buffer if name == '-' else open(name, 'rb')
+        try:
+            for data in readBlocks(file, blockSize):
+                result, n, b = convertBlock(data)
+                out.write(result)
+                total, lines, bad = total + len(data), lines + n, bad + b
+        finally:
+            if file is not sys.stdin.buffer:
+                file.close()
+        return total, lines, bad
+    with open(name, 'rb') as file, multiprocessing.Pool(jobs) as pool:
+        pending = deque()   # results in input order, at most 2 * jobs
+        for start, end in blockRanges(file, blockSize):
+            pending.append(pool.apply_async(_convertRange, (name, start, end)))
+            total += end - start
+            while len(pending) >= 2 * jobs or (pending and pending[0].ready()):
+                result, n, b = pending.popleft().get()
+                out.write(result)
+                lines, bad = lines + n, bad + b
+        while pending:
+            result, n, b = pending.popleft().get()
+            out.write(result)
+            lines, bad = lines + n, bad + b
+    return total, lines, bad
+
+
+def parse_NMEA_log_main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file', help='log written by UBXtool.py --NMEA, - for stdin')
+    parser.add_argument('-o', '--output', help='output file (default stdout)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes (default 1)')
+    parser.add_argument('--block-size', type=int, default=1 << 22,
+                        help='bytes per block (default 4 MiB)')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='do not report the throughput')
+    args = parser.parse_args()
+    if args.jobs > 1 and args.file == '-':
+        parser.error("--jobs needs a file")
 
-        errCount = 0
-        for line in file.readlines():
-            try:
-                [dt, NMEA] = line.strip().split(" ")
-            except:
-                errCount += 1
-            else:
-                print("${}*{}".format(NMEA, NMEAChkSum(NMEA)))
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    t0 = time.perf_counter()
+    try:
+        total, lines, bad = convertLog(args.file, out, args.jobs, args.block_size)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        else:
+            out.flush()
+    dt = time.perf_counter() - t0
 
-        if errCount:
-            sys.stderr.write("Found {} bad lines.\n".format(errCount))
+    if bad:
+        sys.stderr.write("Found {} bad lines.\n".format(bad))
+    if not args.quiet:
+        sys.stderr.write("{} lines, {:.1f} MB in {:.2f} s: {:.1f} MB/s, {:.0f} lines/s\n".format(
+            lines, total / 1e6, dt, total / 1e6 / max(dt, 1e-9), lines / max(dt, 1e-9)))
 
 if __name__ == '__main__':
-    parse_NMEA_log_main()
\ No newline at end of file
+    parse_NMEA_log_main()
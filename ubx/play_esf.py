@@ -4,34 +4,29 @@
 from ubx import UBX
 import serial, time, math
 from ubx.UBXESFSensor import *
+from ubx.UBXESFCodec import MEASEncoder
 
 
 if __name__ == '__main__':
     ser = serial.Serial('COM4', 115200, timeout=None)
     loop_delay_sec = 0.05
     data_id = 2
+    encoder = MEASEncoder([
+        SensorDataType.GYRO_X, SensorDataType.GYRO_Y, SensorDataType.GYRO_Z,
+        SensorDataType.ACCEL_X, SensorDataType.ACCEL_Y, SensorDataType.ACCEL_Z,
+        SensorDataType.WHEELTICK_FR, SensorDataType.WHEELTICK_FL,
+        SensorDataType.WHEELTICK_RR, SensorDataType.WHEELTICK_RL,
+        SensorDataType.WHEELTICK_SINGLE, SensorDataType.SPEED,
+        SensorDataType.GYRO_TEMPERATURE,
+    ], id=data_id)
     for idx in range(100000000):
         timestamp_ms = int(1000 * loop_delay_sec * idx)
         t = timestamp_ms / 1e3
         offset = 2 * math.pi / 3
         v1, v2, v3 = math.sin(t + 0), math.sin(t + offset), math.sin(t + 2*offset),
 
-        measurements = [
-            SensorMeasurement(data_id, SensorDataType.GYRO_X, v1),
-            SensorMeasurement(data_id, SensorDataType.GYRO_Y, v2),
-            SensorMeasurement(data_id, SensorDataType.GYRO_Z, v3),
-            SensorMeasurement(data_id, SensorDataType.ACCEL_X, v1),
-            SensorMeasurement(data_id, SensorDataType.ACCEL_Y, v2),
-            SensorMeasurement(data_id, SensorDataType.ACCEL_Z, v3),
-            SensorMeasurement(data_id, SensorDataType.WHEELTICK_FR, int(1000 * v1)),
-            SensorMeasurement(data_id, SensorDataType.WHEELTICK_FL, int(1000 * v2)),
-            SensorMeasurement(data_id, SensorDataType.WHEELTICK_RR, int(500 * v1)),
-            SensorMeasurement(data_id, SensorDataType.WHEELTICK_RL, int(500 * v2)),
-            SensorMeasurement(data_id, SensorDataType.WHEELTICK_SINGLE, int(2000 * v3)),
-            SensorMeasurement(data_id, SensorDataType.SPEED, v1),
-            SensorMeasurement(data_id, SensorDataType.GYRO_TEMPERATURE, v1),
-        ]
-
-        esf = UBX.ESF.MEAS.create(timestamp_ms, measurements, id=data_id)
-        ser.write(esf.serialize())
+        values = [v1, v2, v3, v1, v2, v3,
+                  int(1000 * v1), int(1000 * v2), int(500 * v1), int(500 * v2),
+                  int(2000 * v3), v1, v1]
+        ser.write(encoder.encode(timestamp_ms, values))
         time.sleep(loop_delay_sec)